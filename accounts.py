@@ -0,0 +1,157 @@
+from typing import Dict, List, Tuple
+
+from loguru import logger
+
+import config
+from ratelimit import RateLimiter
+
+# 未指定账号的域名使用的账号名称
+DEFAULT_ACCOUNT = "default"
+DEFAULT_ENDPOINT = "dnspod.tencentcloudapi.com"
+
+
+def create_client(secret_id: str, secret_key: str, endpoint: str = DEFAULT_ENDPOINT):
+    """创建DNSPod接口客户端，SDK体积较大，第一次创建客户端时才导入"""
+    from tencentcloud.common import credential
+    from tencentcloud.common.profile.client_profile import ClientProfile
+    from tencentcloud.common.profile.http_profile import HttpProfile
+    from tencentcloud.dnspod.v20210323 import dnspod_client
+
+    # 实例化一个认证对象
+    cred = credential.Credential(secret_id, secret_key)
+    # 实例化一个http选项，可选的，没有特殊需求可以跳过
+    httpProfile = HttpProfile()
+    httpProfile.endpoint = endpoint
+    # 实例化一个client选项，可选的，没有特殊需求可以跳过
+    clientProfile = ClientProfile()
+    clientProfile.httpProfile = httpProfile
+    # 实例化要请求产品的client对象
+    return dnspod_client.DnspodClient(cred, "", clientProfile)
+
+
+class Account:
+    """一个腾讯云账号，拥有独立的接口客户端和限速器，所属域名共用"""
+
+    def __init__(
+        self, name: str, client, rate_limiter: RateLimiter, account_config: Dict = None
+    ):
+        self.name = name
+        self.client = client
+        self.rate_limiter = rate_limiter
+        # 创建时使用的配置，重新加载时用于判断账号是否变化
+        self.config = account_config
+        # 限速器实际使用的参数，全局 api 配置变化时用于判断是否需要重建限速器
+        self.limits = rate_limits(account_config or {})
+
+    def update_limits(self) -> bool:
+        """限速参数变化时重建限速器，返回是否重建"""
+        limits = rate_limits(self.config or {})
+        if limits == self.limits:
+            return False
+        self.rate_limiter = RateLimiter(*limits)
+        self.limits = limits
+        return True
+
+
+def rate_limits(account_config: Dict) -> Tuple[float, int, Dict]:
+    """账号的限速参数(qps, burst, qps_overrides)，未配置的项使用全局 api 配置"""
+    return (
+        account_config.get("qps", config.api_qps),
+        account_config.get("burst", config.api_burst),
+        {**config.api_qps_overrides, **account_config.get("qps_overrides", {})},
+    )
+
+
+def build_rate_limiter(account_config: Dict) -> RateLimiter:
+    """按账号配置创建限速器，未配置的项使用全局 api 配置"""
+    return RateLimiter(*rate_limits(account_config))
+
+
+class AccountPool:
+    """账号池，每个账号一个客户端和限速器，按主域名找到所属账号"""
+
+    def __init__(
+        self,
+        accounts: Dict[str, Account],
+        domain_accounts: Dict[str, str],
+        fixed: bool = False,
+    ):
+        self.accounts = accounts
+        # 格式: {主域名: 账号名称}
+        self.domain_accounts = domain_accounts
+        # 使用传入的客户端时为True，重新加载配置不会替换账号
+        self.fixed = fixed
+
+    @classmethod
+    def from_config(cls) -> "AccountPool":
+        """根据配置创建账号池，只创建被域名用到的账号"""
+        pool = cls({}, {})
+        pool.update()
+        return pool
+
+    def update(self) -> List[str]:
+        """按当前配置更新账号池，配置未变的账号保留原有客户端和限速器
+
+        返回新建或重建的账号名称。配置未变、但全局 api 限速配置变化的账号只重建限速器。
+        """
+        if self.fixed:
+            self.refresh_limits(self.accounts.values())
+            return []
+        domain_accounts = {}
+        for domain_config in config.DOMAINS:
+            domain = domain_config["domain"]
+            name = domain_config.get("account", DEFAULT_ACCOUNT)
+            if domain_accounts.setdefault(domain, name) != name:
+                logger.warning(
+                    f"主域名 {domain} 配置了多个账号，使用 {domain_accounts[domain]}"
+                )
+
+        accounts, rebuilt, kept = {}, [], []
+        for name in dict.fromkeys(domain_accounts.values()):
+            account_config = config.ACCOUNTS.get(name)
+            if account_config is None:
+                logger.error(f"账号 {name} 未配置，相关域名将无法更新")
+                continue
+            account = self.accounts.get(name)
+            if account is not None and account.config == account_config:
+                kept.append(account)
+            else:
+                client = create_client(
+                    account_config.get("secret_id"),
+                    account_config.get("secret_key"),
+                    account_config.get("endpoint", DEFAULT_ENDPOINT),
+                )
+                account = Account(
+                    name, client, build_rate_limiter(account_config), account_config
+                )
+                rebuilt.append(name)
+            accounts[name] = account
+        self.refresh_limits(kept)
+        self.accounts = accounts
+        self.domain_accounts = domain_accounts
+        return rebuilt
+
+    @staticmethod
+    def refresh_limits(accounts) -> List[str]:
+        """按当前的全局 api 配置更新各账号的限速器，返回重建了限速器的账号名称"""
+        updated = [account.name for account in accounts if account.update_limits()]
+        if updated:
+            logger.info(f"限速配置已变化，重建账号 {', '.join(updated)} 的限速器")
+        return updated
+
+    @classmethod
+    def single(cls, client) -> "AccountPool":
+        """所有域名共用一个客户端，用于传入替代客户端的场景"""
+        account = Account(DEFAULT_ACCOUNT, client, build_rate_limiter({}))
+        return cls({DEFAULT_ACCOUNT: account}, {}, fixed=True)
+
+    def for_domain(self, domain: str) -> Account:
+        """主域名所属的账号"""
+        name = self.domain_accounts.get(domain, DEFAULT_ACCOUNT)
+        account = self.accounts.get(name)
+        if account is None:
+            raise KeyError(f"主域名 {domain} 的账号 {name} 不可用")
+        return account
+
+    def names(self) -> List[str]:
+        return list(self.accounts)
@@ -0,0 +1,331 @@
+import itertools
+import random
+import threading
+import time
+from collections import Counter
+from typing import Dict, List
+
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import (
+    TencentCloudSDKException,
+)
+from tencentcloud.dnspod.v20210323 import models
+
+
+class FakeDNSPod:
+    """进程内的DNSPod接口替身，方法与 DnspodClient 相同，可直接传给 DNSPodManager
+
+    支持 DescribeDomain、DescribeRecordList、CreateRecord、ModifyRecord、DeleteRecord、
+    CreateRecordBatch、ModifyRecordBatch、DeleteRecordBatch 以及查询批量任务结果的
+    DescribeBatchTask，请求和返回使用SDK中的模型。所有主域名都视为存在，首次用到时分配
+    域名ID。批量任务提交时立即执行完毕，各记录的结果通过 DescribeBatchTask 查询。每次
+    调用可以附加固定延迟，按接口限制每秒请求数（超出时返回 RequestLimitExceeded），并按
+    比例随机注入错误。线程安全。
+    """
+
+    def __init__(
+        self,
+        latency: float = 0,
+        qps: float = 0,
+        error_rate: float = 0,
+        error_code: str = "InternalError",
+        seed: int = 0,
+    ):
+        # 每次调用的延迟（秒）
+        self.latency = latency
+        # 每个接口每秒最多请求数，0表示不限
+        self.qps = qps
+        # 随机注入错误的比例
+        self.error_rate = error_rate
+        self.error_code = error_code
+        # 格式: {记录ID: {"Domain": ..., "Name": ..., "Type": ..., "Line": ..., "Value": ..., "TTL": ...}}
+        self.records: Dict[int, Dict] = {}
+        self.calls = Counter()
+        self.rejected = Counter()
+        self.errors = Counter()
+        # 格式: {主域名: 域名ID}
+        self.domain_ids: Dict[str, int] = {}
+        # 批量任务各记录的执行结果，格式: {任务ID: (任务类型, [结果, ...])}，结果字段与
+        # BatchRecordInfo 相同，另有 Domain
+        self.jobs: Dict[int, tuple] = {}
+        self._ids = itertools.count(1)
+        self._windows: Dict[str, tuple] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def add_record(
+        self,
+        domain: str,
+        sub_domain: str,
+        record_type: str,
+        line: str,
+        value: str,
+        ttl: int = 600,
+    ) -> int:
+        """直接写入一条记录，用于准备初始数据"""
+        with self._lock:
+            return self._add_record(domain, sub_domain, record_type, line, value, ttl)
+
+    def _add_record(self, domain, sub_domain, record_type, line, value, ttl) -> int:
+        self._domain_id(domain)
+        record_id = next(self._ids)
+        self.records[record_id] = {
+            "Domain": domain,
+            "Name": sub_domain,
+            "Type": record_type,
+            "Line": line,
+            "Value": value,
+            "TTL": ttl,
+        }
+        return record_id
+
+    def _domain_id(self, domain: str) -> int:
+        if domain not in self.domain_ids:
+            self.domain_ids[domain] = next(self._ids)
+        return self.domain_ids[domain]
+
+    def reset_stats(self):
+        """清空调用统计"""
+        with self._lock:
+            self.calls.clear()
+            self.rejected.clear()
+            self.errors.clear()
+
+    def _enter(self, action: str):
+        """统计调用，模拟延迟、频率限制和随机错误"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls[action] += 1
+            if self.qps:
+                second = int(time.monotonic())
+                window, count = self._windows.get(action, (second, 0))
+                if window != second:
+                    window, count = second, 0
+                if count >= self.qps:
+                    self.rejected[action] += 1
+                    raise TencentCloudSDKException(
+                        "RequestLimitExceeded", f"{action} 请求频率超过限制"
+                    )
+                self._windows[action] = (window, count + 1)
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors[action] += 1
+                raise TencentCloudSDKException(self.error_code, f"{action} 注入错误")
+
+    def _record(self, record_id: int) -> Dict:
+        record = self.records.get(record_id)
+        if record is None:
+            raise TencentCloudSDKException("InvalidParameter.RecordIdInvalid", "记录不存在")
+        return record
+
+    @staticmethod
+    def _list_item(record_id: int, record: Dict) -> models.RecordListItem:
+        item = models.RecordListItem()
+        item.RecordId = record_id
+        item.Name = record["Name"]
+        item.Type = record["Type"]
+        item.Line = record["Line"]
+        item.Value = record["Value"]
+        item.TTL = record["TTL"]
+        item.Status = record.get("Status", "ENABLE")
+        item.MX = record.get("MX", 0)
+        return item
+
+    def DescribeDomain(self, req):
+        self._enter("DescribeDomain")
+        with self._lock:
+            domain_id = self._domain_id(req.Domain)
+        resp = models.DescribeDomainResponse()
+        resp.DomainInfo = models.DomainInfo()
+        resp.DomainInfo.Domain = req.Domain
+        resp.DomainInfo.DomainId = domain_id
+        return resp
+
+    def DescribeRecordList(self, req):
+        self._enter("DescribeRecordList")
+        with self._lock:
+            matched = [
+                (record_id, record)
+                for record_id, record in self.records.items()
+                if record["Domain"] == req.Domain
+                and (not req.Subdomain or record["Name"] == req.Subdomain)
+                and (not req.RecordType or record["Type"] == req.RecordType)
+            ]
+        if not matched:
+            raise TencentCloudSDKException("ResourceNotFound.NoDataOfRecord", "记录列表为空")
+
+        offset = req.Offset or 0
+        limit = req.Limit or 100
+        page = matched[offset : offset + limit]
+        resp = models.DescribeRecordListResponse()
+        resp.RecordList = [self._list_item(record_id, record) for record_id, record in page]
+        resp.RecordCountInfo = models.RecordCountInfo()
+        resp.RecordCountInfo.TotalCount = len(matched)
+        resp.RecordCountInfo.ListCount = len(page)
+        return resp
+
+    def CreateRecord(self, req):
+        self._enter("CreateRecord")
+        resp = models.CreateRecordResponse()
+        resp.RecordId = self.add_record(
+            req.Domain, req.SubDomain, req.RecordType, req.RecordLine, req.Value, req.TTL or 600
+        )
+        return resp
+
+    def ModifyRecord(self, req):
+        self._enter("ModifyRecord")
+        with self._lock:
+            record = self._record(req.RecordId)
+            record.update(
+                Name=req.SubDomain or "@",
+                Type=req.RecordType,
+                Line=req.RecordLine,
+                Value=req.Value,
+                TTL=req.TTL or record["TTL"],
+            )
+        resp = models.ModifyRecordResponse()
+        resp.RecordId = req.RecordId
+        return resp
+
+    def DeleteRecord(self, req):
+        self._enter("DeleteRecord")
+        with self._lock:
+            self._record(req.RecordId)
+            del self.records[req.RecordId]
+        return models.DeleteRecordResponse()
+
+    def _result(self, record_id, record: Dict, status: str, error: str = None) -> Dict:
+        """批量任务中一条记录的执行结果"""
+        return {
+            "Domain": record.get("Domain"),
+            "RecordId": record_id,
+            "SubDomain": record.get("Name"),
+            "RecordType": record.get("Type"),
+            "RecordLine": record.get("Line"),
+            "Value": record.get("Value"),
+            "TTL": record.get("TTL"),
+            "Status": status,
+            "ErrMsg": error,
+        }
+
+    def _add_job(self, job_type: str, results: List[Dict]) -> int:
+        job_id = next(self._ids)
+        self.jobs[job_id] = (job_type, results)
+        return job_id
+
+    def CreateRecordBatch(self, req):
+        self._enter("CreateRecordBatch")
+        if not req.DomainIdList or not req.RecordList:
+            raise TencentCloudSDKException("MissingParameter", "缺少 DomainIdList 或 RecordList")
+        results = []
+        with self._lock:
+            domains = {str(domain_id): domain for domain, domain_id in self.domain_ids.items()}
+            for domain_id in req.DomainIdList:
+                domain = domains.get(str(domain_id))
+                if domain is None:
+                    raise TencentCloudSDKException("InvalidParameter.DomainIdInvalid", "域名ID不存在")
+                for item in req.RecordList:
+                    record = {
+                        "Domain": domain,
+                        "Name": item.SubDomain or "@",
+                        "Type": item.RecordType,
+                        "Line": item.RecordLine or "默认",
+                        "Value": item.Value,
+                        "TTL": int(item.TTL) if item.TTL else 600,
+                    }
+                    if not item.RecordType or not item.Value:
+                        results.append(self._result(None, record, "fail", "缺少记录类型或记录值"))
+                        continue
+                    record_id = self._add_record(
+                        domain, record["Name"], record["Type"], record["Line"],
+                        record["Value"], record["TTL"],
+                    )
+                    results.append(self._result(record_id, record, "success"))
+            job_id = self._add_job("record_add", results)
+        resp = models.CreateRecordBatchResponse()
+        resp.JobId = job_id
+        return resp
+
+    # ModifyRecordBatch 的 Change 可选值与对应的记录字段
+    BATCH_FIELDS = {
+        "sub_domain": "Name",
+        "record_type": "Type",
+        "area": "Line",
+        "value": "Value",
+        "mx": "MX",
+        "ttl": "TTL",
+        "status": "Status",
+    }
+
+    def ModifyRecordBatch(self, req):
+        self._enter("ModifyRecordBatch")
+        field = self.BATCH_FIELDS.get(req.Change)
+        if field is None:
+            raise TencentCloudSDKException("InvalidParameter", f"不支持的修改字段: {req.Change}")
+        if req.Change == "record_type" and not req.Value:
+            raise TencentCloudSDKException("MissingParameter", "修改记录类型时必须指定 Value")
+        change_to = int(req.ChangeTo) if field in ("TTL", "MX") else req.ChangeTo
+        results = []
+        with self._lock:
+            for record_id in req.RecordIdList:
+                record = self.records.get(record_id)
+                if record is None:
+                    results.append(self._result(record_id, {}, "fail", "记录不存在"))
+                    continue
+                record[field] = change_to
+                if req.Change == "record_type":
+                    record["Value"] = req.Value
+                results.append(self._result(record_id, record, "success"))
+            job_id = self._add_job("record_modify", results)
+        resp = models.ModifyRecordBatchResponse()
+        resp.JobId = job_id
+        return resp
+
+    def DeleteRecordBatch(self, req):
+        self._enter("DeleteRecordBatch")
+        results = []
+        with self._lock:
+            for record_id in req.RecordIdList:
+                record = self.records.pop(record_id, None)
+                if record is None:
+                    results.append(self._result(record_id, {}, "fail", "记录不存在"))
+                else:
+                    results.append(self._result(record_id, record, "success"))
+            job_id = self._add_job("record_del", results)
+        resp = models.DeleteRecordBatchResponse()
+        resp.JobId = job_id
+        return resp
+
+    def DescribeBatchTask(self, req):
+        self._enter("DescribeBatchTask")
+        with self._lock:
+            job = self.jobs.get(req.JobId)
+        if job is None:
+            raise TencentCloudSDKException("InvalidParameter.JobNotExist", "任务不存在")
+        job_type, results = job
+        # 按主域名分组，每个主域名一条明细
+        details = {}
+        for result in results:
+            domain = result["Domain"]
+            detail = details.get(domain)
+            if detail is None:
+                detail = details[domain] = models.DescribeBatchTaskDetail()
+                detail.Domain = domain
+                detail.DomainId = self.domain_ids.get(domain)
+                detail.RecordList = []
+            item = models.BatchRecordInfo()
+            for key, value in result.items():
+                if key != "Domain":
+                    setattr(item, key, value)
+            detail.RecordList.append(item)
+        resp = models.DescribeBatchTaskResponse()
+        resp.DetailList = list(details.values())
+        resp.JobType = job_type
+        resp.TotalCount = len(results)
+        resp.SuccessCount = sum(1 for result in results if result["Status"] == "success")
+        resp.FailCount = resp.TotalCount - resp.SuccessCount
+        return resp
+
+    def zone_records(self, domain: str) -> List[Dict]:
+        """返回指定主域名下的所有记录，用于校验结果"""
+        with self._lock:
+            return [record for record in self.records.values() if record["Domain"] == domain]
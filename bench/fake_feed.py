@@ -0,0 +1,68 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+from ranking import IP_VERSIONS, LINE_KEYS
+
+
+def generate_data(ips_per_line: int = 10, seed: int = 0) -> Dict:
+    """生成一份与优选IP接口格式相同的数据"""
+    rng = random.Random(seed)
+    data = {}
+    for version in IP_VERSIONS:
+        data[version] = {}
+        for line_index, line_key in enumerate(LINE_KEYS):
+            items = []
+            for i in range(ips_per_line):
+                if version == "v4":
+                    ip = f"104.{16 + line_index}.{i // 256}.{i % 256}"
+                else:
+                    ip = f"2606:4700:{line_index}::{i:x}"
+                items.append({"ip": ip, "latency": rng.randint(20, 300)})
+            data[version][line_key] = items
+    return data
+
+
+class FakeFeedServer:
+    """本地优选IP接口替身，在后台线程提供HTTP服务，返回格式与真实接口相同
+
+    可以随时替换返回的数据，并为每次请求附加固定延迟。
+    """
+
+    def __init__(self, data: Dict, latency: float = 0, host: str = "127.0.0.1"):
+        self.data = data
+        # 每次请求的延迟（秒）
+        self.latency = latency
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                body = json.dumps({"success": True, "data": server.data}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, 0), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f"http://{host}:{self._httpd.server_address[1]}/"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def start(self) -> "FakeFeedServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,48 @@
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from prober import Measurement
+
+
+class FakeProber:
+    """可达性探测器替身，不发送任何数据包
+
+    每个IP的往返时间由IP字符串的哈希确定，结果稳定；unreachable_ratio比例的IP
+    始终不可达。
+    """
+
+    def __init__(self, unreachable_ratio: float = 0.1, ipv6_supported: bool = True):
+        self.unreachable_ratio = unreachable_ratio
+        self.ipv6_supported = ipv6_supported
+        self.probes = 0
+
+    def _rtt(self, ip: str) -> Optional[float]:
+        value = zlib.crc32(ip.encode("utf-8"))
+        if value % 1000 < self.unreachable_ratio * 1000:
+            return None
+        return 10 + value % 290
+
+    def probe(self, ip: str) -> Optional[float]:
+        self.probes += 1
+        return self._rtt(ip)
+
+    def probe_many(self, ips: Iterable[str], limit: int = None) -> List[Tuple[str, float]]:
+        reachable = []
+        for ip in dict.fromkeys(ips):
+            rtt = self.probe(ip)
+            if rtt is not None:
+                reachable.append((ip, rtt))
+        reachable.sort(key=lambda x: x[1])
+        return reachable[:limit] if limit else reachable
+
+    def measure_many(
+        self, ips: Iterable[str], samples: int = None, methods: List[str] = None
+    ) -> Dict[str, Measurement]:
+        measurements = {}
+        for ip in dict.fromkeys(ips):
+            rtt = self.probe(ip)
+            if rtt is None:
+                measurements[ip] = Measurement(None, None, 1.0)
+            else:
+                measurements[ip] = Measurement(rtt, rtt, 0.0)
+        return measurements
@@ -0,0 +1,176 @@
+"""离线性能基准
+
+在进程内模拟DNSPod接口、优选IP接口和可达性探测，不需要腾讯云密钥，也不访问外网。
+对1、100、1000个域名的合成配置分别执行 check_and_update，报告耗时、接口调用次数
+和内存峰值。在项目根目录运行：
+
+    python -m bench.run
+    python -m bench.run --domains 1000 --api-latency 0.02 --error-rate 0.01
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+from loguru import logger
+
+import config
+import main
+from bench.fake_dnspod import FakeDNSPod
+from bench.fake_feed import FakeFeedServer, generate_data
+from bench.fake_prober import FakeProber
+from feed import HttpSource, IPFeed
+
+
+def build_domains(count: int, zone_size: int) -> List[Dict]:
+    """生成count个子域名配置，每zone_size个子域名属于同一个主域名"""
+    return [
+        {
+            "domain": f"zone{i // zone_size}.example.com",
+            "sub_domain": f"www{i % zone_size}",
+            "ipv4_enabled": True,
+            "ipv6_enabled": True,
+            "ttl": 600,
+            "remark": "bench",
+            "enabled": True,
+        }
+        for i in range(count)
+    ]
+
+
+def seed_records(fake: FakeDNSPod, domains: List[Dict], ratio: float):
+    """为一部分子域名写入过期的初始记录，包括需要删除的重复记录"""
+    for i, domain_config in enumerate(domains[: int(len(domains) * ratio)]):
+        domain, sub_domain = domain_config["domain"], domain_config["sub_domain"]
+        fake.add_record(domain, sub_domain, "A", "默认", f"192.0.2.{i % 250 + 1}")
+        fake.add_record(domain, sub_domain, "A", "默认", f"192.0.2.{(i + 1) % 250 + 1}")
+        fake.add_record(domain, sub_domain, "A", "移动", f"198.51.100.{i % 250 + 1}")
+        fake.add_record(domain, sub_domain, "AAAA", "电信", "2001:db8::1")
+
+
+def measure(name: str, func, fake: FakeDNSPod, trace: bool) -> Dict:
+    """执行一个阶段，返回耗时、接口调用次数和内存峰值"""
+    fake.reset_stats()
+    if trace:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    func()
+    result = {
+        "phase": name,
+        "wall": time.perf_counter() - start,
+        "calls": dict(fake.calls),
+        "rejected": sum(fake.rejected.values()),
+        "errors": sum(fake.errors.values()),
+    }
+    if trace:
+        result["peak_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+    return result
+
+
+def run_scenario(count: int, args) -> List[Dict]:
+    """对count个域名依次执行初始化、首次同步、优选IP变化、无变化四个阶段"""
+    config.DOMAINS = build_domains(count, args.zone_size)
+    config.state_file = os.path.join(tempfile.mkdtemp(prefix="dnspod-bench-"), "state.json")
+
+    fake = FakeDNSPod(args.api_latency, args.server_qps, args.error_rate)
+    seed_records(fake, config.DOMAINS, args.existing)
+    feed_server = FakeFeedServer(generate_data(args.ips_per_line, seed=1), args.feed_latency)
+    feed_server.start()
+    prober = FakeProber(args.unreachable)
+
+    trace = not args.no_tracemalloc
+    if trace:
+        tracemalloc.start()
+    try:
+        holder = {}
+
+        def init():
+            feed = IPFeed([HttpSource("bench", feed_server.url)])
+            holder["manager"] = main.DNSPodManager(fake, feed, prober)
+
+        def change_feed():
+            feed_server.data = generate_data(args.ips_per_line, seed=2)
+            holder["manager"].get_optimal_ips()
+            holder["manager"].check_and_update()
+
+        results = [
+            measure("init", init, fake, trace),
+            measure("cold", lambda: holder["manager"].check_and_update(), fake, trace),
+            measure("changed", change_feed, fake, trace),
+            measure("steady", lambda: holder["manager"].check_and_update(), fake, trace),
+        ]
+    finally:
+        if trace:
+            tracemalloc.stop()
+        feed_server.stop()
+
+    for result in results:
+        result["domains"] = count
+    return results
+
+
+def print_report(results: List[Dict]):
+    header = f"{'域名数':>6} {'阶段':<8} {'耗时(秒)':>9} {'内存峰值(KB)':>12} {'限流':>5} {'错误':>5}  接口调用"
+    print(header)
+    print("-" * 100)
+    for result in results:
+        calls = ", ".join(f"{action}={n}" for action, n in sorted(result["calls"].items()))
+        peak = f"{result['peak_kb']:.0f}" if "peak_kb" in result else "-"
+        print(
+            f"{result['domains']:>6} {result['phase']:<8} {result['wall']:>9.3f} "
+            f"{peak:>12} {result['rejected']:>5} {result['errors']:>5}  {calls or '-'}"
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="DNSPod 优选IP离线性能基准")
+    parser.add_argument(
+        "--domains", default="1,100,1000", help="逗号分隔的域名数量，默认 1,100,1000"
+    )
+    parser.add_argument("--zone-size", type=int, default=10, help="每个主域名下的子域名数")
+    parser.add_argument("--existing", type=float, default=0.5, help="预先存在记录的子域名比例")
+    parser.add_argument("--ips-per-line", type=int, default=10, help="每条线路的优选IP数")
+    parser.add_argument("--unreachable", type=float, default=0.1, help="不可达IP比例")
+    parser.add_argument("--api-latency", type=float, default=0, help="每次接口调用的延迟（秒）")
+    parser.add_argument("--server-qps", type=float, default=0, help="模拟接口每秒请求上限，0表示不限")
+    parser.add_argument("--error-rate", type=float, default=0, help="接口随机错误比例")
+    parser.add_argument("--feed-latency", type=float, default=0, help="优选IP接口延迟（秒）")
+    parser.add_argument("--qps", type=float, default=1000, help="客户端限速（每个接口每秒请求数）")
+    parser.add_argument("--workers", type=int, default=config.workers, help="并发更新的子域名数")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="不统计内存，减少对耗时的影响")
+    parser.add_argument("--json", help="同时把结果写入指定的JSON文件，便于对比")
+    parser.add_argument("--log-level", default="WARNING", help="日志级别")
+    return parser.parse_args()
+
+
+def run():
+    args = parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    # 基准只关心每个周期的成本，关闭变更抑制，保证优选IP变化后所有记录都会更新
+    config.api_qps = args.qps
+    config.api_burst = None
+    config.api_qps_overrides = {}
+    config.workers = args.workers
+    config.damping_min_gain_ms = 0
+    config.damping_min_gain_ratio = 0
+    config.damping_min_hold = 0
+    config.damping_max_changes = 0
+
+    results = []
+    for count in (int(n) for n in args.domains.split(",")):
+        results.extend(run_scenario(count, args))
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,145 @@
+import random
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Dict, Iterable, List, Optional
+
+# 一条可达性缓存，rtt为探测到的往返时间（毫秒），不可达时为None；loss为丢包比例
+CacheEntry = namedtuple(
+    "CacheEntry", ["available", "rtt", "loss", "checked_at", "expires_at"]
+)
+
+
+class ReachabilityCache:
+    """IP可达性缓存
+
+    按最近使用顺序淘汰，容量固定；可达与不可达结果分别设置有效期，并在有效期上
+    加入随机抖动，避免所有条目在同一时刻过期导致集中重新探测。线程安全。
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        positive_ttl: float,
+        negative_ttl: float,
+        jitter: float = 0.2,
+    ):
+        self.max_size = max_size
+        # 可达结果有效期（秒）
+        self.positive_ttl = positive_ttl
+        # 不可达结果有效期（秒）
+        self.negative_ttl = negative_ttl
+        # 有效期随机抖动比例，0.2表示在 ±20% 范围内浮动
+        self.jitter = jitter
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expiry(self, available: bool, checked_at: float) -> float:
+        ttl = self.positive_ttl if available else self.negative_ttl
+        return checked_at + ttl * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def peek(self, ip: str) -> Optional[CacheEntry]:
+        """读取未过期的缓存条目，不计入命中统计，用于判断是否需要探测等内部检查"""
+        with self._lock:
+            entry = self._entries.get(ip)
+            if entry is None or entry.expires_at <= time.time():
+                return None
+            return entry
+
+    def get_entry(self, ip: str) -> Optional[CacheEntry]:
+        """读取未过期的缓存条目，没有则返回None，计入命中统计"""
+        with self._lock:
+            entry = self._entries.get(ip)
+            if entry is None or entry.expires_at <= time.time():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(ip)
+            self.hits += 1
+            return entry
+
+    def get(self, ip: str) -> Optional[bool]:
+        """读取未过期的可达性结果，没有则返回None"""
+        entry = self.get_entry(ip)
+        return None if entry is None else entry.available
+
+    def put(
+        self,
+        ip: str,
+        available: bool,
+        rtt: float = None,
+        checked_at: float = None,
+        loss: float = None,
+    ):
+        """写入一次探测结果，超出容量时淘汰最久未使用的条目"""
+        checked_at = checked_at if checked_at is not None else time.time()
+        if loss is None:
+            loss = 0.0 if available else 1.0
+        entry = CacheEntry(
+            available, rtt, loss, checked_at, self._expiry(available, checked_at)
+        )
+        with self._lock:
+            self._entries[ip] = entry
+            self._entries.move_to_end(ip)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def measurements(self, ips: Iterable[str]) -> Dict[str, tuple]:
+        """返回指定IP中未过期且测到往返时间的结果，格式: {ip: (rtt, loss)}"""
+        now = time.time()
+        result = {}
+        with self._lock:
+            for ip in ips:
+                entry = self._entries.get(ip)
+                if entry and entry.rtt is not None and entry.expires_at > now:
+                    result[ip] = (entry.rtt, entry.loss)
+        return result
+
+    def expiring(self, ips: Iterable[str], within: float) -> List[str]:
+        """返回指定IP中缺失或将在within秒内过期的IP，用于提前刷新"""
+        deadline = time.time() + within
+        with self._lock:
+            return [
+                ip
+                for ip in dict.fromkeys(ips)
+                if ip not in self._entries or self._entries[ip].expires_at <= deadline
+            ]
+
+    def stats(self) -> Dict:
+        """命中、未命中、淘汰次数及当前条目数"""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def dump(self) -> Dict:
+        """导出未过期的条目，用于持久化"""
+        now = time.time()
+        with self._lock:
+            return {
+                ip: {
+                    "available": entry.available,
+                    "rtt": entry.rtt,
+                    "loss": entry.loss,
+                    "last_check": entry.checked_at,
+                }
+                for ip, entry in self._entries.items()
+                if entry.expires_at > now
+            }
+
+    def restore(self, entries: Dict):
+        """从持久化数据恢复条目，有效期按原探测时间重新计算"""
+        for ip, cache_info in entries.items():
+            self.put(
+                ip,
+                cache_info["available"],
+                cache_info.get("rtt"),
+                cache_info["last_check"],
+                cache_info.get("loss"),
+            )
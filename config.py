@@ -1,19 +1,36 @@
 import os
-from typing import Dict, List
+import threading
+from typing import Dict, List, Optional, Tuple
 import yaml
 from loguru import logger
 
+from sharding import shard_domains
+
+# 配置文件路径
+CONFIG_FILE = "config.yaml"
+
+# 配置文件在首次访问配置项时才加载，见 __getattr__
+_loaded = False
+_load_lock = threading.Lock()
+
+
 # 加载YAML配置
-def load_config() -> Dict:
-    """从YAML文件加载配置"""
-    yaml_files = ["config.yaml"]
+def load_config(required: bool = True) -> Dict:
+    """从YAML文件加载配置
+
+    required为False时（如不需要腾讯云密钥的 probe 命令），配置文件不存在或缺少密钥
+    不视为错误，未配置的项使用默认值。
+    """
+    yaml_files = [CONFIG_FILE]
     for yaml_file in yaml_files:
         if os.path.exists(yaml_file):
             try:
                 with open(yaml_file, "r", encoding="utf-8") as f:
                     config = yaml.safe_load(f)
                     logger.info(f"成功加载配置文件: {yaml_file}")
-                    # 验证必要的配置项
+                    # 验证必要的配置项，配置了多账号时可以不写默认账号
+                    if config.get("accounts") or not required:
+                        return config
                     if not config.get("tencent", {}).get("secret_id"):
                         logger.error(f"配置文件 {yaml_file} 中缺少必要的配置项: tencent.secret_id")
                         return {}
@@ -23,24 +40,267 @@ def load_config() -> Dict:
                     return config
             except Exception as e:
                 logger.error(f"加载配置文件 {yaml_file} 失败: {str(e)}")
-    logger.error("未找到有效的配置文件")
+    if required:
+        logger.error("未找到有效的配置文件")
     return {}
 
-# 加载配置
-config_data = load_config()
+# 域名配置中可以省略的字段及默认值，加载时补全，运行时可以直接按键读取
+DOMAIN_DEFAULTS = {
+    "enabled": True,
+    "ipv4_enabled": False,
+    "ipv6_enabled": False,
+    "ttl": 600,
+    "remark": None,
+}
+
+
+def check_domains(config_data: Dict) -> Dict[int, List[str]]:
+    """检查域名配置，返回格式: {序号: [错误, ...]}，只包含有错误的配置"""
+    errors = {}
+    accounts = set(config_data.get("accounts") or {})
+    if config_data.get("tencent", {}).get("secret_id"):
+        accounts.add("default")
+    seen = set()
+    for i, domain_config in enumerate(config_data.get("domains") or []):
+        if not isinstance(domain_config, dict):
+            errors[i] = [f"domains[{i}] 格式错误"]
+            continue
+        problems = []
+        for key in ("domain", "sub_domain"):
+            value = domain_config.get(key)
+            if not value:
+                problems.append(f"domains[{i}] 缺少 {key}")
+            elif not isinstance(value, str):
+                problems.append(f"domains[{i}].{key} 必须为字符串")
+        for key in ("enabled", "ipv4_enabled", "ipv6_enabled"):
+            if key in domain_config and not isinstance(domain_config[key], bool):
+                problems.append(f"domains[{i}].{key} 必须为 true 或 false")
+        ttl = domain_config.get("ttl", DOMAIN_DEFAULTS["ttl"])
+        if isinstance(ttl, bool) or not isinstance(ttl, int) or ttl < 1:
+            problems.append(f"domains[{i}].ttl 必须为正整数")
+        remark = domain_config.get("remark")
+        if remark is not None and not isinstance(remark, str):
+            problems.append(f"domains[{i}].remark 必须为字符串")
+        key = (domain_config.get("domain"), domain_config.get("sub_domain"))
+        if key in seen:
+            problems.append(f"domains[{i}] 重复: {key[0]} - {key[1]}")
+        seen.add(key)
+        account = domain_config.get("account", "default")
+        if account not in accounts:
+            problems.append(f"domains[{i}] 使用了未配置的账号: {account}")
+        if problems:
+            errors[i] = problems
+    return errors
+
+
+def validate_domains(config_data: Dict) -> List[str]:
+    """检查域名配置，返回错误列表"""
+    return [error for problems in check_domains(config_data).values() for error in problems]
+
+
+def normalize_domains(domains: List[Dict]) -> List[Dict]:
+    """补全域名配置中省略的字段"""
+    return [dict(DOMAIN_DEFAULTS, **domain_config) for domain_config in domains]
+
+
+def file_mtime() -> Optional[float]:
+    """配置文件的修改时间，文件不存在返回None"""
+    try:
+        return os.path.getmtime(CONFIG_FILE)
+    except OSError:
+        return None
+
+
+def changed() -> bool:
+    """配置文件是否在上次加载后被修改"""
+    ensure_loaded()
+    return file_mtime() != config_mtime
+
+
+def reload() -> bool:
+    """重新加载配置文件，校验通过后原地更新本模块的所有配置项
+
+    校验失败时保留当前配置并返回False。其他模块通过 config.xxx 读取配置，
+    重新加载后立即生效。
+    """
+    global config_mtime
+    ensure_loaded()
+    new_data = load_config()
+    errors = validate_domains(new_data) if new_data else ["无法加载配置文件"]
+    if errors:
+        for error in errors:
+            logger.error(f"配置错误: {error}")
+        logger.error("重新加载配置失败，继续使用当前配置")
+        # 文件再次修改前不再重试
+        config_mtime = file_mtime()
+        return False
+    settings = parse(new_data)
+    settings["config_mtime"] = file_mtime()
+    globals().update(settings)
+    return True
+
+
+def domain_key(domain_config: Dict) -> Tuple[str, str]:
+    """域名配置的唯一标识: (主域名, 子域名)"""
+    return domain_config["domain"], domain_config["sub_domain"]
+
+
+def diff_domains(old: List[Dict], new: List[Dict]) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+    """比较两份域名配置，返回(新增, 删除, 修改)的域名配置，修改返回新配置"""
+    old_map = {domain_key(c): c for c in old}
+    new_map = {domain_key(c): c for c in new}
+    added = [c for key, c in new_map.items() if key not in old_map]
+    removed = [c for key, c in old_map.items() if key not in new_map]
+    modified = [
+        c for key, c in new_map.items() if key in old_map and old_map[key] != c
+    ]
+    return added, removed, modified
+
+
+def parse(config_data: Dict) -> Dict:
+    """根据配置文件内容计算所有配置项，返回格式: {配置项名称: 值}"""
+    # 配置文件检查间隔（秒），文件修改后自动重新加载，0表示只在收到SIGHUP时重新加载
+    reload_interval = config_data.get("reload_interval", 10)
+
+    # 腾讯云API配置
+    SECRET_ID = config_data.get("tencent", {}).get("secret_id")
+    SECRET_KEY = config_data.get("tencent", {}).get("secret_key")
+
+    # 腾讯云账号，格式: {账号名称: {secret_id, secret_key, endpoint, qps, burst, qps_overrides}}
+    # tencent 中配置的密钥作为 default 账号，未指定 account 的域名使用该账号
+    ACCOUNTS = dict(config_data.get("accounts") or {})
+    if SECRET_ID and SECRET_KEY:
+        ACCOUNTS.setdefault("default", {"secret_id": SECRET_ID, "secret_key": SECRET_KEY})
+
+    # 多副本分片，每个副本只管理按主域名哈希分到自己的域名；环境变量优先，便于多个副本共用同一份配置
+    shard_index = int(os.environ.get("SHARD_INDEX", config_data.get("shard", {}).get("index", 0)))
+    shard_count = int(os.environ.get("SHARD_COUNT", config_data.get("shard", {}).get("count", 1)))
+
+    # API接口配置
+    API_URL = "https://api.vvhan.com/tool/cf_ip"
+
+    # 优选IP数据源列表，未配置时使用 API_URL
+    FEEDS = config_data.get("feeds", [])
+    feed_mode = config_data.get("feed", {}).get("mode", "first")  # first: 最先返回的健康数据源；merge: 合并所有数据源
+    feed_deadline = config_data.get("feed", {}).get("deadline", 10)  # 单次拉取的截止时间（秒）
+    feed_max_error_rate = config_data.get("feed", {}).get("max_error_rate", 0.5)  # 错误率超过该值的数据源被降级
+
+    # 日志级别
+    LOG_LEVEL = config_data.get("log_level", "INFO")
+
+    # 更新检查间隔（分钟）
+    check_interval = config_data.get("check_interval", 15)
+
+    # 优选IP刷新间隔（分钟）
+    feed_interval = config_data.get("schedule", {}).get("feed_interval", check_interval)
+
+    # 后台任务配置
+    reachability_interval = config_data.get("schedule", {}).get("reachability_interval", 60)  # 可达性缓存刷新间隔（秒）
+    state_interval = config_data.get("schedule", {}).get("state_interval", 300)  # 状态文件写入间隔（秒）
+    schedule_jitter = config_data.get("schedule", {}).get("jitter", 0.1)  # 任务间隔随机抖动比例
+
+    # 优选IP获取失败时，上一次成功结果的最长可用时间（分钟）
+    feed_max_age = config_data.get("feed_max_age", 60)
+
+    # IP可达性检测配置
+    probe_concurrency = config_data.get("probe", {}).get("concurrency", 32)  # 并发数
+    probe_timeout = config_data.get("probe", {}).get("timeout", 1)  # 单次探测超时（秒）
+    probe_port = config_data.get("probe", {}).get("tcp_port", 443)  # ICMP不可用时的TCP探测端口
+
+    # 已发布IP的快速故障切换配置
+    failover_enabled = config_data.get("failover", {}).get("enabled", True)
+    failover_interval = config_data.get("failover", {}).get("interval", 10)  # 探测间隔（秒）
+    failover_threshold = config_data.get("failover", {}).get("threshold", 3)  # 连续失败多少次后切换
+
+    # 变更抑制配置，避免延迟的微小波动导致记录反复改写
+    damping_min_gain_ms = config_data.get("damping", {}).get("min_gain_ms", 10)  # 新IP至少快多少毫秒才切换
+    damping_min_gain_ratio = config_data.get("damping", {}).get("min_gain_ratio", 0.1)  # 新IP至少快多少比例才切换
+    damping_min_hold = config_data.get("damping", {}).get("min_hold", 30)  # 记录切换后的最短保持时间（分钟）
+    damping_max_changes = config_data.get("damping", {}).get("max_changes", 0)  # 每周期最多修改的记录数，0表示不限
+
+    # 并发更新的域名数
+    workers = config_data.get("workers", 4)
+
+    # DNSPod接口限速配置，默认每个接口每秒20次
+    api_qps = config_data.get("api", {}).get("qps", 20)
+    api_burst = config_data.get("api", {}).get("burst")  # 最大突发请求数，默认与qps相同
+    api_qps_overrides = config_data.get("api", {}).get("qps_overrides", {})  # 单独指定某些接口的频率
+    api_max_retries = config_data.get("api", {}).get("max_retries", 3)  # 触发频率限制后的最大重试次数
+
+    # IP可达性缓存配置
+    cache_max_size = config_data.get("cache", {}).get("max_size", 4096)  # 最多缓存的IP数
+    cache_positive_ttl = config_data.get("cache", {}).get(
+        "positive_ttl", max(1, check_interval // 3)
+    )  # 可达结果有效期（分钟），默认为检查间隔的1/3
+    cache_negative_ttl = config_data.get("cache", {}).get("negative_ttl", 2)  # 不可达结果有效期（分钟）
+    cache_jitter = config_data.get("cache", {}).get("jitter", 0.2)  # 有效期随机抖动比例
+    cache_refresh_ahead = config_data.get("cache", {}).get("refresh_ahead", 60)  # 已发布IP提前刷新的时间窗口（秒）
+
+    # 本机延迟测量配置
+    measure_samples = config_data.get("measure", {}).get("samples", 3)  # 每种方式的探测次数
+    measure_methods = config_data.get("measure", {}).get("methods", ["icmp", "tcp"])  # 探测方式
+    measure_blend = config_data.get("measure", {}).get("blend", 0.5)  # 本机测量结果在排序延迟中的权重，0表示只用接口延迟
+    measure_loss_weight = config_data.get("measure", {}).get("loss_weight", 5)  # 每1%丢包折算的延迟（毫秒）
+
+    # 指标服务配置，开启后在 http://host:port/metrics 输出Prometheus格式的指标
+    metrics_enabled = config_data.get("metrics", {}).get("enabled", False)
+    metrics_host = config_data.get("metrics", {}).get("host", "0.0.0.0")
+    metrics_port = config_data.get("metrics", {}).get("port", 9108)
+
+    # 状态文件路径，保存解析记录、IP可用性缓存和优选IP快照，重启后恢复
+    # 多副本时每个副本使用各自的状态文件
+    state_file = config_data.get("state", {}).get(
+        "file", f"logs/state.{shard_index}.json" if shard_count > 1 else "logs/state.json"
+    )
+    # 状态文件恢复或启动时加载的解析记录的信任时间（分钟），在启动和第一个检查周期中
+    # 未超过该时间的主域名不再查询；之后的检查周期每次都重新查询
+    state_ttl = config_data.get("state", {}).get("ttl", 10)
+
+    # 获取所有域名配置，多副本时只保留分到本副本的域名
+    ALL_DOMAINS = normalize_domains(config_data.get("domains") or [])
+    DOMAINS = shard_domains(ALL_DOMAINS, shard_index, shard_count)
+    if shard_count > 1:
+        logger.info(
+            f"分片 {shard_index}/{shard_count}: 管理 {len(DOMAINS)}/{len(ALL_DOMAINS)} 个域名"
+        )
+    return dict(locals())
 
-# 腾讯云API配置
-SECRET_ID = config_data.get("tencent", {}).get("secret_id")
-SECRET_KEY = config_data.get("tencent", {}).get("secret_key")
 
-# API接口配置
-API_URL = "https://api.vvhan.com/tool/cf_ip"
+def ensure_loaded(required: bool = True):
+    """首次读取配置项时才加载配置文件，加载前已被直接赋值的配置项保持不变
 
-# 日志级别
-LOG_LEVEL = config_data.get("log_level", "INFO")
+    required为False时配置文件可以不存在，见 load_config。
+    """
+    global _loaded
+    with _load_lock:
+        if _loaded:
+            return
+        config_data = load_config(required)
+        # 与重新加载使用同样的校验，启动时跳过有错误的域名配置，其余域名照常管理
+        invalid = check_domains(config_data)
+        if invalid:
+            for problems in invalid.values():
+                for error in problems:
+                    logger.error(f"配置错误: {error}，已忽略该域名配置")
+            config_data = dict(
+                config_data,
+                domains=[
+                    c for i, c in enumerate(config_data["domains"]) if i not in invalid
+                ],
+            )
+        settings = parse(config_data)
+        settings["config_mtime"] = file_mtime()
+        for name, value in settings.items():
+            globals().setdefault(name, value)
+        _loaded = True
 
-# 更新检查间隔（分钟）
-check_interval = config_data.get("check_interval", 15)
 
-# 获取所有域名配置
-DOMAINS = config_data.get("domains", [])
+def __getattr__(name: str):
+    """配置项懒加载，只导入本模块不会读取配置文件"""
+    if name.startswith("__") or _loaded:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    ensure_loaded()
+    try:
+        return globals()[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
@@ -0,0 +1,139 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from planner import RecordAction
+
+# 记录键在持久化数据中的分隔符
+KEY_SEPARATOR = "|"
+
+
+class DampingPolicy:
+    """变更抑制策略，避免延迟的微小波动导致记录反复改写
+
+    只作用于修改操作：新IP比当前IP快出的幅度必须同时超过绝对阈值和相对阈值才会
+    切换；每条记录切换后至少保持一段时间；每个周期的修改数量有上限，超出时优先
+    保留收益最大的修改。当前IP不可达时不受以上限制，立即切换。
+    """
+
+    def __init__(
+        self,
+        min_gain_ms: float = 0,
+        min_gain_ratio: float = 0,
+        min_hold: float = 0,
+        max_changes: int = 0,
+    ):
+        # 最小延迟改善（毫秒）
+        self.min_gain_ms = min_gain_ms
+        # 最小相对改善比例，0.1表示至少快10%
+        self.min_gain_ratio = min_gain_ratio
+        # 记录切换后的最短保持时间（秒）
+        self.min_hold = min_hold
+        # 每周期最多修改的记录数，0表示不限
+        self.max_changes = max_changes
+        # 各记录最近一次切换的时间，格式: {(主域名, 子域名, 线路, 记录类型): 时间戳}
+        self.changed_at: Dict[tuple, float] = {}
+        self.suppressed = {"margin": 0, "hold": 0, "budget": 0}
+        self.applied = 0
+        self.forced = 0
+        self._lock = threading.Lock()
+
+    def filter(
+        self,
+        plan: List[RecordAction],
+        latency_of: Callable[[str, str], Optional[float]],
+        reachable: Callable[[str], bool],
+        count: bool = True,
+    ) -> List[RecordAction]:
+        """过滤变更计划，返回需要执行的变更
+
+        latency_of(ip, 线路) 返回当前IP在该线路上的延迟，不在优选列表中时返回None；
+        reachable(ip) 返回当前IP是否可达。count为False时不计入抑制和强制切换次数，
+        用于只预览计划、不执行的场景。
+        """
+        now = time.time()
+        kept, candidates = [], []
+        suppressed = {reason: 0 for reason in self.suppressed}
+        forced = 0
+        for action in plan:
+            if action.action != "modify" or action.old_value == action.value:
+                kept.append(action)
+                continue
+
+            if not reachable(action.old_value):
+                # 当前IP已不可达，必须立即切换
+                forced += 1
+                kept.append(action)
+                continue
+
+            key = (action.domain, action.sub_domain, action.line, action.record_type)
+            changed_at = self.changed_at.get(key)
+            if changed_at is not None and now - changed_at < self.min_hold:
+                suppressed["hold"] += 1
+                continue
+
+            current_latency = latency_of(action.old_value, action.line)
+            if current_latency is None:
+                # 当前IP已不在优选列表中，视为收益无限大
+                gain = float("inf")
+            else:
+                gain = current_latency - action.latency
+                if gain < self.min_gain_ms or gain < current_latency * self.min_gain_ratio:
+                    suppressed["margin"] += 1
+                    continue
+            candidates.append((gain, action))
+
+        if self.max_changes and len(candidates) > self.max_changes:
+            candidates.sort(key=lambda x: x[0], reverse=True)
+            suppressed["budget"] += len(candidates) - self.max_changes
+            candidates = candidates[: self.max_changes]
+
+        if count:
+            with self._lock:
+                self.forced += forced
+                for reason, n in suppressed.items():
+                    self.suppressed[reason] += n
+
+        chosen = set(kept) | {action for _, action in candidates}
+        return [action for action in plan if action in chosen]
+
+    def record_applied(self, actions: List[RecordAction]):
+        """记录执行成功的修改，开始计算保持时间"""
+        now = time.time()
+        with self._lock:
+            for action in actions:
+                if action.action == "delete":
+                    continue
+                key = (action.domain, action.sub_domain, action.line, action.record_type)
+                self.changed_at[key] = now
+                if action.action == "modify":
+                    self.applied += 1
+
+    def forget(self, domain: str, sub_domain: str):
+        """移除某个子域名所有记录的切换时间"""
+        with self._lock:
+            for key in [k for k in self.changed_at if k[:2] == (domain, sub_domain)]:
+                del self.changed_at[key]
+
+    def stats(self) -> Dict:
+        """已执行、被抑制及强制切换的修改次数"""
+        with self._lock:
+            return {
+                "applied": self.applied,
+                "forced": self.forced,
+                "suppressed": dict(self.suppressed),
+            }
+
+    def dump(self) -> Dict:
+        """导出各记录的切换时间，用于持久化"""
+        with self._lock:
+            return {
+                KEY_SEPARATOR.join(key): changed_at
+                for key, changed_at in self.changed_at.items()
+            }
+
+    def restore(self, changed_at: Dict):
+        """从持久化数据恢复各记录的切换时间"""
+        with self._lock:
+            for key, timestamp in changed_at.items():
+                self.changed_at[tuple(key.split(KEY_SEPARATOR))] = timestamp
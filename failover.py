@@ -0,0 +1,60 @@
+import threading
+from typing import Dict, Iterable, List
+
+
+class FailoverWatcher:
+    """已发布IP的连续失败计数
+
+    每次探测后记录结果，某个IP连续失败达到阈值时判定为故障，需要立即切换；
+    探测成功会清零计数，避免偶发丢包触发切换。线程安全。
+    """
+
+    def __init__(self, threshold: int = 3):
+        # 判定故障所需的连续失败次数
+        self.threshold = max(1, threshold)
+        # 格式: {ip: 连续失败次数}
+        self.failures: Dict[str, int] = {}
+        self.triggered = 0
+        self.repointed = 0
+        self._lock = threading.Lock()
+
+    def record(self, results: Dict[str, bool]) -> List[str]:
+        """记录一轮探测结果，返回本轮刚达到故障阈值的IP
+
+        results格式: {ip: 是否可达}。不在本轮结果中的IP已不再发布，其计数被清除。
+        """
+        failed = []
+        with self._lock:
+            for ip in [ip for ip in self.failures if ip not in results]:
+                del self.failures[ip]
+            for ip, available in results.items():
+                if available:
+                    self.failures.pop(ip, None)
+                    continue
+                count = self.failures.get(ip, 0) + 1
+                self.failures[ip] = count
+                # 阈值可能在重新加载配置时调低，计数已超过阈值的IP同样判定为故障
+                if count >= self.threshold:
+                    failed.append(ip)
+                    self.triggered += 1
+        return failed
+
+    def is_suspect(self, ip: str) -> bool:
+        """IP最近是否探测失败过，挑选替换IP时跳过"""
+        return ip in self.failures
+
+    def resolved(self, ips: Iterable[str], repointed: int):
+        """故障IP的记录已经切换，清零计数"""
+        with self._lock:
+            for ip in ips:
+                self.failures.pop(ip, None)
+            self.repointed += repointed
+
+    def stats(self) -> Dict:
+        """判定故障和完成切换的次数"""
+        with self._lock:
+            return {
+                "watching": len(self.failures),
+                "triggered": self.triggered,
+                "repointed": self.repointed,
+            }
@@ -0,0 +1,350 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Dict, List, Optional
+
+import yaml
+from loguru import logger
+
+import config
+import spans
+from metrics import FEED_FETCH_DURATION
+from ranking import IP_VERSIONS, LINE_KEYS, CandidateTable
+
+# 数据源只给出IP、没有延迟时使用的默认延迟（毫秒）
+STATIC_LATENCY = 999
+
+
+class FeedSnapshot:
+    """某一次拉取到的优选IP数据快照，创建时一次性建立候选IP排序表，之后不再修改"""
+
+    def __init__(self, data: Dict, fetched_at: float = None, table: CandidateTable = None):
+        self.data = data
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        # 候选IP列式表，按评分预先排好序，不会修改原始数据
+        self.table = table or CandidateTable(data)
+
+    def with_table(self, table: CandidateTable) -> "FeedSnapshot":
+        """使用另一份排序表的同一快照，例如按本机测量结果重新排序后的表"""
+        return FeedSnapshot(self.data, self.fetched_at, table)
+
+    def has_version(self, ip_version: str) -> bool:
+        """快照中是否包含指定版本的IP"""
+        return self.table.has_version(ip_version)
+
+    def line_ips(self, ip_version: str, line_key: str) -> List[Dict]:
+        """指定版本、线路按评分排列的IP列表"""
+        return [self.table.info[row] for row in self.table.rows(ip_version, line_key)]
+
+    def all_ips(self, ip_version: str) -> List[Dict]:
+        """指定版本所有线路按评分排列的IP列表"""
+        return [self.table.info[row] for row in self.table.rows(ip_version)]
+
+    def age(self) -> float:
+        """快照已存在的时间（秒）"""
+        return time.time() - self.fetched_at
+
+
+class SourceHealth:
+    """数据源健康状况，延迟和错误率使用指数加权移动平均"""
+
+    # 新样本的权重
+    ALPHA = 0.3
+
+    def __init__(self):
+        self.latency: Optional[float] = None  # 平均响应时间（秒）
+        self.error_rate = 0.0
+        self.last_success: Optional[float] = None
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, elapsed: float, success: bool):
+        """记录一次请求结果"""
+        with self._lock:
+            self.requests += 1
+            if not success:
+                self.errors += 1
+            else:
+                self.last_success = time.time()
+            error = 0.0 if success else 1.0
+            if self.latency is None:
+                # 第一个样本直接作为初值
+                self.latency, self.error_rate = elapsed, error
+            else:
+                self.latency += self.ALPHA * (elapsed - self.latency)
+                self.error_rate += self.ALPHA * (error - self.error_rate)
+
+    def is_healthy(self, max_error_rate: float, max_latency: float) -> bool:
+        """错误率和平均响应时间都在阈值内，从未请求过的数据源视为健康"""
+        if self.error_rate > max_error_rate:
+            return False
+        return self.latency is None or self.latency <= max_latency
+
+    def freshness(self) -> Optional[float]:
+        """距离上次成功的时间（秒），从未成功返回None"""
+        return None if self.last_success is None else time.time() - self.last_success
+
+    def stats(self) -> Dict:
+        """健康状况摘要"""
+        with self._lock:
+            return {
+                "latency": self.latency,
+                "error_rate": self.error_rate,
+                "requests": self.requests,
+                "errors": self.errors,
+                "freshness": self.freshness(),
+            }
+
+
+def normalize_data(data: Dict) -> Dict:
+    """把各数据源的数据整理为统一格式
+
+    格式: {'v4': {'CM': [{'ip': ..., 'latency': ...}, ...], ...}, 'v6': {...}}。
+    列表元素可以直接写IP字符串，此时延迟取一个较大的默认值，使其排在有实测延迟的IP之后。
+    """
+    # 兼容接口原始返回格式 {'success': true, 'data': {...}}
+    if "success" in data:
+        if not data.get("success"):
+            raise ValueError("数据源返回失败")
+        data = data.get("data") or {}
+
+    normalized = {}
+    for version in IP_VERSIONS:
+        lines = data.get(version) or {}
+        if not isinstance(lines, dict):
+            raise ValueError(f"{version} 数据格式错误")
+        for line_key in LINE_KEYS:
+            items = []
+            for item in lines.get(line_key) or []:
+                if isinstance(item, str):
+                    item = {"ip": item, "latency": STATIC_LATENCY}
+                if not item.get("ip"):
+                    raise ValueError(f"{version} - {line_key} 中存在缺少IP的条目")
+                items.append(dict(item, latency=item.get("latency", STATIC_LATENCY)))
+            if items:
+                normalized.setdefault(version, {})[line_key] = items
+    if not normalized:
+        raise ValueError("数据源中没有任何IP")
+    return normalized
+
+
+def merge_data(datas: List[Dict]) -> Dict:
+    """合并多个数据源的结果，同一版本、线路下的重复IP保留延迟最低的一条"""
+    merged = {}
+    for data in datas:
+        for version, lines in data.items():
+            for line_key, items in lines.items():
+                line_items = merged.setdefault(version, {}).setdefault(line_key, {})
+                for item in items:
+                    old = line_items.get(item["ip"])
+                    if old is None or item["latency"] < old["latency"]:
+                        line_items[item["ip"]] = item
+    return {
+        version: {line_key: list(items.values()) for line_key, items in lines.items()}
+        for version, lines in merged.items()
+    }
+
+
+class FeedSource:
+    """优选IP数据源基类"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.health = SourceHealth()
+        # 上一次请求是否还在进行，避免慢数据源的请求堆积；由IPFeed在提交请求时设置
+        self.busy = False
+
+    def load(self) -> Dict:
+        """读取原始数据，失败时抛出异常"""
+        raise NotImplementedError
+
+    def fetch(self) -> Dict:
+        """读取并整理数据，同时记录健康状况，结束后清除busy"""
+        start = time.time()
+        try:
+            data = normalize_data(self.load())
+        except Exception:
+            self.health.record(time.time() - start, False)
+            raise
+        finally:
+            self.busy = False
+            FEED_FETCH_DURATION.observe(time.time() - start, self.name)
+        self.health.record(time.time() - start, True)
+        return data
+
+
+class HttpSource(FeedSource):
+    """HTTP接口数据源"""
+
+    def __init__(self, name: str, url: str, timeout: float = 10):
+        super().__init__(name)
+        self.url = url
+        self.timeout = timeout
+
+    def load(self) -> Dict:
+        # requests导入较慢，只在使用HTTP数据源时导入
+        import requests
+
+        response = requests.get(self.url, timeout=self.timeout)
+        return response.json()
+
+
+class StaticSource(FeedSource):
+    """配置文件中写死的IP列表"""
+
+    def __init__(self, name: str, ips: Dict):
+        super().__init__(name)
+        self.ips = ips
+
+    def load(self) -> Dict:
+        return self.ips
+
+
+class FileSource(FeedSource):
+    """本地JSON或YAML文件数据源，每次读取最新内容"""
+
+    def __init__(self, name: str, path: str):
+        super().__init__(name)
+        self.path = path
+
+    def load(self) -> Dict:
+        with open(self.path, "r", encoding="utf-8") as f:
+            if self.path.endswith((".yaml", ".yml")):
+                return yaml.safe_load(f)
+            return json.load(f)
+
+
+def build_sources(feed_configs: List[Dict]) -> List[FeedSource]:
+    """根据配置创建数据源，未配置时使用默认接口"""
+    if not feed_configs:
+        return [HttpSource("default", config.API_URL)]
+
+    sources = []
+    for i, feed_config in enumerate(feed_configs):
+        source_type = feed_config.get("type", "http")
+        name = feed_config.get("name") or f"{source_type}-{i}"
+        if source_type == "http":
+            sources.append(
+                HttpSource(name, feed_config["url"], feed_config.get("timeout", 10))
+            )
+        elif source_type == "static":
+            sources.append(StaticSource(name, feed_config.get("ips", {})))
+        elif source_type == "file":
+            sources.append(FileSource(name, feed_config["path"]))
+        else:
+            logger.error(f"未知的优选IP数据源类型: {source_type}，已忽略 {name}")
+    return sources
+
+
+class IPFeed:
+    """优选IP数据源，每个检查周期拉取一次，拉取失败时回退到最近一次成功的快照"""
+
+    def __init__(self, sources: List[FeedSource] = None, max_age: int = None):
+        # 最近一次成功快照的最长可用时间（分钟）
+        self.max_age = max_age if max_age is not None else config.feed_max_age
+        # 合并方式: first 使用最先返回的健康数据源，merge 合并所有在截止时间内返回的数据源
+        self.mode = config.feed_mode
+        # 单次拉取的截止时间（秒）
+        self.deadline = config.feed_deadline
+        self.last_good: Optional[FeedSnapshot] = None
+        # 保护各数据源的busy标记，定时任务和检查周期可能同时拉取
+        self._submit_lock = threading.Lock()
+        self.set_sources(sources or build_sources(config.FEEDS))
+
+    def set_sources(self, sources: List[FeedSource]):
+        """替换数据源，最近一次成功的快照保持不变"""
+        old_pool = getattr(self, "_pool", None)
+        self.sources = sources
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, len(self.sources)), thread_name_prefix="feed"
+        )
+        if old_pool:
+            # 不等待旧数据源尚未结束的请求
+            old_pool.shutdown(wait=False)
+
+    def dump(self) -> Optional[Dict]:
+        """导出最近一次成功的快照，用于持久化"""
+        if not self.last_good:
+            return None
+        return {"data": self.last_good.data, "fetched_at": self.last_good.fetched_at}
+
+    def restore(self, state: Dict):
+        """从持久化数据恢复最近一次成功的快照"""
+        self.last_good = FeedSnapshot(state["data"], state["fetched_at"])
+
+    def is_healthy(self, source: FeedSource) -> bool:
+        """数据源是否健康，错误率过高或响应过慢的数据源会被降级"""
+        return source.health.is_healthy(config.feed_max_error_rate, self.deadline)
+
+    def fetch(self) -> Optional[Dict]:
+        """并发请求所有数据源，在截止时间内返回结果
+
+        first模式下最先返回的健康数据源立即生效，被降级的数据源只在没有健康数据源
+        返回时使用；merge模式下合并截止时间内返回的所有结果。
+        """
+        futures = {}
+        with self._submit_lock:
+            for source in self.sources:
+                if source.busy:
+                    logger.warning(f"优选IP数据源 {source.name} 上一次请求尚未结束，跳过")
+                    continue
+                # 提交前就标记，避免同时拉取时重复提交同一个慢数据源
+                source.busy = True
+                try:
+                    futures[self._pool.submit(spans.bind(source.fetch))] = source
+                except RuntimeError:
+                    source.busy = False
+                    raise
+
+        results, fallback = [], []
+        try:
+            for future in as_completed(futures, timeout=self.deadline):
+                source = futures[future]
+                try:
+                    data = future.result()
+                except Exception as e:
+                    logger.error(f"获取优选IP失败（{source.name}）: {str(e)}")
+                    continue
+                if self.mode == "merge":
+                    results.append(data)
+                elif self.is_healthy(source):
+                    return data
+                else:
+                    fallback.append(data)
+        except FuturesTimeoutError:
+            pending = [futures[f].name for f in futures if not f.done()]
+            logger.warning(f"优选IP数据源超过截止时间未返回: {', '.join(pending)}")
+
+        if results:
+            return merge_data(results)
+        if fallback:
+            return fallback[0]
+        logger.error("获取优选IP失败: 没有可用的数据源")
+        return None
+
+    def source_stats(self) -> Dict[str, Dict]:
+        """各数据源的健康状况"""
+        return {source.name: source.health.stats() for source in self.sources}
+
+    def refresh(self) -> Optional[FeedSnapshot]:
+        """拉取一份新的快照，失败时返回仍在有效期内的上一份快照"""
+        data = self.fetch()
+        for name, stats in self.source_stats().items():
+            latency = "-" if stats["latency"] is None else f"{stats['latency']:.2f}秒"
+            logger.debug(
+                f"优选IP数据源 {name}: 平均耗时 {latency}, "
+                f"错误率 {stats['error_rate']:.0%}, 请求 {stats['requests']} 次"
+            )
+        if data:
+            self.last_good = FeedSnapshot(data)
+            return self.last_good
+
+        if self.last_good and self.last_good.age() < self.max_age * 60:
+            logger.warning(
+                f"使用上一次获取的优选IP（{int(self.last_good.age())}秒前）"
+            )
+            return self.last_good
+        return None
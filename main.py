@@ -1,48 +1,188 @@
-import json
 import time
-import requests
-import schedule
+
+# 进程启动时间，用于统计启动耗时
+STARTED_AT = time.perf_counter()
+
+import argparse
+import json
+import random
+import signal
+import threading
 from loguru import logger
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 import config
-from tencentcloud.common import credential
-from tencentcloud.common.profile.client_profile import ClientProfile
-from tencentcloud.common.profile.http_profile import HttpProfile
-from tencentcloud.dnspod.v20210323 import dnspod_client, models
-import subprocess
-import os
-from datetime import datetime, timedelta
+from accounts import Account, AccountPool
+from cache import ReachabilityCache
+from damping import DampingPolicy
+from failover import FailoverWatcher
+from feed import IPFeed, FeedSnapshot, build_sources
+import metrics
+import spans
+from planner import (
+    RecordAction,
+    build_plan,
+    format_action,
+    group_by_sub_domain,
+    plan_domain,
+)
+from prober import Prober
+from ranking import IP_VERSIONS, weighted_score
+from scheduler import Scheduler
+from records import RecordEntry, RecordIndex
+from state import StateStore
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import (
+    TencentCloudSDKException,
+)
+
+# 程序管理的线路，其他线路的记录不会被修改或删除
+MANAGED_LINES = ["默认", "移动", "联通", "电信"]
+
+# 优选IP接口线路标识与DNSPod线路名称的对应关系
+LINE_NAMES = {"CM": "移动", "CU": "联通", "CT": "电信"}
+LINE_KEYS = {name: key for key, name in LINE_NAMES.items()}
+
+# DescribeRecordList单页最大记录数
+RECORD_PAGE_SIZE = 3000
 
-# 配置日志
-logger.add("logs/dnspod.log", rotation="10 MB", level=config.LOG_LEVEL)
+# 批量任务是异步执行的，提交后查询结果的次数和间隔（秒）
+BATCH_POLL_ATTEMPTS = 5
+BATCH_POLL_INTERVAL = 1
+# 同一主域名下同类变更达到该数量才合并为批量任务
+BATCH_MIN_SIZE = 3
+
+
+def setup_logging():
+    """配置日志文件"""
+    logger.add("logs/dnspod.log", rotation="10 MB", level=config.LOG_LEVEL)
+
+
+def dnspod_models():
+    """DNSPod接口的请求模型，模块较大，第一次调用接口时才导入"""
+    from tencentcloud.dnspod.v20210323 import models
+
+    return models
 
 
 class DNSPodManager:
-    def __init__(self):
-        # 实例化一个认证对象
-        cred = credential.Credential(config.SECRET_ID, config.SECRET_KEY)
-        # 实例化一个http选项，可选的，没有特殊需求可以跳过
-        httpProfile = HttpProfile()
-        httpProfile.endpoint = "dnspod.tencentcloudapi.com"
-        # 实例化一个client选项，可选的，没有特殊需求可以跳过
-        clientProfile = ClientProfile()
-        clientProfile.httpProfile = httpProfile
-        # 实例化要请求产品的client对象
-        self.client = dnspod_client.DnspodClient(cred, "", clientProfile)
-        # 记录当前使用的IP
-        self.current_ips = (
-            {}
-        )  # 格式: {domain: {'默认': {'A': ip, 'AAAA': ip}, '移动': {...}}}
-        # IP可用性缓存，格式：{ip: {'available': bool, 'last_check': datetime}}
-        self.ip_availability_cache = {}
-        # IP可用性缓存时间设置为检查间隔的1/3
-        self.cache_duration = max(1, config.check_interval // 3)
+    def __init__(
+        self,
+        client=None,
+        feed: IPFeed = None,
+        prober: Prober = None,
+        init_records: bool = True,
+    ):
+        """client、feed、prober 可以传入替代实现，用于离线测试和性能基准
+
+        init_records为False时不在初始化时查询并打印所有域名的记录，由第一个检查周期
+        按需查询，用于只执行一次的命令。
+        """
+        # 账号池，每个账号一个客户端和独立的接口限速器，同一账号的并发任务共用
+        self.accounts = AccountPool.single(client) if client else AccountPool.from_config()
+        # IP可用性缓存，容量固定，可达与不可达结果分别设置有效期
+        self.availability_cache = ReachabilityCache(
+            config.cache_max_size,
+            config.cache_positive_ttl * 60,
+            config.cache_negative_ttl * 60,
+            config.cache_jitter,
+        )
+        # 优选IP数据源，每个检查周期只拉取一次，所有域名共用
+        self.feed = feed or IPFeed()
+        # 并发可达性探测器
+        self.prober = prober or Prober()
+        # 解析记录索引，每个主域名每周期只查询一次
+        self.record_index = RecordIndex()
+        # 变更抑制策略，避免延迟微小波动导致记录反复改写
+        self.damping = DampingPolicy(
+            config.damping_min_gain_ms,
+            config.damping_min_gain_ratio,
+            config.damping_min_hold * 60,
+            config.damping_max_changes,
+        )
+        # 已发布IP的连续失败计数，用于快速切换
+        self.failover = FailoverWatcher(config.failover_threshold)
+        # 最近一个周期选出的各线路最优IP，重新加载配置时用于新增的域名
+        self.last_selected: Optional[Dict] = None
+        # 最近一个周期按本机测量结果重新排序的快照，整体替换，不修改feed中共用的快照
+        self.last_ranked: Optional[FeedSnapshot] = None
+        # 各主域名的域名ID，批量创建记录时使用
+        self.domain_ids: Dict[str, int] = {}
+        # 最近一个周期的耗时分解
+        self.last_breakdown: Optional[Dict] = None
+        # 检查周期与重新加载配置互斥，避免同时修改索引和域名列表
+        self.cycle_lock = threading.RLock()
+        # 状态文件，重启后恢复索引、缓存和优选IP快照
+        self.state_store = StateStore(config.state_file)
+        # 第一个检查周期是否沿用状态文件恢复或启动时刚加载的记录索引
+        self.trust_loaded_index = True
+        self.register_metrics()
+        self.restore_state()
         # 初始化时获取所有域名当前的记录
-        self.init_current_records()
+        if init_records:
+            self.init_current_records()
+
+    def register_metrics(self):
+        """缓存统计和已发布IP在采集时读取，不在热路径上额外计数"""
+        cache = self.availability_cache
+        metrics.CACHE_HITS.set_function(lambda: {(): cache.stats()["hits"]})
+        metrics.CACHE_MISSES.set_function(lambda: {(): cache.stats()["misses"]})
+        metrics.CACHE_EVICTIONS.set_function(lambda: {(): cache.stats()["evictions"]})
+        metrics.CACHE_SIZE.set_function(lambda: {(): cache.stats()["size"]})
+        metrics.PUBLISHED_IPS.set_function(self.published_ip_counts)
+
+    def published_ip_counts(self) -> Dict[Tuple[str, str], int]:
+        """各线路、记录类型当前发布的不同IP数，格式: {(线路, 记录类型): 数量}"""
+        ips = {}
+        for domain_config in config.DOMAINS:
+            if not domain_config["enabled"]:
+                continue
+            current_records = self.record_index.sub_domain_records(
+                domain_config["domain"], domain_config["sub_domain"]
+            )
+            for line, records in current_records.items():
+                if line not in MANAGED_LINES:
+                    continue
+                for record_type, value in records.items():
+                    # @ 等子域名下还有NS、MX等记录，只统计程序管理的A/AAAA记录
+                    if record_type in ("A", "AAAA"):
+                        ips.setdefault((line, record_type), set()).add(value)
+        return {key: len(values) for key, values in ips.items()}
+
+    def restore_state(self):
+        """从状态文件恢复上次运行的索引、可用性缓存和优选IP快照"""
+        state = self.state_store.load()
+        if not state:
+            return
+        try:
+            self.record_index.restore(state.get("records", {}))
+            self.availability_cache.restore(state.get("availability", {}))
+            if state.get("feed"):
+                self.feed.restore(state["feed"])
+            self.damping.restore(state.get("damping", {}))
+            logger.info(
+                f"已从状态文件恢复 {len(state.get('records', {}))} 个域名的记录、"
+                f"{len(state.get('availability', {}))} 个IP的可用性缓存"
+            )
+        except Exception as e:
+            logger.error(f"恢复状态失败，将重新获取: {str(e)}")
+            self.record_index = RecordIndex()
+
+    def save_state(self):
+        """把当前索引、可用性缓存和优选IP快照写入状态文件"""
+        self.state_store.save(
+            {
+                "records": self.record_index.dump(),
+                "availability": self.availability_cache.dump(),
+                "feed": self.feed.dump(),
+                "damping": self.damping.dump(),
+            }
+        )
 
     def init_current_records(self):
         """初始化时获取所有域名当前的解析记录"""
         logger.info("正在获取所有域名当前的解析记录...")
+        # 状态文件中未过期的域名直接使用，不再重新查询
+        self.refresh_record_index(max_age=config.state_ttl * 60)
         for domain_config in config.DOMAINS:
             if not domain_config["enabled"]:
                 continue
@@ -53,7 +193,6 @@ class DNSPodManager:
             # 获取当前记录
             current_records = self.get_current_records(domain, sub_domain)
             if current_records:
-                self.current_ips[domain] = current_records
                 logger.info(f"域名 {domain} - {sub_domain} 当前记录：")
                 for line, records in current_records.items():
                     for record_type, ip in records.items():
@@ -61,107 +200,178 @@ class DNSPodManager:
             else:
                 logger.warning(f"域名 {domain} - {sub_domain} 暂无解析记录")
 
-    def get_optimal_ips(self) -> Dict:
-        """获取优选IP"""
-        try:
-            response = requests.get(config.API_URL)
-            data = response.json()
-            if data.get("success"):
-                return data["data"]
-            raise Exception("API返回数据格式错误")
-        except Exception as e:
-            logger.error(f"获取优选IP失败: {str(e)}")
-            return None
+    def latest_snapshot(self) -> Optional[FeedSnapshot]:
+        """最近一次的优选IP快照，检查周期已按本机测量结果重新排序时使用排序后的快照"""
+        snapshot = self.feed.last_good
+        ranked = self.last_ranked
+        if ranked and snapshot and ranked.data is snapshot.data:
+            return ranked
+        return snapshot
 
-    def find_best_ip(self, ip_data: Dict, ip_version: str) -> Optional[Tuple[str, int]]:
-        """查找延迟最低的IP，返回(IP, 延迟)"""
-        best_ip = None
-        min_latency = float("inf")
+    def get_optimal_ips(self) -> Optional[FeedSnapshot]:
+        """获取优选IP快照"""
+        return self.feed.refresh()
 
-        # 遍历所有线路
-        for line_key in ["CM", "CU", "CT"]:
-            if line_key in ip_data[ip_version]:
-                ips = ip_data[ip_version][line_key]
-                for ip_info in ips:
-                    if ip_info["latency"] < min_latency:
-                        min_latency = ip_info["latency"]
-                        best_ip = (ip_info["ip"], ip_info["latency"])
+    def current_snapshot(self) -> Optional[FeedSnapshot]:
+        """获取当前可用的优选IP快照，最近一次快照未超过刷新间隔时直接使用"""
+        snapshot = self.feed.last_good
+        max_age = config.feed_interval * 60 * (1 + config.schedule_jitter)
+        if snapshot and snapshot.age() < max_age:
+            return snapshot
+        return self.get_optimal_ips()
 
-        return best_ip
+    def find_best_ip(
+        self, snapshot: FeedSnapshot, ip_version: str
+    ) -> Optional[Tuple[str, int]]:
+        """查找延迟最低的IP，返回(IP, 延迟)"""
+        return snapshot.table.best(ip_version)
 
     def find_line_best_ip(
-        self, ip_data: Dict, ip_version: str, line_key: str
+        self, snapshot: FeedSnapshot, ip_version: str, line_key: str
     ) -> Optional[Tuple[str, int]]:
         """查找指定线路延迟最低的IP"""
-        if line_key not in ip_data[ip_version]:
-            return None
+        return snapshot.table.best(ip_version, line_key)
 
-        ips = ip_data[ip_version][line_key]
-        if not ips:
-            return None
+    def concurrency(self) -> int:
+        """并发任务数，各账号独立限速，按账号数放大"""
+        return config.workers * max(1, len(self.accounts.names()))
 
-        best_ip = min(ips, key=lambda x: x["latency"])
-        return (best_ip["ip"], best_ip["latency"])
+    def timed_call(self, account: Account, action: str, req):
+        """用指定账号调用一次DNSPod接口，记录耗时和错误码"""
+        start = time.perf_counter()
+        try:
+            with spans.span(spans.API, action):
+                return getattr(account.client, action)(req)
+        except TencentCloudSDKException as e:
+            metrics.API_ERRORS.inc(action, str(e.get_code()), account.name)
+            raise
+        except Exception:
+            metrics.API_ERRORS.inc(action, "ClientError", account.name)
+            raise
+        finally:
+            metrics.API_DURATION.observe(
+                time.perf_counter() - start, action, account.name
+            )
+
+    def call_api(self, action: str, req, domain: str):
+        """用主域名所属账号限速调用DNSPod接口，触发频率限制时指数退避重试"""
+        account = self.accounts.for_domain(domain)
+        for attempt in range(config.api_max_retries + 1):
+            spans.record(spans.SLEEP, f"限速 {action}", account.rate_limiter.acquire(action))
+            try:
+                return self.timed_call(account, action, req)
+            except TencentCloudSDKException as e:
+                if not str(e.get_code()).startswith("RequestLimitExceeded"):
+                    raise
+                if attempt >= config.api_max_retries:
+                    raise
+                backoff = (2**attempt) * (1 + random.random())
+                logger.warning(
+                    f"账号 {account.name} 接口 {action} 触发频率限制，{backoff:.1f}秒后重试（第{attempt + 1}次）"
+                )
+                spans.sleep(f"退避 {action}", backoff)
 
     def get_record_list(
         self, domain: str, sub_domain: str = None, record_type: str = None
-    ) -> List:
-        """获取域名记录列表"""
+    ) -> Optional[List]:
+        """分页获取域名记录列表，失败返回None"""
+        records = []
         try:
-            # 实例化一个请求对象
-            req = models.DescribeRecordListRequest()
-            req.Domain = domain
-            if sub_domain:
-                req.Subdomain = sub_domain
-            if record_type:
-                req.RecordType = record_type
-
-            # 通过client对象调用DescribeRecordList接口
-            resp = self.client.DescribeRecordList(req)
-            return resp.RecordList
+            while True:
+                # 实例化一个请求对象
+                req = dnspod_models().DescribeRecordListRequest()
+                req.Domain = domain
+                if sub_domain:
+                    req.Subdomain = sub_domain
+                if record_type:
+                    req.RecordType = record_type
+                req.Offset = len(records)
+                req.Limit = RECORD_PAGE_SIZE
+
+                # 通过client对象调用DescribeRecordList接口
+                resp = self.call_api("DescribeRecordList", req, domain)
+                records.extend(resp.RecordList or [])
+                if not resp.RecordList or len(records) >= resp.RecordCountInfo.TotalCount:
+                    return records
+        except TencentCloudSDKException as e:
+            # 域名下没有任何记录时接口返回错误
+            if e.get_code() == "ResourceNotFound.NoDataOfRecord":
+                return records
+            logger.error(f"获取记录列表失败: {str(e)}")
+            return None
         except Exception as e:
             logger.error(f"获取记录列表失败: {str(e)}")
-            return []
+            return None
+
+    def refresh_record_index(self, domains: List[str] = None, max_age: float = None):
+        """按主域名整体拉取记录，重建解析记录索引
+
+        指定max_age（秒）时，加载时间未超过max_age的主域名不再重新查询。
+        """
+        if domains is None:
+            domains = [c["domain"] for c in config.DOMAINS if c["enabled"]]
+
+        stale = []
+        for domain in dict.fromkeys(domains):
+            age = self.record_index.zone_age(domain)
+            if max_age is None or age is None or age >= max_age:
+                stale.append(domain)
+        if not stale:
+            return
+
+        def load(domain):
+            records = self.get_record_list(domain)
+            # 拉取失败时保留原有索引
+            if records is not None:
+                self.record_index.load_zone(domain, records)
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency(), len(stale))) as pool:
+            list(pool.map(spans.bind(load), stale))
 
     def delete_record(self, domain: str, record_id: int) -> bool:
         """删除DNS记录"""
         try:
-            req = models.DeleteRecordRequest()
+            req = dnspod_models().DeleteRecordRequest()
             req.Domain = domain
             req.RecordId = record_id
-            self.client.DeleteRecord(req)
+            self.call_api("DeleteRecord", req, domain)
             return True
         except Exception as e:
             logger.error(f"删除记录失败: {str(e)}")
             return False
 
-    def clean_existing_records(
-        self, domain: str, sub_domain: str, record_type: str, line: str
-    ) -> None:
-        """清理指定类型和线路的现有记录"""
+    def create_record(
+        self,
+        domain: str,
+        sub_domain: str,
+        record_type: str,
+        line: str,
+        value: str,
+        ttl: int,
+        remark: str = None,
+    ) -> Optional[int]:
+        """创建DNS记录，返回新记录ID，失败返回None"""
         try:
-            # 定义我们要管理的线路
-            managed_lines = ["默认", "移动", "联通", "电信"]
-
-            # 如果不是我们管理的线路，直接返回
-            if line not in managed_lines:
-                return
-
-            records = self.get_record_list(domain, sub_domain, record_type)
-            for record in records:
-                # 只删除我们管理的线路中的记录
-                if record.Line == line and record.Line in managed_lines:
-                    logger.info(
-                        f"删除旧记录: {domain} - {sub_domain} - {line} - {record.Value}"
-                    )
-                    self.delete_record(domain, record.RecordId)
-                    time.sleep(1)  # 添加短暂延时
+            req = dnspod_models().CreateRecordRequest()
+            req.Domain = domain
+            req.SubDomain = sub_domain
+            req.RecordType = record_type
+            req.RecordLine = line
+            req.Value = value
+            req.TTL = ttl
+            if remark:
+                req.Remark = remark
+
+            resp = self.call_api("CreateRecord", req, domain)
+            return resp.RecordId
         except Exception as e:
-            logger.error(f"清理记录时出错: {str(e)}")
+            logger.error(f"创建DNS记录失败: {str(e)}")
+            return None
 
-    def update_record(
+    def modify_record(
         self,
         domain: str,
+        record_id: int,
         sub_domain: str,
         record_type: str,
         line: str,
@@ -169,15 +379,12 @@ class DNSPodManager:
         ttl: int,
         remark: str = None,
     ) -> bool:
-        """更新或创建DNS记录"""
+        """原地修改DNS记录，解析不会出现空窗期"""
         try:
-            # 先清理现有记录
-            self.clean_existing_records(domain, sub_domain, record_type, line)
-            time.sleep(1)  # 添加短暂延时
-
-            # 创建新记录
-            req = models.CreateRecordRequest()
+            req = dnspod_models().ModifyRecordRequest()
             req.Domain = domain
+            req.RecordId = record_id
+            # SubDomain不传时会被改成@，必须带上
             req.SubDomain = sub_domain
             req.RecordType = record_type
             req.RecordLine = line
@@ -186,283 +393,905 @@ class DNSPodManager:
             if remark:
                 req.Remark = remark
 
-            self.client.CreateRecord(req)
+            self.call_api("ModifyRecord", req, domain)
             return True
         except Exception as e:
-            logger.error(f"更新DNS记录失败: {str(e)}")
+            logger.error(f"修改DNS记录失败: {str(e)}")
             return False
 
-    def get_current_records(self, domain: str, sub_domain: str) -> Dict:
-        """获取当前域名的所有记录"""
+    def execute_action(self, action: RecordAction) -> bool:
+        """执行单条记录变更，成功后同步更新索引"""
+        if action.line not in MANAGED_LINES:
+            return False
+
+        key = (action.domain, action.sub_domain, action.line, action.record_type)
+        if action.action == "create":
+            record_id = self.create_record(
+                action.domain,
+                action.sub_domain,
+                action.record_type,
+                action.line,
+                action.value,
+                action.ttl,
+                action.remark,
+            )
+            if record_id is None:
+                return False
+            self.record_index.set(*key, RecordEntry(record_id, action.value, action.ttl))
+            return True
+
+        if action.action == "modify":
+            if not self.modify_record(
+                action.domain,
+                action.record_id,
+                action.sub_domain,
+                action.record_type,
+                action.line,
+                action.value,
+                action.ttl,
+                action.remark,
+            ):
+                return False
+            self.record_index.set(
+                *key, RecordEntry(action.record_id, action.value, action.ttl)
+            )
+            return True
+
+        if not self.delete_record(action.domain, action.record_id):
+            return False
+        self.record_index.remove(*key, action.record_id)
+        return True
+
+    def execute_plan(
+        self,
+        actions: List[RecordAction],
+        batched: Dict[RecordAction, Optional[bool]] = None,
+    ) -> List[RecordAction]:
+        """按顺序执行一个子域名的变更计划，返回执行成功的变更
+
+        batched为批量任务的结果：已成功的变更直接计为成功，结果未知的变更跳过，由下一个
+        周期重新查询记录后处理；失败和未参与批量的变更逐条执行。
+        """
+        batched = batched or {}
+        applied = []
+        for action in actions:
+            result = batched.get(action, False)
+            if result is None:
+                continue
+            if result or self.execute_action(action):
+                logger.info(format_action(action))
+                applied.append(action)
+        return applied
+
+    def domain_id(self, domain: str) -> Optional[int]:
+        """主域名的域名ID，批量创建记录时使用，查询一次后缓存，失败返回None"""
+        if domain not in self.domain_ids:
+            try:
+                req = dnspod_models().DescribeDomainRequest()
+                req.Domain = domain
+                resp = self.call_api("DescribeDomain", req, domain)
+                self.domain_ids[domain] = resp.DomainInfo.DomainId
+            except Exception as e:
+                logger.error(f"获取域名 {domain} 的ID失败: {str(e)}")
+                return None
+        return self.domain_ids[domain]
+
+    def wait_batch_task(
+        self, domain: str, job_id: int, key: Callable
+    ) -> Dict[object, Tuple[bool, object]]:
+        """查询批量任务中各记录的执行结果，返回格式: {key(记录): (是否成功, 记录)}
+
+        任务尚未完成时每隔BATCH_POLL_INTERVAL秒重新查询，仍未完成或查询失败的记录
+        不在结果中。
+        """
+        results = {}
+        for attempt in range(BATCH_POLL_ATTEMPTS):
+            if attempt:
+                spans.sleep("等待批量任务", BATCH_POLL_INTERVAL)
+            try:
+                req = dnspod_models().DescribeBatchTaskRequest()
+                req.JobId = job_id
+                resp = self.call_api("DescribeBatchTask", req, domain)
+            except Exception as e:
+                logger.error(f"查询批量任务 {job_id} 失败: {str(e)}")
+                return results
+
+            pending = False
+            for detail in resp.DetailList or []:
+                for record in detail.RecordList or []:
+                    status = (record.Status or "").lower()
+                    if status == "success":
+                        results[key(record)] = (True, record)
+                    elif status in ("fail", "failed", "error"):
+                        results[key(record)] = (False, record)
+                        logger.error(
+                            f"批量任务 {job_id} 中 {domain} - {record.SubDomain} - "
+                            f"{record.RecordLine} - {record.RecordType} 失败: {record.ErrMsg}"
+                        )
+                    else:
+                        pending = True
+            if not pending:
+                return results
+        return results
+
+    def run_batch(
+        self,
+        action_name: str,
+        req,
+        actions: List[RecordAction],
+        key: Callable,
+        action_key: Callable,
+    ) -> Dict[RecordAction, Optional[bool]]:
+        """提交一个批量任务并等待结果，成功的记录同步更新索引
+
+        key(记录) 与 action_key(变更) 用于把任务结果对应到变更。返回格式:
+        {变更: 结果}，True为成功，False为失败（由调用方逐条重试），None为结果未知；
+        提交失败时返回空字典，全部改为逐条执行。
+        """
+        domain = actions[0].domain
         try:
-            records = self.get_record_list(domain, sub_domain)
-            current_records = {}
-            for record in records:
-                if record.Line not in current_records:
-                    current_records[record.Line] = {}
-                current_records[record.Line][record.Type] = record.Value
-            return current_records
+            job_id = self.call_api(action_name, req, domain).JobId
         except Exception as e:
-            logger.error(f"获取当前记录失败: {str(e)}")
+            logger.error(f"{domain} 提交批量任务 {action_name} 失败: {str(e)}")
+            return {}
+
+        finished = self.wait_batch_task(domain, job_id, key)
+        outcome = {}
+        for action in actions:
+            result = finished.get(action_key(action))
+            succeeded, record = result if result else (None, None)
+            if succeeded and action.action == "create" and not record.RecordId:
+                # 没有返回新记录ID，无法写入索引
+                succeeded = None
+            if succeeded is None:
+                logger.warning(
+                    f"批量任务 {job_id} 中 {format_action(action)} 的结果未知，"
+                    f"下一个周期重新查询 {domain} 的记录"
+                )
+            elif succeeded:
+                index_key = (action.domain, action.sub_domain, action.line, action.record_type)
+                if action.action == "delete":
+                    self.record_index.remove(*index_key, action.record_id)
+                else:
+                    record_id = record.RecordId if action.action == "create" else action.record_id
+                    self.record_index.set(
+                        *index_key, RecordEntry(record_id, action.value, action.ttl)
+                    )
+            outcome[action] = succeeded
+        return outcome
+
+    def modify_record_batch(
+        self, actions: List[RecordAction]
+    ) -> Dict[RecordAction, Optional[bool]]:
+        """用一次ModifyRecordBatch把同一主域名下的多条记录改为同一个值"""
+        req = dnspod_models().ModifyRecordBatchRequest()
+        req.RecordIdList = [action.record_id for action in actions]
+        req.Change = "value"
+        req.ChangeTo = actions[0].value
+        return self.run_batch(
+            "ModifyRecordBatch",
+            req,
+            actions,
+            lambda record: record.RecordId,
+            lambda action: action.record_id,
+        )
+
+    def create_record_batch(
+        self, actions: List[RecordAction]
+    ) -> Dict[RecordAction, Optional[bool]]:
+        """用一次CreateRecordBatch创建同一主域名下的多条记录，接口不支持备注"""
+        domain_id = self.domain_id(actions[0].domain)
+        if domain_id is None:
             return {}
+        models = dnspod_models()
+        req = models.CreateRecordBatchRequest()
+        req.DomainIdList = [str(domain_id)]
+        req.RecordList = []
+        for action in actions:
+            item = models.AddRecordBatch()
+            item.SubDomain = action.sub_domain
+            item.RecordType = action.record_type
+            item.RecordLine = action.line
+            item.Value = action.value
+            item.TTL = action.ttl
+            req.RecordList.append(item)
+        return self.run_batch(
+            "CreateRecordBatch",
+            req,
+            actions,
+            lambda record: (record.SubDomain, record.RecordLine, record.RecordType, record.Value),
+            lambda action: (action.sub_domain, action.line, action.record_type, action.value),
+        )
+
+    def delete_record_batch(
+        self, actions: List[RecordAction]
+    ) -> Dict[RecordAction, Optional[bool]]:
+        """用一次DeleteRecordBatch删除同一主域名下的多条记录"""
+        req = dnspod_models().DeleteRecordBatchRequest()
+        req.RecordIdList = [action.record_id for action in actions]
+        return self.run_batch(
+            "DeleteRecordBatch",
+            req,
+            actions,
+            lambda record: record.RecordId,
+            lambda action: action.record_id,
+        )
+
+    def execute_zone_batches(
+        self, actions: List[RecordAction]
+    ) -> Dict[RecordAction, Optional[bool]]:
+        """把同一主域名下所有子域名的变更合并为批量任务，返回各变更的结果
+
+        依次提交修改、创建、删除，保持计划的执行顺序。目标IP相同、TTL不变的修改
+        合并为一次ModifyRecordBatch，创建和删除各合并为一次；每类不足BATCH_MIN_SIZE
+        条时不合并，批量任务的提交和查询结果至少需要两次调用。
+        """
+        modifies, creates, deletes = {}, [], []
+        for action in actions:
+            if action.line not in MANAGED_LINES:
+                continue
+            if action.action == "modify":
+                entry = self.record_index.get(
+                    action.domain, action.sub_domain, action.line, action.record_type
+                )
+                # ModifyRecordBatch只修改记录值
+                if entry and entry.ttl == action.ttl:
+                    modifies.setdefault(action.value, []).append(action)
+            elif action.action == "create":
+                creates.append(action)
+            else:
+                deletes.append(action)
+
+        outcome = {}
+        for items in modifies.values():
+            if len(items) >= BATCH_MIN_SIZE:
+                outcome.update(self.modify_record_batch(items))
+        if len(creates) >= BATCH_MIN_SIZE:
+            outcome.update(self.create_record_batch(creates))
+        if len(deletes) >= BATCH_MIN_SIZE:
+            outcome.update(self.delete_record_batch(deletes))
+        return outcome
+
+    def execute_batches(self, plan: List[RecordAction]) -> Dict[RecordAction, Optional[bool]]:
+        """按主域名并发执行批量任务，返回各变更的结果，不在结果中的变更需要逐条执行"""
+        zones = {}
+        for action in plan:
+            zones.setdefault(action.domain, []).append(action)
+        outcome = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency()) as pool:
+            for result in pool.map(spans.bind(self.execute_zone_batches), zones.values()):
+                outcome.update(result)
+        return outcome
+
+    def get_current_records(self, domain: str, sub_domain: str) -> Dict:
+        """获取当前域名的所有记录，优先从索引读取"""
+        if not self.record_index.has_zone(domain):
+            self.refresh_record_index([domain])
+        return self.record_index.sub_domain_records(domain, sub_domain)
+
+    def need_probe(self, ip_version: str) -> bool:
+        """指定IP版本是否需要做可达性检测，本机没有IPv6出口时跳过IPv6"""
+        return ip_version == "v4" or self.prober.ipv6_supported
+
+    def probe_candidates(self, snapshot: FeedSnapshot):
+        """并发检测快照中所有候选IP的可用性，结果写入缓存"""
+        ips = []
+        for ip_version in ["v4", "v6"]:
+            if not self.need_probe(ip_version):
+                continue
+            for ip_info in snapshot.all_ips(ip_version):
+                if self.availability_cache.peek(ip_info["ip"]) is None:
+                    ips.append(ip_info["ip"])
+        # 已发布的IP也一起检测，判断是否需要立即切换
+        ips.extend(self.availability_cache.expiring(self.published_ips(), 0))
+        ips = list(dict.fromkeys(ips))
+        if not ips:
+            return
+
+        start = time.time()
+        reachable = self.probe_and_cache(ips)
+        logger.info(
+            f"可达性检测完成: {len(reachable)}/{len(ips)} 个IP可用，"
+            f"耗时 {time.time() - start:.2f}秒"
+        )
+
+    def probe_and_cache(self, ips: List[str]) -> Dict[str, float]:
+        """并发探测一组IP并写入缓存，返回可达IP及往返时间"""
+        measurements = self.prober.measure_many(ips)
+        now = time.time()
+        reachable = {}
+        for ip, measurement in measurements.items():
+            available = measurement.median_rtt is not None
+            self.availability_cache.put(
+                ip, available, measurement.median_rtt, now, measurement.loss
+            )
+            if available:
+                reachable[ip] = measurement.median_rtt
+        return reachable
+
+    def published_ips(self) -> List[str]:
+        """当前已发布在配置的子域名上、需要做可达性检测的IP"""
+        return list(self.published_records())
+
+    def refresh_reachability(self):
+        """提前刷新即将过期的可达性缓存，避免周期开始时集中探测
+
+        包括当前已发布的IP和最近一次快照中的候选IP。
+        """
+        ips = self.published_ips()
+        snapshot = self.feed.last_good
+        if snapshot:
+            for ip_version in IP_VERSIONS:
+                if self.need_probe(ip_version):
+                    ips.extend(ip_info["ip"] for ip_info in snapshot.all_ips(ip_version))
+        due = self.availability_cache.expiring(ips, config.cache_refresh_ahead)
+        if due:
+            reachable = self.probe_and_cache(due)
+            logger.debug(f"提前刷新IP可达性: {len(reachable)}/{len(due)} 个可用")
+
+    def published_records(self) -> Dict[str, List[Tuple[Dict, str, str]]]:
+        """当前已发布的IP及使用它的记录，格式: {ip: [(域名配置, 线路, 记录类型), ...]}"""
+        records = {}
+        for domain_config in config.DOMAINS:
+            if not domain_config["enabled"]:
+                continue
+            current_records = self.record_index.sub_domain_records(
+                domain_config["domain"], domain_config["sub_domain"]
+            )
+            for line, values in current_records.items():
+                if line not in MANAGED_LINES:
+                    continue
+                for record_type, ip in values.items():
+                    if record_type == "A" or (
+                        record_type == "AAAA" and self.need_probe("v6")
+                    ):
+                        records.setdefault(ip, []).append(
+                            (domain_config, line, record_type)
+                        )
+        return records
+
+    def watch_published(self):
+        """快速探测当前已发布的IP，连续失败达到阈值时立即把相关记录切换到次优IP
+
+        只探测已发布的IP，不等待完整的检查周期；切换不受变更抑制策略限制。
+        """
+        records = self.published_records()
+        if not records:
+            return
+        reachable = dict(self.prober.probe_many(list(records)))
+        failed = self.failover.record({ip: ip in reachable for ip in records})
+        if not failed:
+            return
+
+        for ip in failed:
+            logger.warning(
+                f"已发布的IP {ip} 连续 {self.failover.threshold} 次探测失败，"
+                f"立即切换 {len(records[ip])} 条记录"
+            )
+            self.availability_cache.put(ip, False)
+
+        # 与检查周期、重新加载配置互斥，切换前在锁内重新读取记录，避免同一条记录被并发改写
+        with self.cycle_lock:
+            actions = self.failover_actions({ip: records[ip] for ip in failed})
+            _, results = self.execute_groups(actions)
+            applied = sum(len(done) for _, done, _ in results)
+            self.failover.resolved(failed, applied)
+            metrics.FAILOVER_REPOINTS.inc(amount=applied)
+            if applied:
+                self.save_state()
+
+    def failover_actions(
+        self, records: Dict[str, List[Tuple[Dict, str, str]]]
+    ) -> List[RecordAction]:
+        """为故障IP的每条记录从最近一次快照中挑选可达的次优IP，生成修改操作"""
+        snapshot = self.latest_snapshot()
+        if not snapshot:
+            logger.error("没有可用的优选IP快照，无法快速切换")
+            return []
+
+        def usable(ip: str) -> bool:
+            return not self.failover.is_suspect(ip) and self.check_ip_availability(ip)
+
+        actions = []
+        for ip, usages in records.items():
+            for domain_config, line, record_type in usages:
+                ip_version = "v4" if record_type == "A" else "v6"
+                # 默认线路取所有线路中的最优IP
+                best = snapshot.table.best(ip_version, LINE_KEYS.get(line), usable)
+                entry = self.record_index.get(
+                    domain_config["domain"], domain_config["sub_domain"], line, record_type
+                )
+                if not best or not entry or entry.value != ip:
+                    if not best:
+                        logger.error(
+                            f"{domain_config['domain']} - {domain_config['sub_domain']} - "
+                            f"{line} - {record_type} 没有可用的替换IP"
+                        )
+                    continue
+                actions.append(
+                    RecordAction(
+                        "modify",
+                        domain_config["domain"],
+                        domain_config["sub_domain"],
+                        record_type,
+                        line,
+                        best[0],
+                        entry.ttl,
+                        domain_config.get("remark"),
+                        entry.record_id,
+                        ip,
+                        best[1],
+                    )
+                )
+        return actions
 
     def check_ip_availability(self, ip: str) -> bool:
-        """检查IP是否可以ping通"""
+        """检查IP是否可达"""
         # 检查缓存
-        now = datetime.now()
-        if ip in self.ip_availability_cache:
-            cache_info = self.ip_availability_cache[ip]
-            if now - cache_info['last_check'] < timedelta(minutes=self.cache_duration):
-                return cache_info['available']
+        available = self.availability_cache.get(ip)
+        if available is not None:
+            return available
 
-        try:
-            # 根据操作系统选择ping命令参数
-            if os.name == 'nt':  # Windows系统
-                ping_args = ['ping', '-n', '1', '-w', '1000', ip]
-            else:  # Linux/Unix系统
-                ping_args = ['ping', '-c', '1', '-W', '1', ip]
-            
-            # 最多尝试3次ping
-            max_retries = 3
-            for attempt in range(max_retries):
-                result = subprocess.run(ping_args, 
-                                      capture_output=True, 
-                                      text=True)
-                if result.returncode == 0:
-                    # 更新缓存
-                    self.ip_availability_cache[ip] = {
-                        'available': True,
-                        'last_check': now
-                    }
-                    return True
-                
-                # 如果不是最后一次尝试，等待短暂时间后重试
-                if attempt < max_retries - 1:
-                    time.sleep(1)  # 等待1秒后重试
-            
-            # 所有尝试都失败
-            logger.warning(f"IP {ip} ping测试失败（尝试{max_retries}次），最后一次命令输出：{result.stdout if result.stdout else result.stderr}")
-            # 更新缓存
-            self.ip_availability_cache[ip] = {
-                'available': False,
-                'last_check': now
-            }
-            return False
-        except Exception as e:
-            logger.error(f"Ping测试出错 - IP: {ip}, 错误信息: {str(e)}, 命令参数: {ping_args}")
-            return False
+        rtt = self.prober.probe(ip)
+        if rtt is None:
+            logger.warning(f"IP {ip} 可达性检测失败")
+        self.availability_cache.put(ip, rtt is not None, rtt)
+        return rtt is not None
+
+    def reachable_filter(self, ip_version: str):
+        """指定IP版本的可达性过滤函数，无需检测时返回None
+
+        同一个过滤函数遍历多条线路的排序时，每个IP只读取一次缓存，命中统计只反映
+        实际需要判断可达性的次数。
+        """
+        if not self.need_probe(ip_version):
+            return None
+        checked = {}
+
+        def reachable(ip: str) -> bool:
+            if ip not in checked:
+                checked[ip] = self.check_ip_availability(ip)
+            return checked[ip]
+
+        return reachable
 
-    def find_best_available_ip(self, ip_data: Dict, ip_version: str) -> Optional[Tuple[str, int]]:
+    def find_best_available_ip(
+        self, snapshot: FeedSnapshot, ip_version: str
+    ) -> Optional[Tuple[str, int]]:
         """查找可用且延迟最低的IP，返回(IP, 延迟)"""
-        if ip_version != "v4":  # 只检查IPv4地址
-            return self.find_best_ip(ip_data, ip_version)
-
-        # 按延迟排序所有IP地址，并获取优选IP，检查IP可用性，更新不同线路的记录等功能。
-        all_ips = []
-        for line_key in ["CM", "CU", "CT"]:
-            if line_key in ip_data[ip_version]:
-                all_ips.extend(ip_data[ip_version][line_key])
-        
-        # 按延迟排序
-        all_ips.sort(key=lambda x: x["latency"])
-        
-        # 查找第一个可用的IP
-        for ip_info in all_ips:
-            if self.check_ip_availability(ip_info["ip"]):
-                return (ip_info["ip"], ip_info["latency"])
-        
-        return None
+        return snapshot.table.best(
+            ip_version, reachable=self.reachable_filter(ip_version)
+        )
 
     def find_line_best_available_ip(
-        self, ip_data: Dict, ip_version: str, line_key: str
+        self, snapshot: FeedSnapshot, ip_version: str, line_key: str
     ) -> Optional[Tuple[str, int]]:
         """查找指定线路可用且延迟最低的IP"""
-        if ip_version != "v4":  # 只检查IPv4地址
-            return self.find_line_best_ip(ip_data, ip_version, line_key)
+        return snapshot.table.best(
+            ip_version, line_key, self.reachable_filter(ip_version)
+        )
 
-        if line_key not in ip_data[ip_version]:
-            return None
+    def rank_snapshot(self, snapshot: FeedSnapshot) -> FeedSnapshot:
+        """用本机测得的往返时间和丢包率重新排序，返回新的快照，不修改共用的快照"""
+        if config.measure_blend <= 0:
+            return snapshot
+        table = snapshot.table.with_measurements(
+            self.availability_cache.measurements(snapshot.table.ip),
+            config.measure_blend,
+            weighted_score(loss_weight=config.measure_loss_weight),
+        )
+        return snapshot.with_table(table)
 
-        ips = ip_data[ip_version][line_key]
-        if not ips:
-            return None
+    def select_best_ips(self, snapshot: FeedSnapshot) -> Dict:
+        """每个周期计算一次各版本、各线路可用的最优IP，所有域名共用
+
+        格式: {'v4': {'移动': (ip, 延迟), '联通': ..., '电信': ...}, 'v6': {...}}
+        """
+        best_ips = {}
+        for ip_version in IP_VERSIONS:
+            per_line = snapshot.table.best_per_line(
+                ip_version, self.reachable_filter(ip_version)
+            )
+            best_ips[ip_version] = {
+                LINE_NAMES[line_key]: best for line_key, best in per_line.items()
+            }
+        return best_ips
+
+    def update_domain_records(self, domain_config, selected: Dict):
+        """根据本周期选出的各线路最优IP更新指定域名的记录"""
+        if not self.record_index.has_zone(domain_config["domain"]):
+            self.refresh_record_index([domain_config["domain"]])
+        actions = plan_domain(domain_config, selected, self.record_index)
+        if actions:
+            self.execute_plan(actions)
+
+    def check_and_update(self, dry_run: bool = False) -> List[RecordAction]:
+        """检查并更新所有域名，返回本次的变更计划
+
+        先根据优选IP计算所有域名的期望记录并与索引对比生成完整计划，再按子域名
+        并发执行；dry_run为True时只生成计划，不修改任何记录。
+        """
+        start = time.perf_counter()
+        try:
+            with self.cycle_lock, spans.trace_cycle() as trace:
+                return self._check_and_update(dry_run)
+        finally:
+            metrics.CYCLE_DURATION.observe(time.perf_counter() - start)
+            # 按阶段、接口、休眠和子域名输出本周期的耗时分解
+            self.last_breakdown = trace.breakdown()
+            for line in spans.format_breakdown(self.last_breakdown):
+                logger.info(line)
+
+    def _check_and_update(self, dry_run: bool) -> List[RecordAction]:
+        # 每个周期只使用一份优选IP快照，所有域名共用
+        with spans.span(spans.STAGE, "获取优选IP"):
+            snapshot = self.current_snapshot()
+        if not snapshot:
+            logger.error("无法获取优选IP，跳过本次更新")
+            return []
+
+        # 一次性并发检测所有候选IP，后续各域名直接读取缓存
+        with spans.span(spans.STAGE, "可达性检测"):
+            self.probe_candidates(snapshot)
+
+        # 每个主域名只查询一次记录列表，同一主域名下的子域名共用；每个周期都重新查询，
+        # 及时发现控制台等外部对记录的修改。第一个周期沿用加载时间未超过state_ttl的
+        # 主域名，启动后不会立即再查询一遍
+        with spans.span(spans.STAGE, "查询记录"):
+            if self.trust_loaded_index:
+                self.trust_loaded_index = False
+                self.refresh_record_index(max_age=config.state_ttl * 60)
+            else:
+                self.refresh_record_index()
+
+        # 各线路最优IP只计算一次，所有域名共用；排序后的快照整体替换，其他线程读到的
+        # 始终是完整的一份
+        with spans.span(spans.STAGE, "选择最优IP"):
+            snapshot = self.rank_snapshot(snapshot)
+            selected = self.select_best_ips(snapshot)
+        self.last_ranked = snapshot
+        self.last_selected = selected
+
+        with spans.span(spans.STAGE, "生成计划"):
+            plan = self.filter_plan(
+                build_plan(config.DOMAINS, selected, self.record_index), snapshot, not dry_run
+            )
+        if dry_run:
+            return plan
+
+        start = time.perf_counter()
+        with spans.span(spans.STAGE, "执行变更"):
+            groups, results = self.execute_groups(plan)
+
+        with spans.span(spans.STAGE, "保存状态"):
+            self.save_state()
+
+        stats = self.availability_cache.stats()
+        damping = self.damping.stats()
+        applied = sum(len(actions) for _, actions, _ in results)
+        logger.info(
+            f"本次检查完成: 计划 {len(plan)} 条变更，成功 {applied} 条，"
+            f"涉及 {len(groups)} 个子域名，耗时 {time.perf_counter() - start:.2f}秒；"
+            f"可达性缓存 {stats['size']} 条，命中 {stats['hits']}，"
+            f"未命中 {stats['misses']}，淘汰 {stats['evictions']}；"
+            f"累计修改 {damping['applied']} 次（强制切换 {damping['forced']} 次），"
+            f"抑制 改善不足 {damping['suppressed']['margin']} / "
+            f"保持期内 {damping['suppressed']['hold']} / "
+            f"超出预算 {damping['suppressed']['budget']} 次"
+        )
+        for name, actions, elapsed in sorted(results, key=lambda x: x[2], reverse=True):
+            logger.info(f"  - {name}: {len(actions)} 条变更，{elapsed:.2f}秒")
+        return plan
 
-        # 按延迟排序
-        ips.sort(key=lambda x: x["latency"])
-        
-        # 查找第一个可用的IP
-        for ip_info in ips:
-            if self.check_ip_availability(ip_info["ip"]):
-                return (ip_info["ip"], ip_info["latency"])
-        
-        return None
-    def update_domain_records(self, domain_config):
-        """更新指定域名的记录"""
-        domain = domain_config["domain"]
-        sub_domain = domain_config["sub_domain"]
-        ttl = domain_config.get("ttl", 600)
-        remark = domain_config.get("remark")
-
-        # 获取当前记录
-        current_records = self.get_current_records(domain, sub_domain)
-
-        # 获取优选IP
-        ip_data = self.get_optimal_ips()
-        if not ip_data:
-            logger.error(f"无法获取优选IP，跳过更新 {domain}")
+    def filter_plan(
+        self, plan: List[RecordAction], snapshot: FeedSnapshot, count: bool = True
+    ) -> List[RecordAction]:
+        """过滤掉收益太小、切换太频繁或超出本周期预算的修改，count为False时不计入统计"""
+        return self.damping.filter(
+            plan,
+            lambda ip, line: snapshot.table.latency_of(ip, LINE_KEYS.get(line)),
+            self.check_ip_availability,
+            count,
+        )
+
+    def execute_groups(self, plan: List[RecordAction]) -> Tuple[Dict, List]:
+        """执行变更计划，返回(分组, 各组执行结果)
+
+        先按主域名把所有子域名的变更合并为批量任务，再按子域名分组并发执行剩余的
+        变更，接口调用频率由限速器统一控制。
+        """
+        groups = group_by_sub_domain(plan)
+        if not groups:
+            return groups, []
+        batched = self.execute_batches(plan)
+        with ThreadPoolExecutor(max_workers=self.concurrency()) as pool:
+            results = pool.map(
+                spans.bind(lambda actions: self.timed_execute(actions, batched)),
+                groups.values(),
+            )
+            return groups, list(results)
+
+    def reload_config(self) -> bool:
+        """重新加载配置文件
+
+        只初始化新增和修改的域名、清理删除的域名，其余域名的记录索引、可达性缓存
+        和优选IP快照保持不变。配置校验失败时继续使用当前配置，返回False。
+        """
+        with self.cycle_lock:
+            return self._reload_config()
+
+    def _reload_config(self) -> bool:
+        start = time.perf_counter()
+        old_domains = [c for c in config.DOMAINS if c["enabled"]]
+        old_accounts = dict(self.accounts.domain_accounts)
+        old_feeds = config.FEEDS
+        if not config.reload():
+            return False
+
+        new_domains = [c for c in config.DOMAINS if c["enabled"]]
+        added, removed, modified = config.diff_domains(old_domains, new_domains)
+        rebuilt = self.accounts.update()
+        self.apply_settings(old_feeds)
+
+        # 清理不再管理的子域名，主域名下没有其他子域名时同时移除索引
+        live_zones = {c["domain"] for c in new_domains}
+        for domain_config in removed:
+            self.damping.forget(domain_config["domain"], domain_config["sub_domain"])
+            if domain_config["domain"] not in live_zones:
+                self.record_index.drop_zone(domain_config["domain"])
+
+        # 只查询尚未加载或更换了账号的主域名
+        touched = added + modified
+        zones = [
+            c["domain"]
+            for c in touched
+            if not self.record_index.has_zone(c["domain"])
+            or old_accounts.get(c["domain"]) != self.accounts.domain_accounts.get(c["domain"])
+        ]
+        for zone in zones:
+            # 更换账号后域名ID可能不同
+            self.domain_ids.pop(zone, None)
+        if zones:
+            self.refresh_record_index(zones)
+
+        applied = 0
+        snapshot = self.latest_snapshot()
+        if touched and self.last_selected is not None and snapshot:
+            plan = self.filter_plan(
+                build_plan(touched, self.last_selected, self.record_index), snapshot
+            )
+            _, results = self.execute_groups(plan)
+            applied = sum(len(actions) for _, actions, _ in results)
+
+        logger.info(
+            f"配置已重新加载: 新增 {len(added)} 个、删除 {len(removed)} 个、"
+            f"修改 {len(modified)} 个域名，重建 {len(rebuilt)} 个账号，"
+            f"查询 {len(set(zones))} 个主域名，执行 {applied} 条变更，"
+            f"耗时 {time.perf_counter() - start:.3f}秒"
+        )
+        return True
+
+    def apply_settings(self, old_feeds: List[Dict] = None):
+        """把运行中可以调整的配置应用到已有组件，缓存内容保持不变"""
+        self.damping.min_gain_ms = config.damping_min_gain_ms
+        self.damping.min_gain_ratio = config.damping_min_gain_ratio
+        self.damping.min_hold = config.damping_min_hold * 60
+        self.damping.max_changes = config.damping_max_changes
+        self.availability_cache.max_size = config.cache_max_size
+        self.availability_cache.positive_ttl = config.cache_positive_ttl * 60
+        self.availability_cache.negative_ttl = config.cache_negative_ttl * 60
+        self.availability_cache.jitter = config.cache_jitter
+        self.feed.max_age = config.feed_max_age
+        self.feed.mode = config.feed_mode
+        self.feed.deadline = config.feed_deadline
+        self.failover.threshold = max(1, config.failover_threshold)
+        if old_feeds is not None and old_feeds != config.FEEDS:
+            self.feed.set_sources(build_sources(config.FEEDS))
+
+    def timed_execute(
+        self,
+        actions: List[RecordAction],
+        batched: Dict[RecordAction, Optional[bool]] = None,
+    ) -> Tuple[str, List[RecordAction], float]:
+        """执行单个子域名的变更计划并计时，返回(子域名, 成功的变更, 耗时)"""
+        name = f"{actions[0].domain} - {actions[0].sub_domain}"
+        start = time.perf_counter()
+        applied = []
+        try:
+            applied = self.execute_plan(actions, batched)
+        except Exception as e:
+            logger.error(f"更新域名 {name} 出错: {str(e)}")
+        elapsed = time.perf_counter() - start
+        spans.record(spans.DOMAIN, name, elapsed)
+        self.damping.record_applied(applied)
+        metrics.DOMAIN_UPDATE_DURATION.observe(
+            elapsed, actions[0].domain, actions[0].sub_domain
+        )
+        for action in applied:
+            metrics.RECORDS_CHANGED.inc(action.action)
+        return name, applied, elapsed
+
+
+def job_functions(manager: DNSPodManager) -> Dict[str, Callable[[], None]]:
+    """各后台任务执行的函数"""
+    return {
+        "feed": manager.get_optimal_ips,
+        "reachability": manager.refresh_reachability,
+        "reconcile": manager.check_and_update,
+        "state": manager.save_state,
+        "failover": manager.watch_published,
+    }
+
+
+def job_intervals() -> Dict[str, float]:
+    """各后台任务的执行间隔（秒）"""
+    intervals = {
+        "feed": config.feed_interval * 60,
+        "reachability": config.reachability_interval,
+        "reconcile": config.check_interval * 60,
+        "state": config.state_interval,
+    }
+    if config.failover_enabled:
+        intervals["failover"] = config.failover_interval
+    return intervals
+
+
+class ConfigWatcher:
+    """配置文件变化或收到SIGHUP时重新加载配置，并同步调整各任务及其执行间隔"""
+
+    def __init__(self, manager: DNSPodManager, scheduler: Scheduler):
+        self.manager = manager
+        self.scheduler = scheduler
+        self.force = False
+
+    def request(self, signum=None, frame=None):
+        """要求尽快重新加载，用作SIGHUP信号处理函数"""
+        self.force = True
+        self.scheduler.run_now("config")
+
+    def check(self):
+        """配置文件被修改或收到重新加载请求时重新加载配置"""
+        if not self.force and not (config.reload_interval and config.changed()):
+            return
+        self.force = False
+        if not self.manager.reload_config():
             return
+        intervals = job_intervals()
+        functions = job_functions(self.manager)
+        for name, interval in intervals.items():
+            job = self.scheduler.jobs.get(name)
+            if job is None:
+                # 例如重新开启了快速故障切换
+                self.scheduler.add_job(name, functions[name], interval, config.schedule_jitter)
+                logger.info(f"已启用任务 {name}")
+            elif job.interval != interval:
+                job.interval = interval
+                job.schedule_next()
+        for name in functions:
+            if name not in intervals and name in self.scheduler.jobs:
+                self.scheduler.remove_job(name)
+                logger.info(f"已停用任务 {name}")
+        self.scheduler.jobs["config"].interval = config.reload_interval or 24 * 3600
+
+
+def run_first_cycle(
+    manager: DNSPodManager, dry_run: bool, profile_path: str = None
+) -> List[RecordAction]:
+    """执行首个检查周期，指定profile_path时用cProfile统计并写入文件，包括各工作线程"""
+    if not profile_path:
+        return manager.check_and_update(dry_run=dry_run)
+
+    plan, stats = spans.profile(manager.check_and_update, dry_run=dry_run)
+    stats.dump_stats(profile_path)
+    logger.info(
+        f"性能分析结果已写入 {profile_path}，"
+        f"可用 python -m pstats {profile_path} 查看"
+    )
+    return plan
+
+
+def startup_time() -> float:
+    """进程启动到现在的耗时（秒）"""
+    return time.perf_counter() - STARTED_AT
 
-        # 处理IPv4记录
-        if domain_config["ipv4_enabled"] and "v4" in ip_data:
-            # 获取所有线路的最佳IPv4地址
-            line_mapping = {"移动": "CM", "联通": "CU", "电信": "CT"}
-            best_ips = {}
-            for line, line_key in line_mapping.items():
-                best_ip = self.find_line_best_available_ip(ip_data, "v4", line_key)
-                if best_ip:
-                    ip, latency = best_ip
-                    best_ips[line] = (ip, latency)
-
-            # 检查是否所有线路的IPv4地址都相同
-            if best_ips:
-                unique_ips = {ip for ip, _ in best_ips.values()}
-                if len(unique_ips) == 1:
-                    # 所有线路的IPv4地址相同，只添加默认线路
-                    ip = list(unique_ips)[0]
-                    min_latency = min(latency for _, latency in best_ips.values())
-                    current_ip = current_records.get("默认", {}).get("A")
-                    if current_ip != ip:
-                        logger.info(
-                            f"更新A记录: {domain} - {sub_domain} - 默认 - {ip} (延迟: {min_latency}ms) [所有线路IP相同]"
-                        )
-                        if self.update_record(
-                            domain, sub_domain, "A", "默认", ip, ttl, remark
-                        ):
-                            # 更新成功后更新缓存
-                            if "默认" not in current_records:
-                                current_records["默认"] = {}
-                            current_records["默认"]["A"] = ip
-                        time.sleep(1)
-                else:
-                    # IPv4地址不同，需要为每个线路添加记录
-                    for line, (ip, latency) in best_ips.items():
-                        current_ip = current_records.get(line, {}).get("A")
-                        if current_ip != ip:
-                            logger.info(
-                                f"更新A记录: {domain} - {sub_domain} - {line} - {ip} (延迟: {latency}ms)"
-                            )
-                            if self.update_record(
-                                domain, sub_domain, "A", line, ip, ttl, remark
-                            ):
-                                # 更新成功后更新缓存
-                                if line not in current_records:
-                                    current_records[line] = {}
-                                current_records[line]["A"] = ip
-                            time.sleep(1)
-
-                    # 添加默认线路（使用延迟最低的IP）
-                    best_ip = min(best_ips.items(), key=lambda x: x[1][1])
-                    ip, latency = best_ip[1]
-                    current_ip = current_records.get("默认", {}).get("A")
-                    if current_ip != ip:
-                        logger.info(
-                            f"更新A记录: {domain} - {sub_domain} - 默认 - {ip} (延迟: {latency}ms)"
-                        )
-                        if self.update_record(
-                            domain, sub_domain, "A", "默认", ip, ttl, remark
-                        ):
-                            # 更新成功后更新缓存
-                            if "默认" not in current_records:
-                                current_records["默认"] = {}
-                            current_records["默认"]["A"] = ip
-                        time.sleep(1)
-
-        # 处理IPv6记录
-        if domain_config["ipv6_enabled"] and "v6" in ip_data:
-            # 获取所有线路的最佳IPv6地址
-            line_mapping = {"移动": "CM", "联通": "CU", "电信": "CT"}
-            best_ips = {}
-            for line, line_key in line_mapping.items():
-                best_ip = self.find_line_best_ip(ip_data, "v6", line_key)
-                if best_ip:
-                    ip, latency = best_ip
-                    best_ips[line] = (ip, latency)
-
-            # 检查是否所有线路的IPv6地址都相同
-            if best_ips:
-                unique_ips = {ip for ip, _ in best_ips.values()}
-                if len(unique_ips) == 1:
-                    # 所有线路的IPv6地址相同，只添加默认线路
-                    ip = list(unique_ips)[0]
-                    min_latency = min(latency for _, latency in best_ips.values())
-                    current_ip = current_records.get("默认", {}).get("AAAA")
-                    if current_ip != ip:
-                        logger.info(
-                            f"更新AAAA记录: {domain} - {sub_domain} - 默认 - {ip} (延迟: {min_latency}ms) [所有线路IP相同]"
-                        )
-                        if self.update_record(
-                            domain, sub_domain, "AAAA", "默认", ip, ttl, remark
-                        ):
-                            # 更新成功后更新缓存
-                            if "默认" not in current_records:
-                                current_records["默认"] = {}
-                            current_records["默认"]["AAAA"] = ip
-                        time.sleep(1)
-                else:
-                    # IPv6地址不同，需要为每个线路添加记录
-                    for line, (ip, latency) in best_ips.items():
-                        current_ip = current_records.get(line, {}).get("AAAA")
-                        if current_ip != ip:
-                            logger.info(
-                                f"更新AAAA记录: {domain} - {sub_domain} - {line} - {ip} (延迟: {latency}ms)"
-                            )
-                            if self.update_record(
-                                domain, sub_domain, "AAAA", line, ip, ttl, remark
-                            ):
-                                # 更新成功后更新缓存
-                                if line not in current_records:
-                                    current_records[line] = {}
-                                current_records[line]["AAAA"] = ip
-                            time.sleep(1)
-
-                    # 添加默认线路（使用延迟最低的IP）
-                    best_ip = min(best_ips.items(), key=lambda x: x[1][1])
-                    ip, latency = best_ip[1]
-                    current_ip = current_records.get("默认", {}).get("AAAA")
-                    if current_ip != ip:
-                        logger.info(
-                            f"更新AAAA记录: {domain} - {sub_domain} - 默认 - {ip} (延迟: {latency}ms)"
-                        )
-                        if self.update_record(
-                            domain, sub_domain, "AAAA", "默认", ip, ttl, remark
-                        ):
-                            # 更新成功后更新缓存
-                            if "默认" not in current_records:
-                                current_records["默认"] = {}
-                            current_records["默认"]["AAAA"] = ip
-                        time.sleep(1)
-
-    def check_and_update(self):
-        """检查并更新所有域名"""
-        for domain_config in config.DOMAINS:
-            if not domain_config["enabled"]:
-                continue
-            self.update_domain_records(domain_config)
-            time.sleep(1)  # 添加延时
 
+def probe_ips(ips: List[str], samples: int = None):
+    """测量指定IP的往返时间和丢包率并打印，不需要腾讯云密钥"""
+    measurements = Prober().measure_many(ips, samples)
+    print(f"{'IP':<40} {'最小(ms)':>9} {'中位数(ms)':>10} {'丢包':>6}")
+    for ip, m in measurements.items():
+        min_rtt = f"{m.min_rtt:.1f}" if m.min_rtt is not None else "-"
+        median_rtt = f"{m.median_rtt:.1f}" if m.median_rtt is not None else "-"
+        print(f"{ip:<40} {min_rtt:>9} {median_rtt:>10} {m.loss:>6.0%}")
 
-def main():
-    manager = DNSPodManager()
+
+def run_daemon(manager: DNSPodManager, profile_path: str = None):
+    """首次更新所有域名后，按各任务的间隔持续运行"""
+    if config.metrics_enabled:
+        metrics.start_server(config.metrics_host, config.metrics_port)
 
     # 首次运行，更新所有域名
-    manager.check_and_update()
+    run_first_cycle(manager, False, profile_path)
+
+    # 各任务按各自的间隔独立运行，空闲时休眠到下一个任务的执行时间
+    scheduler = Scheduler()
+    jobs = job_functions(manager)
+    for name, interval in job_intervals().items():
+        scheduler.add_job(name, jobs[name], interval, config.schedule_jitter)
+
+    # 配置文件变化或收到SIGHUP时重新加载配置
+    watcher = ConfigWatcher(manager, scheduler)
+    scheduler.add_job("config", watcher.check, config.reload_interval or 24 * 3600)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, watcher.request)
 
-    # 每5分钟检查一次是否需要更新
-    schedule.every(config.check_interval).minutes.do(manager.check_and_update)
     logger.info(f"程序启动成功，开始监控更新（每{config.check_interval}分钟检查一次）...")
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+    scheduler.run()
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="DNSPod 优选IP自动解析",
+        epilog="不指定子命令时等同于 run",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="只打印变更计划，不修改任何记录，等同于 plan"
+    )
+    profile = argparse.ArgumentParser(add_help=False)
+    profile.add_argument(
+        "--profile",
+        dest="command_profile",
+        metavar="PATH",
+        help="用cProfile统计首个检查周期（包括线程池中的探测、查询和变更），结果以pstats格式写入PATH",
+    )
+    parser.add_argument("--profile", metavar="PATH", help=argparse.SUPPRESS)
+
+    commands = parser.add_subparsers(dest="command", metavar="命令")
+    commands.add_parser("run", parents=[profile], help="持续运行，定时检查并更新记录")
+    commands.add_parser("once", parents=[profile], help="检查并更新一次后退出，适合cron")
+    commands.add_parser("plan", parents=[profile], help="只打印变更计划，不修改任何记录")
+    probe = commands.add_parser("probe", help="测量指定IP的延迟和丢包率")
+    probe.add_argument("ips", nargs="+", metavar="IP")
+    probe.add_argument("--samples", type=int, help="每种方式的探测次数")
+
+    args = parser.parse_args(argv)
+    if not args.command:
+        args.command = "plan" if args.dry_run else "run"
+    # 兼容写在子命令之前的 --profile
+    args.profile = getattr(args, "command_profile", None) or args.profile
+    return args
+
+
+def main(argv: List[str] = None):
+    args = parse_args(argv)
+    if args.command == "probe":
+        # probe 不需要腾讯云密钥，没有配置文件时使用默认的探测参数
+        config.ensure_loaded(required=False)
+    setup_logging()
+
+    if args.command == "probe":
+        probe_ips(args.ips, args.samples)
+        return
+
+    # 只执行一次的命令由第一个检查周期按需查询记录，不在启动时扫描所有域名
+    manager = DNSPodManager(init_records=args.command == "run")
+    logger.info(f"启动完成，耗时 {startup_time():.2f}秒")
+
+    if args.command == "run":
+        run_daemon(manager, args.profile)
+        return
+
+    dry_run = args.command == "plan"
+    start = time.perf_counter()
+    plan = run_first_cycle(manager, dry_run, args.profile)
+    if dry_run:
+        print(f"共 {len(plan)} 条变更")
+        for action in plan:
+            print(format_action(action))
+    logger.info(
+        f"{'生成计划' if dry_run else '检查更新'}完成，共 {len(plan)} 条变更，"
+        f"本周期 {time.perf_counter() - start:.2f}秒，总耗时 {startup_time():.2f}秒"
+    )
 
 
 if __name__ == "__main__":
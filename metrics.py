@@ -0,0 +1,246 @@
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+# 默认耗时分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# 探测往返时间分桶（秒）
+RTT_BUCKETS = (0.005, 0.01, 0.02, 0.05, 0.1, 0.15, 0.2, 0.3, 0.5, 1)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """指标注册表，按注册顺序输出Prometheus文本格式"""
+
+    def __init__(self):
+        self._metrics: List["Metric"] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "Metric"):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """输出所有指标"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logger.error(f"生成指标 {metric.name} 出错: {str(e)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    """指标基类，标签值按位置传入，与labelnames一一对应"""
+
+    type = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        registry: Registry = REGISTRY,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        # 采集时调用的取值函数，返回 {标签值元组: 值}，用于直接读取已有的统计
+        self._function: Optional[Callable[[], Dict[Tuple, float]]] = None
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def set_function(self, func: Callable[[], Dict[Tuple, float]]):
+        """改为采集时调用func取值，热路径上不产生任何开销"""
+        self._function = func
+
+    def _samples(self) -> List[Tuple[str, Tuple[str, ...], Tuple, float]]:
+        if self._function:
+            values = self._function()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [("", self.labelnames, labels, value) for labels, value in values.items()]
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for suffix, names, labels, value in self._samples():
+            lines.append(
+                f"{self.name}{suffix}{_format_labels(names, labels)} {_format_value(value)}"
+            )
+        return lines
+
+
+class Counter(Metric):
+    """只增不减的计数器"""
+
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """可任意设置的瞬时值"""
+
+    type = "gauge"
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    """分桶直方图，每次观测只做一次二分查找和一次加锁"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+        registry: Registry = REGISTRY,
+    ):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+        # 格式: {标签值元组: [各桶计数..., 总和]}，桶计数不累加，输出时再累加
+        self._series: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def _samples(self):
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        names = self.labelnames + ("le",)
+        samples = []
+        for labels, values in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values[:-1]):
+                cumulative += count
+                samples.append(
+                    ("_bucket", names, labels + (_format_value(bound),), cumulative)
+                )
+            samples.append(("_sum", self.labelnames, labels, values[-1]))
+            samples.append(("_count", self.labelnames, labels, cumulative))
+        return samples
+
+
+# 检查周期
+CYCLE_DURATION = Histogram(
+    "dnspod_check_duration_seconds", "check_and_update 每个周期的耗时"
+)
+DOMAIN_UPDATE_DURATION = Histogram(
+    "dnspod_domain_update_duration_seconds",
+    "单个子域名执行变更计划的耗时",
+    ("domain", "sub_domain"),
+)
+RECORDS_CHANGED = Counter(
+    "dnspod_records_changed_total", "执行成功的记录变更数", ("action",)
+)
+
+FAILOVER_REPOINTS = Counter(
+    "dnspod_failover_repoints_total", "已发布IP故障后快速切换的记录数"
+)
+
+# DNSPod接口
+API_DURATION = Histogram(
+    "dnspod_api_request_duration_seconds",
+    "DNSPod接口单次调用耗时，不含限速等待",
+    ("action", "account"),
+)
+API_ERRORS = Counter(
+    "dnspod_api_errors_total", "DNSPod接口调用错误数", ("action", "code", "account")
+)
+
+# 优选IP数据源
+FEED_FETCH_DURATION = Histogram(
+    "dnspod_feed_fetch_duration_seconds", "优选IP数据源单次拉取耗时", ("source",)
+)
+
+# 可达性探测
+PROBE_RTT = Histogram(
+    "dnspod_probe_rtt_seconds", "单次探测的往返时间，只统计成功的探测", ("method",), RTT_BUCKETS
+)
+PROBE_FAILURES = Counter("dnspod_probe_failures_total", "失败的探测次数", ("method",))
+
+# 以下指标在采集时读取已有统计，由DNSPodManager设置取值函数
+CACHE_HITS = Counter("dnspod_reachability_cache_hits_total", "可达性缓存命中次数")
+CACHE_MISSES = Counter("dnspod_reachability_cache_misses_total", "可达性缓存未命中次数")
+CACHE_EVICTIONS = Counter(
+    "dnspod_reachability_cache_evictions_total", "可达性缓存淘汰次数"
+)
+CACHE_SIZE = Gauge("dnspod_reachability_cache_size", "可达性缓存当前条目数")
+PUBLISHED_IPS = Gauge(
+    "dnspod_published_ips", "各线路当前发布的不同IP数", ("line", "record_type")
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 不输出访问日志
+        pass
+
+
+def start_server(host: str, port: int, registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """在后台线程启动指标HTTP服务"""
+    handler = type("MetricsHandler", (_Handler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics", daemon=True)
+    thread.start()
+    logger.info(f"指标服务已启动: http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,141 @@
+from collections import namedtuple
+from typing import Dict, List, Tuple
+
+from records import RecordIndex
+
+# 默认线路名称
+DEFAULT_LINE = "默认"
+
+# 记录类型与优选IP版本、域名配置开关的对应关系
+RECORD_TYPES = [("A", "v4", "ipv4_enabled"), ("AAAA", "v6", "ipv6_enabled")]
+
+# 一条计划中的记录变更
+# action为 modify / create / delete；record_id在create时为None；
+# old_value在create时为None；latency为新IP的延迟，delete时为None
+RecordAction = namedtuple(
+    "RecordAction",
+    [
+        "action",
+        "domain",
+        "sub_domain",
+        "record_type",
+        "line",
+        "value",
+        "ttl",
+        "remark",
+        "record_id",
+        "old_value",
+        "latency",
+    ],
+)
+
+# 计划的执行顺序：先原地修改，再创建，最后删除，避免出现解析空窗
+ACTION_ORDER = {"modify": 0, "create": 1, "delete": 2}
+
+
+def desired_records(domain_config: Dict, selected: Dict) -> Dict:
+    """计算子域名期望的记录
+
+    selected为本周期各版本、各线路的最优IP，格式: {'v4': {'移动': (ip, 延迟), ...}}。
+    返回格式: {(线路, 记录类型): (IP, 延迟, 是否必需)}。所有线路最优IP相同时只需要默认
+    线路，此时各线路标记为非必需：已有记录时同步为同一IP，没有记录时不再创建。
+    """
+    desired = {}
+    for record_type, ip_version, enabled_key in RECORD_TYPES:
+        if not domain_config.get(enabled_key):
+            continue
+        best_ips = selected.get(ip_version, {})
+        if not best_ips:
+            continue
+
+        unique_ips = {ip for ip, _ in best_ips.values()}
+        if len(unique_ips) == 1:
+            # 所有线路的IP相同，只需要默认线路
+            ip = unique_ips.pop()
+            min_latency = min(latency for _, latency in best_ips.values())
+            desired[(DEFAULT_LINE, record_type)] = (ip, min_latency, True)
+            for line, (_, latency) in best_ips.items():
+                desired[(line, record_type)] = (ip, latency, False)
+        else:
+            # IP不同，每个线路单独一条记录，默认线路使用延迟最低的IP
+            for line, (ip, latency) in best_ips.items():
+                desired[(line, record_type)] = (ip, latency, True)
+            ip, latency = min(best_ips.values(), key=lambda x: x[1])
+            desired[(DEFAULT_LINE, record_type)] = (ip, latency, True)
+    return desired
+
+
+def plan_domain(
+    domain_config: Dict, selected: Dict, record_index: RecordIndex
+) -> List[RecordAction]:
+    """对比期望记录与索引中的当前记录，生成单个子域名的最小变更计划"""
+    domain = domain_config["domain"]
+    sub_domain = domain_config["sub_domain"]
+    ttl = domain_config.get("ttl", 600)
+    remark = domain_config.get("remark")
+
+    actions = []
+    desired = desired_records(domain_config, selected)
+    for (line, record_type), (ip, latency, required) in desired.items():
+        existing = record_index.get_all(domain, sub_domain, line, record_type)
+        if not existing:
+            if required:
+                actions.append(
+                    RecordAction(
+                        "create", domain, sub_domain, record_type, line,
+                        ip, ttl, remark, None, None, latency,
+                    )
+                )
+            continue
+
+        entry = existing[0]
+        if entry.value != ip or entry.ttl != ttl:
+            actions.append(
+                RecordAction(
+                    "modify", domain, sub_domain, record_type, line,
+                    ip, ttl, remark, entry.record_id, entry.value, latency,
+                )
+            )
+        # 同一线路的重复记录只保留第一条
+        for duplicate in existing[1:]:
+            actions.append(
+                RecordAction(
+                    "delete", domain, sub_domain, record_type, line,
+                    None, duplicate.ttl, None, duplicate.record_id, duplicate.value, None,
+                )
+            )
+
+    actions.sort(key=lambda a: ACTION_ORDER[a.action])
+    return actions
+
+
+def build_plan(
+    domain_configs: List[Dict], selected: Dict, record_index: RecordIndex
+) -> List[RecordAction]:
+    """为所有启用的域名配置生成完整的变更计划"""
+    plan = []
+    for domain_config in domain_configs:
+        if domain_config["enabled"]:
+            plan.extend(plan_domain(domain_config, selected, record_index))
+    return plan
+
+
+def group_by_sub_domain(plan: List[RecordAction]) -> Dict[Tuple[str, str], List]:
+    """按(主域名, 子域名)分组，保持组内原有顺序"""
+    groups = {}
+    for action in plan:
+        groups.setdefault((action.domain, action.sub_domain), []).append(action)
+    return groups
+
+
+def format_action(action: RecordAction) -> str:
+    """把一条变更格式化为便于阅读的文本"""
+    name = f"{action.domain} - {action.sub_domain} - {action.line} - {action.record_type}"
+    if action.action == "create":
+        return f"创建 {name}: {action.value} (延迟: {action.latency}ms)"
+    if action.action == "modify":
+        return (
+            f"修改 {name}: {action.old_value} -> {action.value} "
+            f"(延迟: {action.latency}ms)"
+        )
+    return f"删除 {name}: {action.old_value} [重复记录]"
@@ -0,0 +1,343 @@
+import errno
+import ipaddress
+import os
+import select
+import socket
+import statistics
+import struct
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+import config
+import spans
+from metrics import PROBE_FAILURES, PROBE_RTT
+
+# ICMP回显请求/应答类型
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMPV6_ECHO_REQUEST = 128
+ICMPV6_ECHO_REPLY = 129
+
+# 一个IP的测量结果，往返时间单位为毫秒，loss为丢包比例（0~1），全部丢失时rtt为None
+Measurement = namedtuple("Measurement", ["min_rtt", "median_rtt", "loss"])
+
+
+def icmp_checksum(data: bytes) -> int:
+    """计算ICMP校验和"""
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+class Prober:
+    """并发可达性探测器，优先使用ICMP，不可用时回退到TCP连接"""
+
+    def __init__(
+        self, concurrency: int = None, timeout: float = None, tcp_port: int = None
+    ):
+        self.concurrency = concurrency or config.probe_concurrency
+        self.timeout = timeout or config.probe_timeout
+        self.tcp_port = tcp_port or config.probe_port
+        self._seq = os.getpid() & 0xFFFF
+        self._seq_lock = threading.Lock()
+        # 各IP版本可用的ICMP套接字类型，None表示需要回退到TCP
+        self._icmp_mode = {
+            4: self._detect_icmp_mode(socket.AF_INET, socket.IPPROTO_ICMP),
+            6: self._detect_icmp_mode(socket.AF_INET6, socket.IPPROTO_ICMPV6),
+        }
+        self.ipv6_supported = self._detect_ipv6()
+        logger.info(
+            f"可达性探测方式: IPv4={self._icmp_mode[4] or 'tcp'}, "
+            f"IPv6={(self._icmp_mode[6] or 'tcp') if self.ipv6_supported else '不可用'}"
+        )
+
+    @staticmethod
+    def _detect_icmp_mode(family: int, proto: int) -> Optional[str]:
+        """检测当前环境可以使用的ICMP套接字，优先非特权套接字"""
+        for mode, sock_type in (("dgram", socket.SOCK_DGRAM), ("raw", socket.SOCK_RAW)):
+            try:
+                sock = socket.socket(family, sock_type, proto)
+                sock.close()
+                return mode
+            except OSError:
+                continue
+        return None
+
+    @staticmethod
+    def _detect_ipv6() -> bool:
+        """检测本机是否有IPv6出口，UDP connect不会真正发送数据"""
+        try:
+            sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+            try:
+                sock.connect(("2400:3200::1", 53))
+            finally:
+                sock.close()
+            return True
+        except OSError:
+            return False
+
+    def _next_seq(self) -> int:
+        with self._seq_lock:
+            self._seq = (self._seq + 1) & 0xFFFF
+            return self._seq
+
+    def _icmp_socket(
+        self, ip: str, version: int, mode: str
+    ) -> Tuple[socket.socket, int, bytes]:
+        """创建ICMP套接字并发送一次回显请求，返回(套接字, 序号, 负载)"""
+        if version == 4:
+            family, proto = socket.AF_INET, socket.IPPROTO_ICMP
+            request_type = ICMP_ECHO_REQUEST
+        else:
+            family, proto = socket.AF_INET6, socket.IPPROTO_ICMPV6
+            request_type = ICMPV6_ECHO_REQUEST
+        sock_type = socket.SOCK_DGRAM if mode == "dgram" else socket.SOCK_RAW
+
+        ident = os.getpid() & 0xFFFF
+        seq = self._next_seq()
+        payload = struct.pack("!d", time.time()) + b"dnspod-yxip"
+        header = struct.pack("!BBHHH", request_type, 0, 0, ident, seq)
+        # IPv6的校验和由内核计算
+        if version == 4:
+            checksum = icmp_checksum(header + payload)
+            header = struct.pack("!BBHHH", request_type, 0, checksum, ident, seq)
+
+        sock = socket.socket(family, sock_type, proto)
+        try:
+            sock.sendto(header + payload, (ip, 0))
+        except OSError:
+            sock.close()
+            raise
+        return sock, seq, payload
+
+    @staticmethod
+    def _icmp_matches(
+        sock: socket.socket, ip: str, version: int, mode: str, seq: int, payload: bytes
+    ) -> bool:
+        """读取一个ICMP数据包，判断是否为本次请求的回显应答"""
+        data, address = sock.recvfrom(1024)
+        # 原始套接字会收到所有ICMP数据包，必须确认来源地址
+        if ipaddress.ip_address(address[0].split("%")[0]) != ipaddress.ip_address(ip):
+            return False
+        # IPv4原始套接字收到的数据包含IP头
+        if version == 4 and mode == "raw":
+            data = data[(data[0] & 0x0F) * 4 :]
+        if len(data) < 8:
+            return False
+        reply_type = ICMP_ECHO_REPLY if version == 4 else ICMPV6_ECHO_REPLY
+        reply, _, _, _, reply_seq = struct.unpack("!BBHHH", data[:8])
+        # 非特权套接字的标识符由内核改写，这里只比较序号和负载
+        return reply == reply_type and reply_seq == seq and data[8:] == payload
+
+    def _icmp_ping(self, ip: str, version: int, mode: str) -> Optional[float]:
+        """发送一次ICMP回显请求，返回往返时间（毫秒），失败返回None"""
+        start = time.perf_counter()
+        sock, seq, payload = self._icmp_socket(ip, version, mode)
+        with sock:
+            deadline = start + self.timeout
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return None
+                sock.settimeout(remaining)
+                try:
+                    if self._icmp_matches(sock, ip, version, mode, seq, payload):
+                        return (time.perf_counter() - start) * 1000
+                except socket.timeout:
+                    return None
+
+    def _tcp_socket(self, ip: str, version: int) -> socket.socket:
+        """创建非阻塞TCP套接字并开始连接"""
+        family = socket.AF_INET if version == 4 else socket.AF_INET6
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        sock.connect_ex((ip, self.tcp_port))
+        return sock
+
+    def _race(
+        self, ip: str, version: int, mode: Optional[str]
+    ) -> Tuple[Optional[str], Optional[float]]:
+        """同时发出ICMP回显请求和TCP连接，返回(最先成功的方式, 往返时间毫秒)
+
+        两种方式共用一个超时，都失败时返回(None, None)。连接被拒绝同样视为主机在线。
+        """
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        icmp_sock, seq, payload = None, None, None
+        if mode:
+            try:
+                icmp_sock, seq, payload = self._icmp_socket(ip, version, mode)
+            except OSError as e:
+                logger.debug(f"ICMP探测IP {ip} 出错: {str(e)}")
+        tcp_sock = self._tcp_socket(ip, version)
+        try:
+            while icmp_sock or tcp_sock:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                readable, writable, _ = select.select(
+                    [icmp_sock] if icmp_sock else [],
+                    [tcp_sock] if tcp_sock else [],
+                    [],
+                    remaining,
+                )
+                if writable:
+                    error = tcp_sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if error in (0, errno.ECONNREFUSED):
+                        return "tcp", (time.perf_counter() - start) * 1000
+                    tcp_sock.close()
+                    tcp_sock = None
+                if readable:
+                    try:
+                        if self._icmp_matches(icmp_sock, ip, version, mode, seq, payload):
+                            return "icmp", (time.perf_counter() - start) * 1000
+                    except OSError:
+                        icmp_sock.close()
+                        icmp_sock = None
+            return None, None
+        finally:
+            for sock in (icmp_sock, tcp_sock):
+                if sock:
+                    sock.close()
+
+    def _tcp_ping(self, ip: str, version: int) -> Optional[float]:
+        """建立一次TCP连接，返回握手耗时（毫秒），失败返回None
+
+        连接被拒绝说明主机在线、只是端口未监听，收到RST的耗时同样是一次往返。
+        """
+        family = socket.AF_INET if version == 4 else socket.AF_INET6
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            start = time.perf_counter()
+            try:
+                sock.connect((ip, self.tcp_port))
+            except ConnectionRefusedError:
+                pass
+            except OSError:
+                return None
+            return (time.perf_counter() - start) * 1000
+
+    @staticmethod
+    def _observe(method: str, rtt: Optional[float]) -> Optional[float]:
+        """记录一次探测结果到指标"""
+        if rtt is None:
+            PROBE_FAILURES.inc(method)
+        else:
+            PROBE_RTT.observe(rtt / 1000, method)
+        return rtt
+
+    def probe_method(self, ip: str, method: str) -> Optional[float]:
+        """用指定方式探测一次，返回往返时间（毫秒），失败返回None
+
+        本机无法使用ICMP时，icmp方式也改用TCP连接。
+        """
+        try:
+            version = ipaddress.ip_address(ip).version
+            mode = self._icmp_mode[version]
+            if method == "icmp" and mode:
+                return self._observe("icmp", self._icmp_ping(ip, version, mode))
+            return self._observe("tcp", self._tcp_ping(ip, version))
+        except (OSError, ValueError) as e:
+            logger.debug(f"探测IP {ip} 出错: {str(e)}")
+            return None
+
+    def measure_many(
+        self, ips: Iterable[str], samples: int = None, methods: List[str] = None
+    ) -> Dict[str, Measurement]:
+        """并发测量一组IP的往返时间和丢包率
+
+        每个IP按每种方式各发送samples次探测，所有探测同时进行，
+        返回格式: {ip: Measurement}。丢包率按方式分别计算后取平均，只计入至少
+        成功一次的方式，避免某种方式被过滤（如禁ping）时把主机算成丢包。
+        """
+        samples = samples or config.measure_samples
+        methods = methods or config.measure_methods
+        ips = list(dict.fromkeys(ips))
+        if not ips:
+            return {}
+
+        # 格式: {ip: {方式: [往返时间, ...]}}
+        rtts = {ip: {method: [] for method in methods} for ip in ips}
+        jobs = [(ip, method) for ip in ips for method in methods for _ in range(samples)]
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(jobs))) as pool:
+            probe_method = spans.bind(self.probe_method)
+            futures = {
+                pool.submit(probe_method, ip, method): (ip, method) for ip, method in jobs
+            }
+            for future in as_completed(futures):
+                rtt = future.result()
+                if rtt is not None:
+                    ip, method = futures[future]
+                    rtts[ip][method].append(rtt)
+
+        measurements = {}
+        for ip, per_method in rtts.items():
+            answered = [values for values in per_method.values() if values]
+            if not answered:
+                measurements[ip] = Measurement(None, None, 1.0)
+                continue
+            loss = sum(1 - len(values) / samples for values in answered) / len(answered)
+            values = [rtt for values in answered for rtt in values]
+            measurements[ip] = Measurement(min(values), statistics.median(values), loss)
+        return measurements
+
+    def probe(self, ip: str) -> Optional[float]:
+        """探测单个IP，返回往返时间（毫秒），不可达返回None
+
+        ICMP和TCP同时进行，取最先成功的一种，不可达的IP只花费一次超时时间。
+        """
+        try:
+            version = ipaddress.ip_address(ip).version
+        except ValueError:
+            logger.error(f"无效的IP地址: {ip}")
+            return None
+
+        mode = self._icmp_mode[version]
+        try:
+            method, rtt = self._race(ip, version, mode)
+        except OSError as e:
+            logger.debug(f"探测IP {ip} 出错: {str(e)}")
+            method, rtt = None, None
+        if method:
+            return self._observe(method, rtt)
+        for failed in ("icmp", "tcp") if mode else ("tcp",):
+            self._observe(failed, None)
+        return None
+
+    def probe_many(
+        self, ips: Iterable[str], limit: int = None
+    ) -> List[Tuple[str, float]]:
+        """并发探测一组IP，返回可达IP及往返时间，按延迟升序排列
+
+        指定limit时，收集到limit个可达IP后立即返回，取消尚未开始的探测，正在进行的
+        探测在后台结束，不再等待。
+        """
+        ips = list(dict.fromkeys(ips))
+        if not ips:
+            return []
+
+        reachable = []
+        pool = ThreadPoolExecutor(max_workers=min(self.concurrency, len(ips)))
+        try:
+            probe = spans.bind(self.probe)
+            futures = {pool.submit(probe, ip): ip for ip in ips}
+            for future in as_completed(futures):
+                rtt = future.result()
+                if rtt is None:
+                    continue
+                reachable.append((futures[future], rtt))
+                if limit and len(reachable) >= limit:
+                    break
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        reachable.sort(key=lambda x: x[1])
+        return reachable[:limit] if limit else reachable
@@ -0,0 +1,184 @@
+import copy
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 优选IP接口中的线路标识
+LINE_KEYS = ["CM", "CU", "CT"]
+# 优选IP接口中的IP版本标识
+IP_VERSIONS = ["v4", "v6"]
+
+
+def latency_score(table: "CandidateTable", row: int) -> float:
+    """默认评分：只看有效延迟，越小越好"""
+    return table.latency[row]
+
+
+def weighted_score(
+    latency_weight: float = 1.0,
+    loss_weight: float = 0.0,
+    sticky_ips: Dict[str, float] = None,
+) -> Callable[["CandidateTable", int], float]:
+    """组合评分：延迟 + 丢包率惩罚 - 粘性加分
+
+    loss_weight为每1%丢包折算的毫秒数；sticky_ips格式: {ip: 加分毫秒数}，
+    用于让当前已发布的IP在分数接近时优先保留。
+    """
+    sticky_ips = sticky_ips or {}
+
+    def score(table: "CandidateTable", row: int) -> float:
+        return (
+            table.latency[row] * latency_weight
+            + table.loss[row] * loss_weight
+            - sticky_ips.get(table.ip[row], 0)
+        )
+
+    return score
+
+
+def ip_tie_breaker(table: "CandidateTable", row: int):
+    """默认平局规则：分数相同时按IP字符串排序，保证结果稳定"""
+    return table.ip[row]
+
+
+class CandidateTable:
+    """候选IP列式表
+
+    把一份优选IP数据一次性展开为按列存放的数组（ip、线路、版本、延迟、丢包），
+    并按评分预先计算各版本、各线路以及全局的排序。之后的“线路最优”、“全局最优”、
+    “前k个可达”、“各线路是否相同”等查询只需沿排序顺序读取，不再重复排序。
+    """
+
+    def __init__(
+        self,
+        data: Dict,
+        scorer: Callable[["CandidateTable", int], float] = latency_score,
+        tie_breaker: Callable[["CandidateTable", int], object] = ip_tie_breaker,
+    ):
+        self.ip: List[str] = []
+        self.line: List[str] = []
+        self.version: List[str] = []
+        # 优选IP接口给出的延迟
+        self.feed_latency: List[float] = []
+        # 用于排序的有效延迟，未测量时等于接口给出的延迟
+        self.latency: List[float] = []
+        # 丢包率（%）
+        self.loss: List[float] = []
+        # 原始数据中的条目，保持对外返回格式不变
+        self.info: List[Dict] = []
+        for version in IP_VERSIONS:
+            lines = data.get(version) or {}
+            for line_key in LINE_KEYS:
+                for ip_info in lines.get(line_key) or []:
+                    self.ip.append(ip_info["ip"])
+                    self.line.append(line_key)
+                    self.version.append(version)
+                    self.feed_latency.append(ip_info["latency"])
+                    self.latency.append(ip_info["latency"])
+                    self.loss.append(ip_info.get("loss", 0) or 0)
+                    self.info.append(ip_info)
+
+        self.scorer = scorer
+        self.tie_breaker = tie_breaker
+        # IP到延迟的索引，首次查询时建立
+        self._latency_index = None
+        self.rank()
+
+    def rank(self, scorer: Callable = None):
+        """按评分计算排序，可以传入新的评分函数重新排序"""
+        if scorer:
+            self.scorer = scorer
+        self.score = [self.scorer(self, row) for row in range(len(self.ip))]
+        rows = sorted(
+            range(len(self.ip)),
+            key=lambda row: (self.score[row], self.tie_breaker(self, row)),
+        )
+        # 格式: {(版本, 线路): [行号, ...]}，线路为None表示该版本所有线路
+        self._order: Dict[Tuple[str, Optional[str]], List[int]] = {}
+        for row in rows:
+            version, line_key = self.version[row], self.line[row]
+            self._order.setdefault((version, line_key), []).append(row)
+            self._order.setdefault((version, None), []).append(row)
+
+    def with_measurements(
+        self, measurements: Dict[str, tuple], blend: float, scorer: Callable = None
+    ) -> "CandidateTable":
+        """返回用本机测量结果修正有效延迟并重新排序的新表，本表不变
+
+        measurements格式: {ip: (往返时间毫秒, 丢包比例0~1)}；有效延迟为
+        blend * 本机往返时间 + (1 - blend) * 接口延迟，没有测量结果的IP保持接口延迟。
+        其他线程可能正在读取本表，因此不做原地修改。
+        """
+        table = copy.copy(self)
+        table.latency = list(self.feed_latency)
+        table.loss = list(self.loss)
+        for row, ip in enumerate(self.ip):
+            if ip in measurements:
+                rtt, loss = measurements[ip]
+                table.latency[row] = round(blend * rtt + (1 - blend) * self.feed_latency[row], 1)
+                table.loss[row] = loss * 100
+        table._latency_index = None
+        table.rank(scorer)
+        return table
+
+    def latency_of(self, ip: str, line_key: str = None) -> Optional[float]:
+        """IP在指定线路上的延迟，line_key为None时取所有线路中的最小值，不存在返回None"""
+        if self._latency_index is None:
+            index = {}
+            for row, row_ip in enumerate(self.ip):
+                for key in ((row_ip, self.line[row]), (row_ip, None)):
+                    if key not in index or self.latency[row] < index[key]:
+                        index[key] = self.latency[row]
+            self._latency_index = index
+        return self._latency_index.get((ip, line_key))
+
+    def rows(self, version: str, line_key: str = None) -> List[int]:
+        """指定版本、线路按评分排列的行号，line_key为None表示所有线路"""
+        return self._order.get((version, line_key), [])
+
+    def has_version(self, version: str) -> bool:
+        """是否包含指定版本的IP"""
+        return bool(self.rows(version))
+
+    def top_k(
+        self,
+        version: str,
+        line_key: str = None,
+        k: int = 1,
+        reachable: Callable[[str], bool] = None,
+    ) -> List[Tuple[str, float]]:
+        """按评分取前k个IP，指定reachable时跳过不可达的IP，返回[(IP, 延迟), ...]"""
+        result = []
+        for row in self.rows(version, line_key):
+            if reachable and not reachable(self.ip[row]):
+                continue
+            result.append((self.ip[row], self.latency[row]))
+            if len(result) >= k:
+                break
+        return result
+
+    def best(
+        self,
+        version: str,
+        line_key: str = None,
+        reachable: Callable[[str], bool] = None,
+    ) -> Optional[Tuple[str, float]]:
+        """评分最优的IP，line_key为None时为全局最优"""
+        top = self.top_k(version, line_key, 1, reachable)
+        return top[0] if top else None
+
+    def best_per_line(
+        self, version: str, reachable: Callable[[str], bool] = None
+    ) -> Dict[str, Tuple[str, float]]:
+        """各线路评分最优的IP，格式: {线路标识: (IP, 延迟)}"""
+        best_ips = {}
+        for line_key in LINE_KEYS:
+            best = self.best(version, line_key, reachable)
+            if best:
+                best_ips[line_key] = best
+        return best_ips
+
+    def all_lines_identical(
+        self, version: str, reachable: Callable[[str], bool] = None
+    ) -> bool:
+        """各线路最优IP是否相同"""
+        best_ips = self.best_per_line(version, reachable)
+        return bool(best_ips) and len({ip for ip, _ in best_ips.values()}) == 1
@@ -0,0 +1,57 @@
+import threading
+import time
+from typing import Dict
+
+
+class TokenBucket:
+    """令牌桶限速器，线程安全"""
+
+    def __init__(self, rate: float, burst: int = None):
+        # 每秒补充的令牌数
+        self.rate = rate
+        # 桶容量，即允许的最大突发请求数
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """取一个令牌，令牌不足时阻塞等待，返回等待时间（秒）"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class RateLimiter:
+    """按接口名称分别限速，每个接口一个令牌桶"""
+
+    def __init__(self, rate: float, burst: int = None, overrides: Dict = None):
+        self.rate = rate
+        self.burst = burst
+        # 单独指定频率的接口，格式: {接口名: 每秒请求数}
+        self.overrides = overrides or {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, action: str) -> TokenBucket:
+        """获取指定接口的令牌桶"""
+        with self._lock:
+            if action not in self._buckets:
+                rate = self.overrides.get(action, self.rate)
+                self._buckets[action] = TokenBucket(rate, self.burst)
+            return self._buckets[action]
+
+    def acquire(self, action: str) -> float:
+        """调用接口前取令牌，返回等待时间（秒）"""
+        return self.bucket(action).acquire()
@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 索引中的一条解析记录
+RecordEntry = namedtuple("RecordEntry", ["record_id", "value", "ttl"])
+
+# 一个主域名下的索引，格式: {子域名: {(线路, 记录类型): [RecordEntry, ...]}}
+Zone = Dict[str, Dict[Tuple[str, str], List[RecordEntry]]]
+
+
+class RecordIndex:
+    """解析记录内存索引
+
+    格式: {主域名: {子域名: {(线路, 记录类型): [RecordEntry, ...]}}}。按主域名、子域名
+    分层存放，读取一个子域名或替换一个主域名都只涉及自身的记录，与索引总大小无关。
+    每个主域名每周期只整体拉取一次记录列表，同一主域名下的所有子域名配置共用；写入
+    成功后原地更新，不需要再次查询。同一个键下通常只有一条记录，有多条时说明存在
+    重复记录，以第一条为准，其余的由计划删除。
+    """
+
+    def __init__(self):
+        self._zones: Dict[str, Zone] = {}
+        # 各主域名最近一次整体加载的时间
+        self._loaded_at: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def load_zone(self, domain: str, records: Iterable, loaded_at: float = None):
+        """用一次完整的记录列表替换某个主域名下的全部索引"""
+        zone: Zone = {}
+        for record in records:
+            zone.setdefault(record.Name, {}).setdefault((record.Line, record.Type), []).append(
+                RecordEntry(record.RecordId, record.Value, record.TTL)
+            )
+        with self._lock:
+            self._zones[domain] = zone
+            self._loaded_at[domain] = loaded_at if loaded_at is not None else time.time()
+
+    def dump(self) -> Dict:
+        """导出索引，用于持久化"""
+        zones = {}
+        with self._lock:
+            for domain, loaded_at in self._loaded_at.items():
+                records = []
+                for sub_domain, keys in self._zones.get(domain, {}).items():
+                    for (line, record_type), entries in keys.items():
+                        for entry in entries:
+                            records.append([sub_domain, line, record_type, *entry])
+                zones[domain] = {"loaded_at": loaded_at, "records": records}
+        return zones
+
+    def restore(self, zones: Dict):
+        """从持久化数据恢复索引，保留各主域名原来的加载时间"""
+        with self._lock:
+            for domain, zone in zones.items():
+                restored: Zone = {}
+                for sub_domain, line, record_type, *entry in zone["records"]:
+                    restored.setdefault(sub_domain, {}).setdefault(
+                        (line, record_type), []
+                    ).append(RecordEntry(*entry))
+                self._zones[domain] = restored
+                self._loaded_at[domain] = zone["loaded_at"]
+
+    def drop_zone(self, domain: str):
+        """移除某个主域名的全部索引"""
+        with self._lock:
+            self._zones.pop(domain, None)
+            self._loaded_at.pop(domain, None)
+
+    def has_zone(self, domain: str) -> bool:
+        """主域名是否已加载"""
+        return domain in self._loaded_at
+
+    def zone_age(self, domain: str) -> Optional[float]:
+        """主域名距离上次加载的时间（秒），未加载返回None"""
+        loaded_at = self._loaded_at.get(domain)
+        return None if loaded_at is None else time.time() - loaded_at
+
+    def get_all(
+        self, domain: str, sub_domain: str, line: str, record_type: str
+    ) -> List[RecordEntry]:
+        """获取指定键下的全部记录"""
+        with self._lock:
+            keys = self._zones.get(domain, {}).get(sub_domain, {})
+            return list(keys.get((line, record_type), []))
+
+    def get(
+        self, domain: str, sub_domain: str, line: str, record_type: str
+    ) -> Optional[RecordEntry]:
+        """获取指定键下的第一条记录"""
+        entries = self.get_all(domain, sub_domain, line, record_type)
+        return entries[0] if entries else None
+
+    def sub_domain_records(self, domain: str, sub_domain: str) -> Dict:
+        """获取子域名当前的记录，格式: {线路: {记录类型: IP}}，有重复记录时取第一条"""
+        current_records = {}
+        with self._lock:
+            keys = self._zones.get(domain, {}).get(sub_domain, {})
+            for (line, record_type), entries in keys.items():
+                if entries:
+                    current_records.setdefault(line, {})[record_type] = entries[0].value
+        return current_records
+
+    def set(
+        self,
+        domain: str,
+        sub_domain: str,
+        line: str,
+        record_type: str,
+        entry: RecordEntry,
+    ):
+        """写入成功后更新索引，替换同一记录ID的旧值，没有则追加"""
+        with self._lock:
+            entries = (
+                self._zones.setdefault(domain, {})
+                .setdefault(sub_domain, {})
+                .setdefault((line, record_type), [])
+            )
+            for i, old in enumerate(entries):
+                if old.record_id == entry.record_id:
+                    entries[i] = entry
+                    return
+            entries.append(entry)
+
+    def remove(
+        self,
+        domain: str,
+        sub_domain: str,
+        line: str,
+        record_type: str,
+        record_id: int,
+    ):
+        """删除成功后从索引中移除记录"""
+        with self._lock:
+            keys = self._zones.get(domain, {}).get(sub_domain)
+            if keys is None:
+                return
+            key = (line, record_type)
+            entries = [e for e in keys.get(key, []) if e.record_id != record_id]
+            if entries:
+                keys[key] = entries
+            else:
+                keys.pop(key, None)
+                if not keys:
+                    del self._zones[domain][sub_domain]
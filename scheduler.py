@@ -0,0 +1,154 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+
+class Job:
+    """一个定时任务"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], None],
+        interval: float,
+        jitter: float = 0,
+        deadline: float = None,
+        run_immediately: bool = False,
+    ):
+        self.name = name
+        self.func = func
+        # 执行间隔（秒）
+        self.interval = interval
+        # 间隔随机抖动比例，0.1表示在 ±10% 范围内浮动
+        self.jitter = jitter
+        # 单次执行的最长时间（秒），超时只告警，不会中断正在执行的任务
+        self.deadline = deadline or interval
+        self.next_run = time.monotonic() if run_immediately else self._next_after(
+            time.monotonic()
+        )
+        self.running = False
+        self.runs = 0
+        self.skipped = 0
+        self.overruns = 0
+
+    def _next_after(self, now: float) -> float:
+        return now + self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def schedule_next(self):
+        """计算下一次执行时间"""
+        self.next_run = self._next_after(time.monotonic())
+
+
+class Scheduler:
+    """基于asyncio的事件驱动调度器
+
+    各任务按各自的间隔独立运行，任务函数在线程池中执行，不阻塞调度。空闲时直接
+    休眠到最近一个任务的执行时间，不做轮询；同一任务上一次尚未结束时跳过本次执行。
+    任务可以在其他线程中添加和移除（如配置重新加载任务），jobs 的修改和遍历都在锁内进行。
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, Job] = {}
+        self._jobs_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable[[], None],
+        interval: float,
+        jitter: float = 0,
+        deadline: float = None,
+        run_immediately: bool = False,
+    ) -> Job:
+        """添加或替换一个任务"""
+        job = Job(name, func, interval, jitter, deadline, run_immediately)
+        with self._jobs_lock:
+            self.jobs[name] = job
+        self.wakeup()
+        return job
+
+    def remove_job(self, name: str):
+        """移除一个任务"""
+        with self._jobs_lock:
+            self.jobs.pop(name, None)
+        self.wakeup()
+
+    def run_now(self, name: str):
+        """让指定任务尽快执行一次，可在任意线程或信号处理函数中调用"""
+        with self._jobs_lock:
+            job = self.jobs.get(name)
+        if job:
+            job.next_run = time.monotonic()
+            self.wakeup()
+
+    def wakeup(self):
+        """任务变化后唤醒调度循环，重新计算休眠时间，可在任意线程调用"""
+        if self._loop and self._wakeup:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run_job(self, job: Job):
+        """在线程池中执行任务，超过截止时间时告警"""
+        job.running = True
+        job.runs += 1
+        start = time.monotonic()
+        future = asyncio.ensure_future(asyncio.to_thread(job.func))
+        try:
+            await asyncio.wait_for(asyncio.shield(future), job.deadline)
+        except asyncio.TimeoutError:
+            job.overruns += 1
+            logger.warning(f"任务 {job.name} 超过截止时间 {job.deadline:.0f}秒，仍在执行")
+            try:
+                await future
+            except Exception as e:
+                logger.error(f"任务 {job.name} 执行出错: {str(e)}")
+        except Exception as e:
+            logger.error(f"任务 {job.name} 执行出错: {str(e)}")
+        finally:
+            job.running = False
+            logger.debug(f"任务 {job.name} 完成，耗时 {time.monotonic() - start:.2f}秒")
+
+    def _snapshot(self) -> List[Job]:
+        """当前所有任务的列表，遍历时其他线程可以继续添加、移除任务"""
+        with self._jobs_lock:
+            return list(self.jobs.values())
+
+    def _due_jobs(self) -> List[Job]:
+        now = time.monotonic()
+        return [job for job in self._snapshot() if job.next_run <= now]
+
+    async def run_forever(self):
+        """调度主循环"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        tasks = set()
+        while True:
+            for job in self._due_jobs():
+                job.schedule_next()
+                if job.running:
+                    # 上一次还没执行完，跳过本次
+                    job.skipped += 1
+                    logger.warning(f"任务 {job.name} 上一次尚未完成，跳过本次执行")
+                    continue
+                task = asyncio.create_task(self._run_job(job))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            delay = None
+            jobs = self._snapshot()
+            if jobs:
+                delay = max(0, min(j.next_run for j in jobs) - time.monotonic())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def run(self):
+        """阻塞运行调度器"""
+        asyncio.run(self.run_forever())
@@ -0,0 +1,28 @@
+import hashlib
+from typing import Dict, List
+
+
+def shard_weight(key: str, replica: int) -> int:
+    """键在指定副本上的权重，使用稳定哈希，不同进程、不同机器结果一致"""
+    digest = hashlib.sha1(f"{replica}:{key}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def shard_owner(key: str, count: int) -> int:
+    """用最高随机权重（rendezvous）哈希计算键所属的副本
+
+    副本数变化时，只有原本属于被增减副本的键会迁移，其余键的归属不变。
+    """
+    if count <= 1:
+        return 0
+    return max(range(count), key=lambda replica: shard_weight(key, replica))
+
+
+def shard_domains(domains: List[Dict], index: int, count: int) -> List[Dict]:
+    """按主域名分片，返回属于第index个副本的域名配置
+
+    同一主域名下的子域名总是分到同一个副本，每个主域名的记录只由一个副本查询和修改。
+    """
+    if count <= 1:
+        return list(domains)
+    return [c for c in domains if shard_owner(c["domain"], count) == index]
@@ -0,0 +1,176 @@
+import contextvars
+import cProfile
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 耗时分类
+STAGE = "stage"  # 周期内的各个阶段
+DOMAIN = "domain"  # 各子域名执行变更
+API = "api"  # 各DNSPod接口调用
+SLEEP = "sleep"  # 限速等待、退避重试等休眠
+
+CATEGORIES = [STAGE, DOMAIN, API, SLEEP]
+
+# Python 3.12起cProfile基于sys.monitoring，一个Profile即可统计所有线程
+PROFILE_ALL_THREADS = sys.version_info >= (3, 12)
+
+
+class CycleTrace:
+    """一个检查周期的耗时统计，按分类、名称累计总耗时和次数，线程安全"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.elapsed: Optional[float] = None
+        # 格式: {分类: {名称: [总耗时, 次数]}}
+        self.totals: Dict[str, Dict[str, List[float]]] = {c: {} for c in CATEGORIES}
+        self._lock = threading.Lock()
+
+    def add(self, category: str, name: str, elapsed: float):
+        with self._lock:
+            item = self.totals[category].setdefault(name, [0.0, 0])
+            item[0] += elapsed
+            item[1] += 1
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def breakdown(self) -> Dict:
+        """结构化的耗时分解，各分类按总耗时降序排列"""
+        with self._lock:
+            result = {"total": round(self.elapsed or 0, 4)}
+            for category, items in self.totals.items():
+                result[category] = [
+                    {"name": name, "seconds": round(total, 4), "count": count}
+                    for name, (total, count) in sorted(
+                        items.items(), key=lambda x: x[1][0], reverse=True
+                    )
+                ]
+            return result
+
+
+class ThreadProfiles:
+    """一次性能分析中各工作线程的cProfile统计，每个线程一个Profile"""
+
+    def __init__(self):
+        self.profiles: List[cProfile.Profile] = []
+        self._local = threading.local()
+
+    def call(self, func: Callable, *args, **kwargs):
+        """在当前线程的Profile中执行func，同一线程嵌套调用时只统计最外层"""
+        if getattr(self._local, "active", False):
+            return func(*args, **kwargs)
+        profile = getattr(self._local, "profile", None)
+        if profile is None:
+            profile = self._local.profile = cProfile.Profile()
+            self.profiles.append(profile)
+        self._local.active = True
+        profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            self._local.active = False
+
+
+_current: contextvars.ContextVar[Optional[CycleTrace]] = contextvars.ContextVar(
+    "cycle_trace", default=None
+)
+_profiles: contextvars.ContextVar[Optional[ThreadProfiles]] = contextvars.ContextVar(
+    "thread_profiles", default=None
+)
+
+
+@contextmanager
+def trace_cycle():
+    """开始统计一个周期，期间当前上下文中的span都计入返回的CycleTrace"""
+    trace = CycleTrace()
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        trace.finish()
+        _current.reset(token)
+
+
+@contextmanager
+def span(category: str, name: str):
+    """统计一段代码的耗时，不在周期内时只有一次变量读取的开销"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(category, name, time.perf_counter() - start)
+
+
+def record(category: str, name: str, elapsed: float):
+    """直接记录一段已知的耗时，例如限速器返回的等待时间"""
+    trace = _current.get()
+    if trace is not None and elapsed:
+        trace.add(category, name, elapsed)
+
+
+def sleep(name: str, seconds: float):
+    """休眠并计入周期的休眠耗时"""
+    time.sleep(seconds)
+    record(SLEEP, name, seconds)
+
+
+def _call(func: Callable, *args, **kwargs):
+    profiles = _profiles.get()
+    if profiles is None:
+        return func(*args, **kwargs)
+    return profiles.call(func, *args, **kwargs)
+
+
+def bind(func: Callable) -> Callable:
+    """让提交到线程池的函数继承当前周期和性能分析，线程池默认不传递上下文"""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(_call, func, *args, **kwargs)
+
+    return run
+
+
+def profile(func: Callable, *args, **kwargs) -> Tuple[Any, pstats.Stats]:
+    """用cProfile统计func，返回(func的返回值, 合并后的统计)
+
+    Python 3.12以前cProfile只统计调用它的线程，期间通过bind提交到线程池的函数在
+    各工作线程中单独统计，最后合并。
+    """
+    profiles = ThreadProfiles()
+    token = _profiles.set(None if PROFILE_ALL_THREADS else profiles)
+    main = cProfile.Profile()
+    try:
+        result = main.runcall(func, *args, **kwargs)
+    finally:
+        _profiles.reset(token)
+    stats = pstats.Stats(main)
+    for thread_profile in profiles.profiles:
+        stats.add(thread_profile)
+    return result, stats
+
+
+def format_breakdown(breakdown: Dict, top: int = 5) -> List[str]:
+    """把耗时分解格式化为便于阅读的几行文本"""
+
+    def join(items, limit=top):
+        return ", ".join(
+            f"{item['name']} {item['seconds']:.2f}秒/{item['count']}次" for item in items[:limit]
+        ) or "无"
+
+    return [
+        f"本周期耗时分解（总计 {breakdown['total']:.2f}秒）",
+        f"  阶段: {join(breakdown[STAGE], None)}",
+        f"  接口: {join(breakdown[API])}",
+        f"  休眠: {join(breakdown[SLEEP])}",
+        f"  最慢的子域名: {join(breakdown[DOMAIN])}",
+    ]
@@ -0,0 +1,56 @@
+import json
+import os
+import tempfile
+from typing import Dict
+
+from loguru import logger
+
+# 状态文件格式版本，格式不兼容时直接丢弃旧文件
+STATE_VERSION = 1
+
+
+class StateStore:
+    """程序运行状态的持久化存储
+
+    使用单个JSON文件保存解析记录索引、IP可用性缓存和最近一次优选IP快照，
+    写入时先写临时文件再原子替换，进程中途退出也不会留下损坏的文件。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Dict:
+        """读取状态文件，文件不存在或无法解析时返回空字典"""
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("version") != STATE_VERSION:
+                logger.warning(f"状态文件 {self.path} 版本不匹配，已忽略")
+                return {}
+            return state
+        except Exception as e:
+            logger.error(f"读取状态文件 {self.path} 失败: {str(e)}")
+            return {}
+
+    def save(self, state: Dict) -> bool:
+        """原子写入状态文件"""
+        state = dict(state, version=STATE_VERSION)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=".state-", suffix=".tmp", dir=directory
+            )
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+                os.replace(tmp_path, self.path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+            return True
+        except Exception as e:
+            logger.error(f"写入状态文件 {self.path} 失败: {str(e)}")
+            return False
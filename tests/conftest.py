@@ -0,0 +1,75 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config  # noqa: E402
+
+# 测试不读取项目目录下的 config.yaml，使用一份只有测试密钥的配置
+_config_dir = tempfile.mkdtemp(prefix="dnspod-test-")
+config.CONFIG_FILE = os.path.join(_config_dir, "config.yaml")
+with open(config.CONFIG_FILE, "w", encoding="utf-8") as f:
+    f.write("tencent:\n  secret_id: test\n  secret_key: test\ndomains: []\n")
+
+# 导入时可能读取配置，必须在替换配置文件之后导入
+import main  # noqa: E402
+from bench.fake_dnspod import FakeDNSPod  # noqa: E402
+from bench.fake_feed import generate_data  # noqa: E402
+from bench.fake_prober import FakeProber  # noqa: E402
+from feed import IPFeed, StaticSource  # noqa: E402
+
+
+@pytest.fixture
+def domain_config():
+    """一个同时开启IPv4和IPv6的子域名配置"""
+    return {
+        "domain": "example.com",
+        "sub_domain": "www",
+        "ipv4_enabled": True,
+        "ipv6_enabled": True,
+        "ttl": 600,
+        "remark": "test",
+        "enabled": True,
+    }
+
+
+@pytest.fixture
+def domains(monkeypatch, tmp_path, domain_config):
+    """example.com 下的 www 和 api 两个子域名，状态文件写到临时目录"""
+    domains = [domain_config, dict(domain_config, sub_domain="api")]
+    monkeypatch.setattr(config, "DOMAINS", domains)
+    monkeypatch.setattr(config, "state_file", str(tmp_path / "state.json"))
+    return domains
+
+
+@pytest.fixture
+def fake():
+    return FakeDNSPod()
+
+
+@pytest.fixture
+def make_manager(fake):
+    """用接口替身、固定优选IP和探测器替身创建 DNSPodManager"""
+    def make(prober=None, data=None):
+        feed = IPFeed([StaticSource("test", data or generate_data(5, seed=1))])
+        return main.DNSPodManager(fake, feed, prober or FakeProber(0))
+
+    return make
+
+
+def zone_records(fake, sub_domain, domain="example.com"):
+    """接口替身中某个子域名的记录，格式: {(线路, 记录类型): [值, ...]}"""
+    records = {}
+    for record in fake.zone_records(domain):
+        if record["Name"] == sub_domain:
+            records.setdefault((record["Line"], record["Type"]), []).append(record["Value"])
+    return records
+
+
+@pytest.fixture
+def zone(fake):
+    return lambda sub_domain: zone_records(fake, sub_domain)
@@ -0,0 +1,77 @@
+import time
+
+from cache import ReachabilityCache
+
+
+def test_positive_and_negative_results_use_their_own_ttl():
+    cache = ReachabilityCache(10, positive_ttl=600, negative_ttl=60, jitter=0)
+    now = time.time()
+    cache.put("1.1.1.1", True, 20, checked_at=now - 100)
+    cache.put("2.2.2.2", False, checked_at=now - 100)
+    assert cache.get("1.1.1.1") is True
+    assert cache.get("2.2.2.2") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_jitter_stays_within_bounds():
+    cache = ReachabilityCache(1000, positive_ttl=100, negative_ttl=100, jitter=0.2)
+    now = time.time()
+    for i in range(200):
+        cache.put(f"10.0.0.{i}", True, checked_at=now)
+    expiries = {entry.expires_at - now for entry in cache._entries.values()}
+    assert all(80 <= ttl <= 120 for ttl in expiries)
+    assert len(expiries) > 1
+
+
+def test_evicts_least_recently_used():
+    cache = ReachabilityCache(2, positive_ttl=600, negative_ttl=600, jitter=0)
+    cache.put("1.1.1.1", True)
+    cache.put("2.2.2.2", True)
+    cache.get("1.1.1.1")
+    cache.put("3.3.3.3", True)
+    assert cache.peek("2.2.2.2") is None
+    assert cache.peek("1.1.1.1") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_peek_is_not_counted():
+    cache = ReachabilityCache(10, positive_ttl=600, negative_ttl=600, jitter=0)
+    cache.put("1.1.1.1", True)
+    assert cache.peek("1.1.1.1").available is True
+    assert cache.peek("2.2.2.2") is None
+    assert cache.stats()["hits"] == cache.stats()["misses"] == 0
+
+
+def test_default_loss_follows_availability():
+    cache = ReachabilityCache(10, positive_ttl=600, negative_ttl=600, jitter=0)
+    cache.put("1.1.1.1", True, 20)
+    cache.put("2.2.2.2", False)
+    cache.put("3.3.3.3", True, 30, loss=0.25)
+    assert cache.measurements(["1.1.1.1", "2.2.2.2", "3.3.3.3", "4.4.4.4"]) == {
+        "1.1.1.1": (20, 0.0),
+        "3.3.3.3": (30, 0.25),
+    }
+
+
+def test_expiring_returns_missing_and_soon_expiring_ips():
+    cache = ReachabilityCache(10, positive_ttl=100, negative_ttl=100, jitter=0)
+    now = time.time()
+    cache.put("1.1.1.1", True, checked_at=now)
+    cache.put("2.2.2.2", True, checked_at=now - 90)
+    assert cache.expiring(["1.1.1.1", "2.2.2.2", "3.3.3.3"], 30) == ["2.2.2.2", "3.3.3.3"]
+
+
+def test_dump_and_restore_keep_original_check_time():
+    cache = ReachabilityCache(10, positive_ttl=600, negative_ttl=60, jitter=0)
+    now = time.time()
+    cache.put("1.1.1.1", True, 20, checked_at=now - 30, loss=0.1)
+    cache.put("2.2.2.2", False, checked_at=now - 120)
+    dumped = cache.dump()
+    assert list(dumped) == ["1.1.1.1"]
+
+    restored = ReachabilityCache(10, positive_ttl=600, negative_ttl=60, jitter=0)
+    restored.restore(dumped)
+    entry = restored.peek("1.1.1.1")
+    assert (entry.available, entry.rtt, entry.loss) == (True, 20, 0.1)
+    assert entry.expires_at == now - 30 + 600
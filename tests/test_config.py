@@ -0,0 +1,95 @@
+import pytest
+import yaml
+from loguru import logger
+
+import config
+
+
+def entry(sub_domain="www", **fields):
+    return dict({"domain": "example.com", "sub_domain": sub_domain}, **fields)
+
+
+def config_data(*domains):
+    return {"tencent": {"secret_id": "test", "secret_key": "test"}, "domains": list(domains)}
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    """写入临时配置文件，测试结束后恢复本模块的所有配置项"""
+    config.ensure_loaded()
+    settings = dict(vars(config))
+    path = tmp_path / "config.yaml"
+    monkeypatch.setattr(config, "CONFIG_FILE", str(path))
+
+    def write(data):
+        path.write_text(yaml.safe_dump(data, allow_unicode=True), encoding="utf-8")
+
+    yield write
+    vars(config).clear()
+    vars(config).update(settings)
+
+
+def test_omitted_fields_get_defaults():
+    (domain_config,) = config.parse(config_data(entry()))["ALL_DOMAINS"]
+    assert domain_config["enabled"] is True
+    assert domain_config["ipv4_enabled"] is False
+    assert domain_config["ttl"] == 600
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [{"enabled": "yes"}, {"ipv4_enabled": 1}, {"ttl": "600"}, {"ttl": 0}, {"ttl": True}],
+)
+def test_bad_field_types_are_rejected(fields):
+    assert config.validate_domains(config_data(entry(**fields)))
+
+
+def test_reload_normalizes_entries_without_enabled(config_file):
+    config_file(config_data(entry(ipv4_enabled=True)))
+    assert config.reload()
+    assert [c for c in config.DOMAINS if c["enabled"]] == config.ALL_DOMAINS
+
+
+def test_invalid_reload_keeps_current_config(config_file):
+    config_file(config_data(entry()))
+    assert config.reload()
+    current = config.ALL_DOMAINS
+
+    config_file(config_data(entry(), entry("api", enabled="no")))
+    assert not config.reload()
+    assert config.ALL_DOMAINS is current
+    assert not config.changed()
+
+
+def test_first_load_skips_invalid_entries(config_file):
+    config_file(config_data(entry(), entry("api", ttl="fast")))
+    for name in ("ALL_DOMAINS", "DOMAINS", "config_mtime"):
+        del vars(config)[name]
+    config._loaded = False
+
+    assert [c["sub_domain"] for c in config.ALL_DOMAINS] == ["www"]
+
+
+
+def test_optional_load_without_file_uses_defaults(config_file):
+    for name in ("LOG_LEVEL", "probe_timeout"):
+        del vars(config)[name]
+    config._loaded = False
+    errors = []
+    sink = logger.add(errors.append, level="ERROR")
+    try:
+        config.ensure_loaded(required=False)
+    finally:
+        logger.remove(sink)
+
+    assert errors == []
+    assert (config.LOG_LEVEL, config.probe_timeout) == ("INFO", 1)
+
+
+def test_diff_domains():
+    old = config.normalize_domains([entry("www"), entry("api"), entry("blog")])
+    new = config.normalize_domains([entry("www"), entry("api", ttl=300), entry("mail")])
+    added, removed, modified = config.diff_domains(old, new)
+    assert [c["sub_domain"] for c in added] == ["mail"]
+    assert [c["sub_domain"] for c in removed] == ["blog"]
+    assert modified == [new[1]]
@@ -0,0 +1,107 @@
+import pytest
+
+from damping import DampingPolicy
+from planner import RecordAction
+
+
+def modify(line, latency, old_value="1.1.1.1", value="2.2.2.2", record_id=1):
+    return RecordAction(
+        "modify", "example.com", "www", "A", line, value, 600, None, record_id, old_value, latency
+    )
+
+
+def always(_ip):
+    return True
+
+
+def current(latency):
+    """当前IP在所有线路上的延迟都为latency"""
+    return lambda ip, line: latency
+
+
+def test_margin_requires_absolute_and_relative_gain():
+    policy = DampingPolicy(min_gain_ms=10, min_gain_ratio=0.2)
+    plan = [
+        modify("移动", 95),  # 快5毫秒，低于绝对阈值
+        modify("联通", 85),  # 快15毫秒，低于20%
+        modify("电信", 70),  # 快30毫秒，两个阈值都满足
+    ]
+    kept = policy.filter(plan, current(100), always)
+    assert [a.line for a in kept] == ["电信"]
+    assert policy.stats()["suppressed"]["margin"] == 2
+
+
+def test_unknown_current_latency_counts_as_unbounded_gain():
+    policy = DampingPolicy(min_gain_ms=1000)
+    kept = policy.filter([modify("移动", 95)], lambda ip, line: None, always)
+    assert len(kept) == 1
+
+
+def test_unreachable_current_ip_is_forced_through():
+    policy = DampingPolicy(min_gain_ms=1000, min_hold=3600)
+    policy.record_applied([modify("移动", 95)])
+    kept = policy.filter([modify("移动", 99)], current(100), lambda ip: False)
+    assert len(kept) == 1
+    assert policy.stats()["forced"] == 1
+
+
+def test_hold_blocks_recently_changed_records():
+    policy = DampingPolicy(min_hold=3600)
+    policy.record_applied([modify("移动", 50)])
+    kept = policy.filter([modify("移动", 10), modify("联通", 10)], current(100), always)
+    assert [a.line for a in kept] == ["联通"]
+    assert policy.stats()["suppressed"]["hold"] == 1
+    assert policy.stats()["applied"] == 1
+
+
+def test_hold_expires():
+    policy = DampingPolicy(min_hold=60)
+    policy.record_applied([modify("移动", 50)])
+    key = ("example.com", "www", "移动", "A")
+    policy.changed_at[key] -= 61
+    assert len(policy.filter([modify("移动", 10)], current(100), always)) == 1
+
+
+def test_budget_keeps_largest_gains_in_plan_order():
+    policy = DampingPolicy(max_changes=2)
+    plan = [modify("默认", 90), modify("移动", 10), modify("联通", 50), modify("电信", 80)]
+    kept = policy.filter(plan, current(100), always)
+    assert [a.line for a in kept] == ["移动", "联通"]
+    assert policy.stats()["suppressed"]["budget"] == 2
+
+
+def test_non_modify_actions_are_never_suppressed():
+    policy = DampingPolicy(min_gain_ms=1000, max_changes=1)
+    create = RecordAction("create", "example.com", "www", "A", "移动", "2.2.2.2", 600, None, None, None, 99)
+    delete = RecordAction("delete", "example.com", "www", "A", "移动", None, 600, None, 2, "3.3.3.3", None)
+    same = modify("联通", 99, old_value="2.2.2.2")
+    kept = policy.filter([create, delete, same], current(100), always)
+    assert kept == [create, delete, same]
+
+
+def test_count_false_leaves_statistics_unchanged():
+    policy = DampingPolicy(min_gain_ms=10, max_changes=1)
+    plan = [
+        modify("移动", 95),
+        modify("联通", 95, old_value="3.3.3.3"),
+        modify("电信", 10, old_value="4.4.4.4"),
+        modify("默认", 20, old_value="5.5.5.5"),
+    ]
+    kept = policy.filter(plan, current(100), lambda ip: ip != "1.1.1.1", count=False)
+    assert [a.line for a in kept] == ["移动", "电信"]
+    assert policy.stats() == {
+        "applied": 0,
+        "forced": 0,
+        "suppressed": {"margin": 0, "hold": 0, "budget": 0},
+    }
+
+
+@pytest.mark.parametrize("dumped", [True, False])
+def test_dump_and_restore_round_trip(dumped):
+    policy = DampingPolicy(min_hold=3600)
+    policy.record_applied([modify("移动", 50)])
+    restored = DampingPolicy(min_hold=3600)
+    if dumped:
+        restored.restore(policy.dump())
+    kept = restored.filter([modify("移动", 10)], current(100), always)
+    assert len(kept) == (0 if dumped else 1)
@@ -0,0 +1,148 @@
+import pytest
+
+import main
+from planner import RecordAction
+
+WRITE_ACTIONS = (
+    "CreateRecord",
+    "ModifyRecord",
+    "DeleteRecord",
+    "CreateRecordBatch",
+    "ModifyRecordBatch",
+    "DeleteRecordBatch",
+)
+
+
+@pytest.fixture(autouse=True)
+def no_poll_sleep(monkeypatch):
+    monkeypatch.setattr(main, "BATCH_POLL_INTERVAL", 0)
+
+
+def modify(sub_domain, record_id, value="198.51.100.1", old_value="192.0.2.1"):
+    return RecordAction(
+        "modify", "example.com", sub_domain, "A", "默认",
+        value, 600, None, record_id, old_value, 10,
+    )
+
+
+def seed(fake, sub_domains):
+    return {
+        sub_domain: fake.add_record("example.com", sub_domain, "A", "默认", "192.0.2.1")
+        for sub_domain in sub_domains
+    }
+
+
+def test_cycle_creates_zone_records_in_one_batch(domains, fake, make_manager, zone):
+    manager = make_manager()
+    plan = manager.check_and_update()
+    assert plan and all(action.action == "create" for action in plan)
+    assert fake.calls["CreateRecordBatch"] == 1
+    assert fake.calls["CreateRecord"] == 0
+    for action in plan:
+        assert zone(action.sub_domain)[(action.line, action.record_type)] == [action.value]
+        entry = manager.record_index.get(
+            action.domain, action.sub_domain, action.line, action.record_type
+        )
+        assert fake.records[entry.record_id]["Value"] == action.value
+
+    fake.reset_stats()
+    assert manager.check_and_update() == []
+    assert not any(fake.calls[action] for action in WRITE_ACTIONS)
+
+
+def test_cycle_deletes_duplicate_records(domains, fake, make_manager, zone):
+    manager = make_manager()
+    manager.check_and_update()
+    (line, record_type), (value,) = next(iter(zone("www").items()))
+    fake.add_record("example.com", "www", record_type, line, "192.0.2.1")
+    fake.add_record("example.com", "www", record_type, line, "192.0.2.2")
+
+    fake.reset_stats()
+    plan = manager.check_and_update()
+    assert [action.action for action in plan] == ["delete", "delete"]
+    # 不足批量阈值，逐条删除
+    assert fake.calls["DeleteRecord"] == 2
+    assert zone("www")[(line, record_type)] == [value]
+
+
+def test_dry_run_does_not_write(domains, fake, make_manager):
+    manager = make_manager()
+    assert manager.check_and_update(dry_run=True)
+    assert not any(fake.calls[action] for action in WRITE_ACTIONS)
+    assert fake.zone_records("example.com") == []
+
+
+def test_modifies_across_sub_domains_share_one_batch(domains, fake, make_manager, zone):
+    ids = seed(fake, ("www", "api", "blog"))
+    manager = make_manager()
+    manager.refresh_record_index(["example.com"])
+    fake.reset_stats()
+
+    _, results = manager.execute_groups([modify(name, record_id) for name, record_id in ids.items()])
+
+    assert sorted(len(applied) for _, applied, _ in results) == [1, 1, 1]
+    assert fake.calls["ModifyRecordBatch"] == 1
+    assert fake.calls["DescribeBatchTask"] == 1
+    assert fake.calls["ModifyRecord"] == 0
+    for name in ids:
+        assert zone(name)[("默认", "A")] == ["198.51.100.1"]
+    assert manager.damping.stats()["applied"] == 3
+
+
+def test_small_batches_use_single_calls(domains, fake, make_manager):
+    ids = seed(fake, ("www", "api"))
+    manager = make_manager()
+    manager.refresh_record_index(["example.com"])
+    fake.reset_stats()
+
+    manager.execute_groups([modify(name, record_id) for name, record_id in ids.items()])
+    assert fake.calls["ModifyRecordBatch"] == 0
+    assert fake.calls["ModifyRecord"] == 2
+
+
+def test_batch_failure_falls_back_to_single_modify(domains, fake, make_manager, zone):
+    ids = seed(fake, ("www", "api", "old"))
+    manager = make_manager()
+    manager.refresh_record_index(["example.com"])
+    # 记录在查询之后被删除，批量任务中这条记录失败，逐条修改也失败
+    del fake.records[ids["old"]]
+    fake.reset_stats()
+
+    _, results = manager.execute_groups([modify(name, record_id) for name, record_id in ids.items()])
+
+    applied = {action.sub_domain for _, actions, _ in results for action in actions}
+    assert applied == {"www", "api"}
+    assert fake.calls["ModifyRecordBatch"] == 1
+    assert fake.calls["ModifyRecord"] == 1
+    assert zone("www")[("默认", "A")] == ["198.51.100.1"]
+    assert manager.record_index.get("example.com", "api", "默认", "A").value == "198.51.100.1"
+    assert manager.record_index.get("example.com", "old", "默认", "A").value == "192.0.2.1"
+
+
+def test_unknown_batch_result_is_not_counted(domains, fake, make_manager, monkeypatch):
+    ids = seed(fake, ("www", "api", "blog"))
+    manager = make_manager()
+    manager.refresh_record_index(["example.com"])
+    # 任务一直未完成
+    monkeypatch.setattr(manager, "wait_batch_task", lambda domain, job_id, key: {})
+
+    _, results = manager.execute_groups([modify(name, record_id) for name, record_id in ids.items()])
+
+    assert all(not applied for _, applied, _ in results)
+    assert fake.calls["ModifyRecord"] == 0
+    assert manager.record_index.get("example.com", "www", "默认", "A").value == "192.0.2.1"
+
+
+def test_rejected_batch_falls_back_to_single_calls(domains, fake, make_manager, monkeypatch):
+    ids = seed(fake, ("www", "api", "blog"))
+    manager = make_manager()
+    manager.refresh_record_index(["example.com"])
+
+    def reject(req):
+        raise main.TencentCloudSDKException("OperationDenied", "批量任务被拒绝")
+
+    monkeypatch.setattr(fake, "ModifyRecordBatch", reject)
+    _, results = manager.execute_groups([modify(name, record_id) for name, record_id in ids.items()])
+
+    assert sum(len(applied) for _, applied, _ in results) == 3
+    assert fake.calls["ModifyRecord"] == 3
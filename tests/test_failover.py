@@ -0,0 +1,64 @@
+from bench.fake_prober import FakeProber
+from failover import FailoverWatcher
+
+
+class DownProber(FakeProber):
+    """指定的IP不可达，其余IP按FakeProber的规则"""
+
+    def __init__(self):
+        super().__init__(0)
+        self.down = set()
+
+    def _rtt(self, ip):
+        return None if ip in self.down else super()._rtt(ip)
+
+
+def test_watcher_triggers_after_consecutive_failures():
+    watcher = FailoverWatcher(threshold=2)
+    assert watcher.record({"1.1.1.1": False, "2.2.2.2": True}) == []
+    assert watcher.is_suspect("1.1.1.1")
+    assert watcher.record({"1.1.1.1": False, "2.2.2.2": True}) == ["1.1.1.1"]
+    watcher.resolved(["1.1.1.1"], 3)
+    assert not watcher.is_suspect("1.1.1.1")
+    assert watcher.stats() == {"watching": 0, "triggered": 1, "repointed": 3}
+
+
+def test_success_or_unpublishing_resets_the_count():
+    watcher = FailoverWatcher(threshold=2)
+    watcher.record({"1.1.1.1": False, "2.2.2.2": False})
+    assert watcher.record({"1.1.1.1": True}) == []
+    assert watcher.failures == {}
+    assert watcher.record({"1.1.1.1": False}) == []
+
+
+def test_lowered_threshold_triggers_existing_counts():
+    watcher = FailoverWatcher(threshold=5)
+    watcher.record({"1.1.1.1": False})
+    watcher.record({"1.1.1.1": False})
+    watcher.threshold = 2
+    assert watcher.record({"1.1.1.1": False}) == ["1.1.1.1"]
+
+
+def test_watch_published_repoints_failed_ip(domains, fake, make_manager, zone):
+    prober = DownProber()
+    manager = make_manager(prober)
+    manager.failover.threshold = 2
+    manager.check_and_update()
+    (line, record_type), (ip,) = next(iter(zone("www").items()))
+    users = manager.published_records()[ip]
+
+    prober.down.add(ip)
+    fake.reset_stats()
+    manager.watch_published()
+    assert fake.calls["ModifyRecord"] == 0
+    manager.watch_published()
+
+    assert fake.calls["ModifyRecord"] + fake.calls["ModifyRecordBatch"] > 0
+    assert ip not in manager.published_records()
+    for domain_config, line, record_type in users:
+        (value,) = zone(domain_config["sub_domain"])[(line, record_type)]
+        assert value != ip
+        assert manager.record_index.get(
+            "example.com", domain_config["sub_domain"], line, record_type
+        ).value == value
+    assert manager.failover.stats()["repointed"] == len(users)
@@ -0,0 +1,72 @@
+import pytest
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import (
+    TencentCloudSDKException,
+)
+from tencentcloud.dnspod.v20210323 import models
+
+
+def batch_results(fake, job_id):
+    req = models.DescribeBatchTaskRequest()
+    req.JobId = job_id
+    resp = fake.DescribeBatchTask(req)
+    return resp, [item for detail in resp.DetailList for item in detail.RecordList]
+
+
+def domain_id(fake, domain):
+    req = models.DescribeDomainRequest()
+    req.Domain = domain
+    return fake.DescribeDomain(req).DomainInfo.DomainId
+
+
+def test_create_record_batch_reports_new_record_ids(fake):
+    req = models.CreateRecordBatchRequest()
+    req.DomainIdList = [str(domain_id(fake, "example.com"))]
+    req.RecordList = []
+    for sub_domain, value in (("www", "1.1.1.1"), ("api", None)):
+        item = models.AddRecordBatch()
+        item.SubDomain, item.RecordType, item.RecordLine = sub_domain, "A", "移动"
+        item.Value, item.TTL = value, 300
+        req.RecordList.append(item)
+
+    resp, items = batch_results(fake, fake.CreateRecordBatch(req).JobId)
+    assert (resp.JobType, resp.SuccessCount, resp.FailCount) == ("record_add", 1, 1)
+    assert resp.DetailList[0].Domain == "example.com"
+    created, failed = items
+    assert (created.Status, created.SubDomain, created.RecordLine, created.Value) == (
+        "success", "www", "移动", "1.1.1.1"
+    )
+    assert fake.records[created.RecordId]["TTL"] == 300
+    assert (failed.Status, failed.RecordId) == ("fail", None)
+
+
+def test_create_record_batch_rejects_unknown_domain_id(fake):
+    req = models.CreateRecordBatchRequest()
+    req.DomainIdList = ["12345"]
+    req.RecordList = [models.AddRecordBatch()]
+    with pytest.raises(TencentCloudSDKException):
+        fake.CreateRecordBatch(req)
+
+
+def test_modify_and_delete_record_batch_report_per_record_status(fake):
+    first = fake.add_record("example.com", "www", "A", "默认", "1.1.1.1")
+    second = fake.add_record("example.com", "api", "A", "默认", "1.1.1.1")
+
+    req = models.ModifyRecordBatchRequest()
+    req.RecordIdList, req.Change, req.ChangeTo = [first, 999], "value", "2.2.2.2"
+    _, items = batch_results(fake, fake.ModifyRecordBatch(req).JobId)
+    assert [(item.RecordId, item.Status) for item in items] == [(first, "success"), (999, "fail")]
+    assert fake.records[first]["Value"] == "2.2.2.2"
+
+    req = models.DeleteRecordBatchRequest()
+    req.RecordIdList = [second, 999]
+    resp, items = batch_results(fake, fake.DeleteRecordBatch(req).JobId)
+    assert resp.JobType == "record_del"
+    assert [(item.RecordId, item.Status) for item in items] == [(second, "success"), (999, "fail")]
+    assert second not in fake.records
+
+
+def test_modify_record_batch_validates_change(fake):
+    req = models.ModifyRecordBatchRequest()
+    req.RecordIdList, req.Change, req.ChangeTo = [1], "line", "移动"
+    with pytest.raises(TencentCloudSDKException):
+        fake.ModifyRecordBatch(req)
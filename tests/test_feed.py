@@ -0,0 +1,142 @@
+import threading
+
+import pytest
+
+import config
+from feed import (
+    STATIC_LATENCY,
+    FeedSource,
+    IPFeed,
+    SourceHealth,
+    StaticSource,
+    merge_data,
+    normalize_data,
+)
+
+
+class FailingSource(FeedSource):
+    def load(self):
+        raise ConnectionError("连接失败")
+
+
+class BlockingSource(FeedSource):
+    """load一直阻塞，直到release被设置"""
+
+    def __init__(self, name, ips):
+        super().__init__(name)
+        self.ips = ips
+        self.release = threading.Event()
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        self.release.wait(5)
+        return self.ips
+
+
+def line(*items):
+    return {"v4": {"CM": [{"ip": ip, "latency": latency} for ip, latency in items]}}
+
+
+def make_feed(sources, mode="first", deadline=1):
+    feed = IPFeed(sources, max_age=10)
+    feed.mode = mode
+    feed.deadline = deadline
+    return feed
+
+
+def test_normalize_accepts_api_envelope_and_plain_ips():
+    data = normalize_data(
+        {"success": True, "data": {"v4": {"CM": ["1.1.1.1", {"ip": "1.1.1.2", "latency": 5}]}}}
+    )
+    assert data == {
+        "v4": {"CM": [{"ip": "1.1.1.1", "latency": STATIC_LATENCY}, {"ip": "1.1.1.2", "latency": 5}]}
+    }
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        {"success": False},
+        {"v4": {}},
+        {"v4": ["1.1.1.1"]},
+        {"v4": {"CM": [{"latency": 5}]}},
+    ],
+)
+def test_normalize_rejects_bad_data(raw):
+    with pytest.raises(ValueError):
+        normalize_data(raw)
+
+
+def test_merge_keeps_lowest_latency_per_ip():
+    merged = merge_data([line(("1.1.1.1", 30), ("1.1.1.2", 10)), line(("1.1.1.1", 20))])
+    assert merged == {"v4": {"CM": [{"ip": "1.1.1.1", "latency": 20}, {"ip": "1.1.1.2", "latency": 10}]}}
+
+
+def test_health_uses_moving_average():
+    health = SourceHealth()
+    assert health.is_healthy(0.5, 1)
+    health.record(2.0, True)
+    assert health.latency == 2.0 and not health.is_healthy(0.5, 1)
+    health.record(1.0, False)
+    assert health.latency == pytest.approx(1.7)
+    assert health.error_rate == pytest.approx(0.3)
+    assert health.stats()["errors"] == 1
+
+
+def test_first_mode_skips_failed_sources():
+    feed = make_feed([FailingSource("bad"), StaticSource("good", line(("1.1.1.1", 10)))])
+    assert feed.fetch() == line(("1.1.1.1", 10))
+    stats = feed.source_stats()
+    assert stats["bad"]["errors"] == 1
+    assert stats["good"]["errors"] == 0
+
+
+def test_first_mode_uses_degraded_source_only_as_fallback(monkeypatch):
+    monkeypatch.setattr(config, "feed_max_error_rate", 0.5)
+    degraded = StaticSource("degraded", line(("1.1.1.1", 10)))
+    degraded.health.record(0.1, False)
+    feed = make_feed([degraded, FailingSource("bad")])
+    assert feed.fetch() == line(("1.1.1.1", 10))
+
+
+def test_merge_mode_combines_sources():
+    feed = make_feed(
+        [StaticSource("a", line(("1.1.1.1", 30))), StaticSource("b", line(("1.1.1.2", 10)))],
+        mode="merge",
+    )
+    assert {item["ip"] for item in feed.fetch()["v4"]["CM"]} == {"1.1.1.1", "1.1.1.2"}
+
+
+def test_slow_source_is_cut_off_and_not_resubmitted():
+    slow = BlockingSource("slow", line(("1.1.1.1", 10)))
+    feed = make_feed([slow], deadline=0.2)
+    try:
+        assert feed.fetch() is None
+        assert slow.busy
+        # 上一次请求尚未结束，不再重复提交
+        assert feed.fetch() is None
+        assert slow.loads == 1
+    finally:
+        slow.release.set()
+
+
+def test_refresh_falls_back_to_recent_snapshot():
+    source = StaticSource("s", line(("1.1.1.1", 10)))
+    feed = make_feed([source])
+    snapshot = feed.refresh()
+    assert snapshot.table.best("v4") == ("1.1.1.1", 10)
+
+    feed.sources = [FailingSource("bad")]
+    assert feed.refresh() is snapshot
+    snapshot.fetched_at -= 11 * 60
+    assert feed.refresh() is None
+
+
+def test_dump_and_restore_snapshot():
+    feed = make_feed([StaticSource("s", line(("1.1.1.1", 10)))])
+    feed.refresh()
+    restored = make_feed([])
+    restored.restore(feed.dump())
+    assert restored.last_good.data == feed.last_good.data
+    assert restored.last_good.fetched_at == feed.last_good.fetched_at
@@ -0,0 +1,127 @@
+from types import SimpleNamespace
+
+from planner import (
+    DEFAULT_LINE,
+    build_plan,
+    desired_records,
+    group_by_sub_domain,
+    plan_domain,
+)
+from records import RecordIndex
+
+SPLIT = {
+    "v4": {"移动": ("1.1.1.1", 30), "联通": ("1.1.1.2", 20), "电信": ("1.1.1.3", 50)},
+}
+SAME = {
+    "v4": {"移动": ("1.1.1.1", 30), "联通": ("1.1.1.1", 20), "电信": ("1.1.1.1", 50)},
+}
+
+
+def make_index(*records):
+    """records格式: (线路, 记录类型, 值, 记录ID[, TTL])，都属于 example.com - www"""
+    index = RecordIndex()
+    index.load_zone(
+        "example.com",
+        [
+            SimpleNamespace(
+                Name="www",
+                Line=line,
+                Type=record_type,
+                Value=value,
+                RecordId=record_id,
+                TTL=rest[0] if rest else 600,
+            )
+            for line, record_type, value, record_id, *rest in records
+        ],
+    )
+    return index
+
+
+def test_desired_records_collapse_to_default_when_all_lines_agree(domain_config):
+    desired = desired_records(domain_config, SAME)
+    assert desired[(DEFAULT_LINE, "A")] == ("1.1.1.1", 20, True)
+    for line in ("移动", "联通", "电信"):
+        ip, _, required = desired[(line, "A")]
+        assert ip == "1.1.1.1"
+        assert required is False
+
+
+def test_desired_records_default_line_uses_lowest_latency(domain_config):
+    desired = desired_records(domain_config, SPLIT)
+    assert desired[(DEFAULT_LINE, "A")] == ("1.1.1.2", 20, True)
+    assert desired[("电信", "A")] == ("1.1.1.3", 50, True)
+
+
+def test_desired_records_skip_disabled_versions(domain_config):
+    domain_config["ipv4_enabled"] = False
+    assert desired_records(domain_config, SPLIT) == {}
+
+
+def test_collapsed_plan_creates_only_default_line(domain_config):
+    plan = plan_domain(domain_config, SAME, RecordIndex())
+    assert [(a.action, a.line, a.value) for a in plan] == [("create", DEFAULT_LINE, "1.1.1.1")]
+
+
+def test_collapsed_plan_syncs_existing_line_records(domain_config):
+    index = make_index((DEFAULT_LINE, "A", "1.1.1.1", 1), ("移动", "A", "9.9.9.9", 2))
+    plan = plan_domain(domain_config, SAME, index)
+    assert [(a.action, a.line, a.record_id, a.value) for a in plan] == [
+        ("modify", "移动", 2, "1.1.1.1")
+    ]
+
+
+def test_plan_modifies_in_place_and_keeps_matching_records(domain_config):
+    index = make_index(
+        (DEFAULT_LINE, "A", "1.1.1.2", 1),
+        ("移动", "A", "9.9.9.9", 2),
+        ("联通", "A", "1.1.1.2", 3),
+        ("电信", "A", "1.1.1.3", 4),
+    )
+    plan = plan_domain(domain_config, SPLIT, index)
+    assert len(plan) == 1
+    action = plan[0]
+    assert (action.action, action.record_id, action.old_value, action.value) == (
+        "modify", 2, "9.9.9.9", "1.1.1.1"
+    )
+
+
+def test_plan_modifies_when_only_ttl_differs(domain_config):
+    index = make_index((DEFAULT_LINE, "A", "1.1.1.1", 1, 300))
+    plan = plan_domain(domain_config, SAME, index)
+    assert [(a.action, a.ttl) for a in plan] == [("modify", 600)]
+
+
+def test_plan_deletes_duplicate_records_and_keeps_the_first(domain_config):
+    index = make_index(
+        (DEFAULT_LINE, "A", "1.1.1.1", 1),
+        (DEFAULT_LINE, "A", "8.8.8.8", 2),
+        (DEFAULT_LINE, "A", "8.8.4.4", 3),
+    )
+    plan = plan_domain(domain_config, SAME, index)
+    assert [(a.action, a.record_id) for a in plan] == [("delete", 2), ("delete", 3)]
+    assert {a.old_value for a in plan} == {"8.8.8.8", "8.8.4.4"}
+
+
+def test_plan_orders_modify_then_create_then_delete(domain_config):
+    index = make_index(
+        (DEFAULT_LINE, "A", "9.9.9.9", 1),
+        (DEFAULT_LINE, "A", "9.9.9.8", 2),
+    )
+    plan = plan_domain(domain_config, SPLIT, index)
+    actions = [a.action for a in plan]
+    assert actions == sorted(actions, key=["modify", "create", "delete"].index)
+    assert actions.count("create") == 3
+
+
+def test_build_plan_skips_disabled_domains(domain_config):
+    disabled = dict(domain_config, sub_domain="old", enabled=False)
+    plan = build_plan([domain_config, disabled], SAME, RecordIndex())
+    assert {a.sub_domain for a in plan} == {"www"}
+
+
+def test_group_by_sub_domain_keeps_order(domain_config):
+    other = dict(domain_config, sub_domain="api")
+    plan = build_plan([domain_config, other], SPLIT, RecordIndex())
+    groups = group_by_sub_domain(plan)
+    assert list(groups) == [("example.com", "www"), ("example.com", "api")]
+    assert [a for group in groups.values() for a in group] == plan
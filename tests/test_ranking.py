@@ -0,0 +1,82 @@
+from ranking import CandidateTable, weighted_score
+
+DATA = {
+    "v4": {
+        "CM": [{"ip": "1.0.0.3", "latency": 30}, {"ip": "1.0.0.1", "latency": 10}],
+        "CU": [{"ip": "1.0.0.2", "latency": 20}, {"ip": "1.0.0.1", "latency": 25}],
+        "CT": [{"ip": "1.0.0.4", "latency": 20}, {"ip": "1.0.0.5", "latency": 20}],
+    },
+    "v6": {"CM": [{"ip": "2001:db8::1", "latency": 40}]},
+}
+
+
+def test_rows_are_sorted_by_latency_with_stable_ip_tie_break():
+    table = CandidateTable(DATA)
+    assert [table.ip[row] for row in table.rows("v4", "CT")] == ["1.0.0.4", "1.0.0.5"]
+    assert table.best("v4") == ("1.0.0.1", 10)
+    assert table.best("v4", "CU") == ("1.0.0.2", 20)
+
+
+def test_top_k_skips_unreachable_ips():
+    table = CandidateTable(DATA)
+    reachable = lambda ip: ip not in ("1.0.0.1", "1.0.0.2")
+    assert table.top_k("v4", k=2, reachable=reachable) == [("1.0.0.4", 20), ("1.0.0.5", 20)]
+    assert table.best("v4", "CM", reachable) == ("1.0.0.3", 30)
+    assert table.best("v4", "CU", lambda ip: False) is None
+
+
+def test_best_per_line_and_identical_lines():
+    table = CandidateTable(DATA)
+    assert table.best_per_line("v4") == {
+        "CM": ("1.0.0.1", 10),
+        "CU": ("1.0.0.2", 20),
+        "CT": ("1.0.0.4", 20),
+    }
+    assert not table.all_lines_identical("v4")
+    assert table.all_lines_identical("v6")
+    same = CandidateTable({"v4": {k: [{"ip": "9.9.9.9", "latency": 5}] for k in ("CM", "CU", "CT")}})
+    assert same.all_lines_identical("v4")
+
+
+def test_latency_of_uses_minimum_across_lines():
+    table = CandidateTable(DATA)
+    assert table.latency_of("1.0.0.1") == 10
+    assert table.latency_of("1.0.0.1", "CU") == 25
+    assert table.latency_of("8.8.8.8") is None
+
+
+def test_missing_versions_and_lines():
+    table = CandidateTable({"v4": {"CM": [{"ip": "1.0.0.1", "latency": 10}]}})
+    assert not table.has_version("v6")
+    assert table.best("v6") is None
+    assert table.best_per_line("v4") == {"CM": ("1.0.0.1", 10)}
+
+
+def test_with_measurements_returns_new_table_and_keeps_original():
+    table = CandidateTable(DATA)
+    measured = table.with_measurements(
+        {"1.0.0.1": (100, 0.0), "1.0.0.3": (10, 0.0)}, 1.0, weighted_score()
+    )
+    # 原表不变
+    assert table.best("v4", "CM") == ("1.0.0.1", 10)
+    assert table.latency_of("1.0.0.1") == 10
+    # 新表按本机测量结果排序
+    assert measured.best("v4", "CM") == ("1.0.0.3", 10)
+    assert measured.latency_of("1.0.0.1") == 100
+
+
+def test_with_measurements_blends_and_penalises_loss():
+    table = CandidateTable(DATA)
+    measured = table.with_measurements(
+        {"1.0.0.4": (40, 0.5)}, 0.5, weighted_score(loss_weight=1)
+    )
+    row = table.ip.index("1.0.0.4")
+    assert measured.latency[row] == 30
+    assert measured.loss[row] == 50
+    # 丢包50%加50毫秒惩罚，同线路的另一个IP胜出
+    assert measured.best("v4", "CT") == ("1.0.0.5", 20)
+
+
+def test_weighted_score_prefers_sticky_ips():
+    table = CandidateTable(DATA, scorer=weighted_score(sticky_ips={"1.0.0.3": 25}))
+    assert table.best("v4", "CM") == ("1.0.0.3", 30)
@@ -0,0 +1,65 @@
+import pytest
+
+import ratelimit
+from ratelimit import RateLimiter, TokenBucket
+
+
+class FakeClock:
+    """替代 time 模块，sleep 只推进时间，不真正等待"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit, "time", clock)
+    return clock
+
+
+def test_burst_is_served_without_waiting(clock):
+    bucket = TokenBucket(rate=5, burst=3)
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+    assert clock.slept == []
+
+
+def test_waits_one_interval_per_token_after_burst(clock):
+    bucket = TokenBucket(rate=4)
+    for _ in range(4):
+        bucket.acquire()
+    waited = [bucket.acquire() for _ in range(3)]
+    assert waited == pytest.approx([0.25, 0.25, 0.25])
+    assert clock.now == pytest.approx(1000.75)
+
+
+def test_tokens_refill_up_to_capacity(clock):
+    bucket = TokenBucket(rate=2, burst=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 10
+    assert [bucket.acquire() for _ in range(2)] == [0, 0]
+    assert bucket.acquire() == pytest.approx(0.5)
+
+
+def test_default_capacity_is_rate_and_at_least_one(clock):
+    assert TokenBucket(rate=20).capacity == 20
+    assert TokenBucket(rate=0.5).capacity == 1
+
+
+def test_rate_limiter_uses_one_bucket_per_action_with_overrides(clock):
+    limiter = RateLimiter(rate=10, overrides={"DescribeRecordList": 1})
+    assert limiter.bucket("ModifyRecord") is limiter.bucket("ModifyRecord")
+    assert limiter.bucket("ModifyRecord").rate == 10
+    assert limiter.acquire("DescribeRecordList") == 0
+    assert limiter.acquire("DescribeRecordList") == pytest.approx(1.0)
+    # 其他接口不受影响
+    assert limiter.acquire("ModifyRecord") == 0
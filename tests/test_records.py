@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+from records import RecordEntry, RecordIndex
+
+
+def record(name, line, record_type, value, record_id, ttl=600):
+    return SimpleNamespace(
+        Name=name, Line=line, Type=record_type, Value=value, RecordId=record_id, TTL=ttl
+    )
+
+
+def make_index():
+    index = RecordIndex()
+    index.load_zone(
+        "example.com",
+        [
+            record("www", "默认", "A", "1.1.1.1", 1),
+            record("www", "默认", "A", "1.1.1.2", 2),
+            record("www", "移动", "A", "1.1.1.3", 3),
+            record("api", "默认", "AAAA", "2001:db8::1", 4),
+        ],
+        loaded_at=100,
+    )
+    index.load_zone("example.org", [record("www", "默认", "A", "9.9.9.9", 5)], loaded_at=200)
+    return index
+
+
+def test_sub_domain_records_use_the_first_duplicate_like_get():
+    index = make_index()
+    assert index.sub_domain_records("example.com", "www") == {
+        "默认": {"A": "1.1.1.1"},
+        "移动": {"A": "1.1.1.3"},
+    }
+    assert index.get("example.com", "www", "默认", "A").record_id == 1
+    assert len(index.get_all("example.com", "www", "默认", "A")) == 2
+    assert index.sub_domain_records("example.com", "missing") == {}
+    assert index.sub_domain_records("missing.com", "www") == {}
+
+
+def test_load_zone_replaces_only_that_zone():
+    index = make_index()
+    index.load_zone("example.com", [record("new", "默认", "A", "1.1.1.9", 9)])
+    assert index.sub_domain_records("example.com", "www") == {}
+    assert index.get("example.com", "new", "默认", "A").value == "1.1.1.9"
+    assert index.get("example.org", "www", "默认", "A").value == "9.9.9.9"
+
+
+def test_set_and_remove_update_in_place():
+    index = make_index()
+    index.set("example.com", "www", "默认", "A", RecordEntry(2, "1.1.1.5", 600))
+    assert [e.value for e in index.get_all("example.com", "www", "默认", "A")] == [
+        "1.1.1.1",
+        "1.1.1.5",
+    ]
+    index.set("example.com", "blog", "默认", "A", RecordEntry(7, "1.1.1.7", 600))
+    assert index.sub_domain_records("example.com", "blog") == {"默认": {"A": "1.1.1.7"}}
+
+    index.remove("example.com", "www", "默认", "A", 1)
+    assert index.sub_domain_records("example.com", "www")["默认"] == {"A": "1.1.1.5"}
+    index.remove("example.com", "api", "默认", "AAAA", 4)
+    assert index.sub_domain_records("example.com", "api") == {}
+    index.remove("missing.com", "www", "默认", "A", 1)
+
+
+def test_dump_and_restore_round_trip():
+    index = make_index()
+    restored = RecordIndex()
+    restored.restore(index.dump())
+    assert restored.dump() == index.dump()
+    assert restored.get_all("example.com", "www", "默认", "A") == index.get_all(
+        "example.com", "www", "默认", "A"
+    )
+
+
+def test_drop_zone():
+    index = make_index()
+    index.drop_zone("example.com")
+    assert not index.has_zone("example.com")
+    assert index.get("example.com", "www", "默认", "A") is None
+    assert index.has_zone("example.org")
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+
+from scheduler import Job, Scheduler
+
+
+def run_for(scheduler, seconds, during=None):
+    """运行调度器seconds秒，during在调度循环启动后于事件循环之外的线程中执行"""
+
+    async def main():
+        task = asyncio.create_task(scheduler.run_forever())
+        await asyncio.sleep(0.02)
+        if during:
+            await asyncio.to_thread(during)
+        await asyncio.sleep(seconds)
+        task.cancel()
+
+    asyncio.run(main())
+
+
+def test_jitter_stays_within_bounds():
+    job = Job("j", lambda: None, interval=10, jitter=0.1)
+    for _ in range(100):
+        job.schedule_next()
+        assert 9 <= job.next_run - time.monotonic() <= 11
+    assert Job("j", lambda: None, 10).deadline == 10
+
+
+def test_jobs_run_immediately_and_repeat():
+    runs = []
+    scheduler = Scheduler()
+    scheduler.add_job("tick", lambda: runs.append(time.monotonic()), 0.05, run_immediately=True)
+    run_for(scheduler, 0.3)
+    assert len(runs) >= 4
+    assert scheduler.jobs["tick"].runs == len(runs)
+
+
+def test_overlapping_runs_are_skipped():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def slow():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.15)
+        with lock:
+            active[0] -= 1
+
+    scheduler = Scheduler()
+    job = scheduler.add_job("slow", slow, 0.03, run_immediately=True)
+    run_for(scheduler, 0.25)
+    assert peak[0] == 1
+    assert job.skipped > 0
+
+
+def test_failing_job_keeps_scheduler_running():
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise RuntimeError("失败")
+
+    scheduler = Scheduler()
+    scheduler.add_job("fail", fail, 0.05, run_immediately=True)
+    run_for(scheduler, 0.25)
+    assert len(calls) >= 3
+
+
+def test_run_now_wakes_a_sleeping_scheduler():
+    runs = []
+    scheduler = Scheduler()
+    scheduler.add_job("idle", lambda: runs.append(1), 3600)
+    run_for(scheduler, 0.1, during=lambda: scheduler.run_now("idle"))
+    assert runs == [1]
+
+
+def test_removed_job_stops_running():
+    runs = []
+    scheduler = Scheduler()
+    scheduler.add_job("tick", lambda: runs.append(1), 0.03, run_immediately=True)
+    run_for(scheduler, 0.05, during=lambda: scheduler.remove_job("tick"))
+    count = len(runs)
+    assert "tick" not in scheduler.jobs
+    run_for(scheduler, 0.1)
+    assert len(runs) == count
+
+
+def test_jobs_can_change_from_other_threads_while_running():
+    scheduler = Scheduler()
+
+    class ReloadingJob(Job):
+        """读取执行时间时，另一个线程（如配置重新加载任务）同时添加任务"""
+
+        @property
+        def next_run(self):
+            thread = threading.Thread(
+                target=scheduler.add_job, args=(f"job{len(scheduler.jobs)}", lambda: None, 60)
+            )
+            thread.start()
+            thread.join()
+            return self._next_run
+
+        @next_run.setter
+        def next_run(self, value):
+            self._next_run = value
+
+    for name in ("a", "b"):
+        scheduler.jobs[name] = ReloadingJob(name, lambda: None, 60, run_immediately=True)
+    assert [job.name for job in scheduler._due_jobs()] == ["a", "b"]
+    assert len(scheduler.jobs) == 4
+
+    async def main():
+        # 调度循环在任务变化时继续运行
+        task = asyncio.create_task(scheduler.run_forever())
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        task.cancel()
+
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+from sharding import shard_domains, shard_owner, shard_weight
+
+ZONES = [f"zone{i}.example.com" for i in range(600)]
+
+
+def test_weight_is_stable():
+    assert shard_weight("example.com", 0) == shard_weight("example.com", 0)
+    assert shard_weight("example.com", 0) != shard_weight("example.com", 1)
+
+
+def test_single_replica_owns_everything():
+    assert shard_owner("example.com", 1) == 0
+    assert shard_owner("example.com", 0) == 0
+    domains = [{"domain": zone} for zone in ZONES[:5]]
+    assert shard_domains(domains, 0, 1) == domains
+
+
+def test_shards_partition_all_domains_and_keep_zones_together():
+    domains = [{"domain": zone, "sub_domain": sub} for zone in ZONES for sub in ("www", "api")]
+    shards = [shard_domains(domains, index, 3) for index in range(3)]
+    assert sum(len(shard) for shard in shards) == len(domains)
+    owners = {}
+    for index, shard in enumerate(shards):
+        for domain_config in shard:
+            assert owners.setdefault(domain_config["domain"], index) == index
+    # 分布大致均匀
+    for shard in shards:
+        assert len(shard) > len(domains) / 3 * 0.8
+
+
+def test_adding_a_replica_only_moves_keys_to_the_new_replica():
+    moved = 0
+    for zone in ZONES:
+        before, after = shard_owner(zone, 3), shard_owner(zone, 4)
+        if before != after:
+            assert after == 3
+            moved += 1
+    # 约1/4的主域名迁移到新副本
+    assert len(ZONES) * 0.15 < moved < len(ZONES) * 0.35
+
+
+def test_removing_a_replica_only_moves_its_keys():
+    for zone in ZONES:
+        before, after = shard_owner(zone, 4), shard_owner(zone, 3)
+        if before != 3:
+            assert after == before
@@ -0,0 +1,56 @@
+import json
+
+import config
+from state import STATE_VERSION, StateStore
+
+
+def test_store_round_trip_and_rejects_bad_files(tmp_path):
+    store = StateStore(str(tmp_path / "sub" / "state.json"))
+    assert store.load() == {}
+    assert store.save({"records": {"example.com": {"loaded_at": 1, "records": []}}})
+    assert store.load()["records"] == {"example.com": {"loaded_at": 1, "records": []}}
+
+    with open(store.path, "w", encoding="utf-8") as f:
+        json.dump({"version": STATE_VERSION + 1, "records": {}}, f)
+    assert store.load() == {}
+    with open(store.path, "w", encoding="utf-8") as f:
+        f.write("{broken")
+    assert store.load() == {}
+
+
+def test_restart_restores_state_and_skips_listing_fresh_zones(domains, fake, make_manager):
+    manager = make_manager()
+    manager.check_and_update()
+    manager.save_state()
+
+    fake.reset_stats()
+    restarted = make_manager()
+    assert restarted.record_index.dump() == manager.record_index.dump()
+    assert restarted.feed.last_good.data == manager.feed.last_good.data
+    assert restarted.availability_cache.dump() == manager.availability_cache.dump()
+    assert restarted.damping.dump() == manager.damping.dump()
+    assert fake.calls["DescribeRecordList"] == 0
+
+    # 第一个周期沿用恢复的记录，之后每个周期重新查询
+    assert restarted.check_and_update() == []
+    assert fake.calls["DescribeRecordList"] == 0
+    restarted.check_and_update()
+    assert fake.calls["DescribeRecordList"] == 1
+
+
+def test_zones_loaded_at_startup_are_not_listed_again(domains, fake, make_manager):
+    manager = make_manager()
+    assert fake.calls["DescribeRecordList"] == 1
+    manager.check_and_update()
+    assert fake.calls["DescribeRecordList"] == 1
+
+
+def test_stale_state_is_listed_again(domains, fake, make_manager, monkeypatch):
+    manager = make_manager()
+    manager.check_and_update()
+    manager.save_state()
+
+    monkeypatch.setattr(config, "state_ttl", 0)
+    fake.reset_stats()
+    make_manager()
+    assert fake.calls["DescribeRecordList"] == 1